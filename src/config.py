@@ -33,6 +33,41 @@ WARNING_LIMIT: int = int(os.getenv("WARNING_LIMIT", 10))
 STOP_LIMIT: int = int(os.getenv("STOP_LIMIT", 10000))
 """Do not store elements in the queue of a module as long as there are more elements than STOP_LIMIT."""
 
+MEMORY_LIMIT_MB: float = float(os.getenv("MEMORY_LIMIT_MB", 0))
+"""
+The maximum estimated size in MB of all queued data objects together (in the queues of links and the internal
+queues of processor and output modules, see utils.memory_governor). Once reached, the queues are treated like full
+ones (see STOP_LIMIT and BACKPRESSURE_TIMEOUT). 0 disables the limit.
+"""
+
+QUEUE_LIMIT_MB: float = float(os.getenv("QUEUE_LIMIT_MB", 0))
+"""
+The default maximum estimated size in MB of the data objects queued for one module (in its internal queue and
+the queues of all links to it), if the module does not set max_queue_mb. 0 disables the limit.
+"""
+
+SPAWN_MAX_WORKERS: int = int(os.getenv("SPAWN_MAX_WORKERS", 64))
+"""
+The maximum number of threads shared by all links in spawn mode (worker_count_per_link = 0).
+Data objects are queued while all threads are busy.
+"""
+
+SPAWN_MAX_QUEUE: int = int(os.getenv("SPAWN_MAX_QUEUE", 10000))
+"""The maximum number of data objects queued for the spawn mode threads. Further data objects are rejected."""
+
+ASYNC_LOOP_THREADS: int = int(os.getenv("ASYNC_LOOP_THREADS", 0))
+"""
+The number of shared event loop threads executing the async methods (start, stop, _run) of all modules.
+If 0, every calling thread drives its own event loop instead and the coroutines of a module never run concurrently.
+"""
+
+BACKPRESSURE_TIMEOUT: float = float(os.getenv("BACKPRESSURE_TIMEOUT", 0))
+"""
+Seconds a full queue (of a link, or the internal queue of a processor or output module) is waited for before
+the data is dropped or buffered. Meanwhile, the module the data originates from is asked to slow down
+(see AbstractModule.acquire_permit). 0 disables the backpressure, the data is then dropped (or buffered) at once.
+"""
+
 START_TIMEOUT: int = int(os.getenv("START_TIMEOUT", 10))
 """
 Seconds a module waits for its start method to report readiness before processing data anyway.
@@ -129,3 +164,33 @@ STOP_TIMEOUT: int = int(os.getenv("STOP_TIMEOUT", 3))
 
 MCP_ALL_AS_TOOL: bool = os.getenv("MCP_ALL_AS_TOOL", "True").lower() in ("true", "1", "yes")
 """Currently, some LLMs only support tools (and not resources and resource_templates)."""
+
+METRICS_HOST: str = os.getenv("METRICS_HOST", "0.0.0.0")
+"""The host address of the built-in OpenMetrics listener (see utils.metrics_exporter)."""
+
+METRICS_PORT: int = int(os.getenv("METRICS_PORT", 0))
+"""
+The port of the built-in OpenMetrics listener, serving all metrics on /metrics for Prometheus.
+It is independent of the api. 0 disables the listener.
+"""
+
+TRACE_SAMPLE_RATE: int = int(os.getenv("TRACE_SAMPLE_RATE", 0))
+"""
+Every n-th data flow leaving its source module is traced, with a span for the link wait, internal wait and
+processing time of every module it passes through (see metrics.Tracer). 0 disables the tracing.
+"""
+
+TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", 1000))
+"""The number of recently finished traces kept in memory."""
+
+TRACE_FILE: str = os.getenv("TRACE_FILE", "")
+"""The JSON lines file finished traces are appended to, e.g. ../logs/traces.jsonl. Empty to keep them in memory only."""
+
+PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", 0))
+"""
+The milliseconds between two samples of the built-in sampling profiler, attributing CPU time to modules
+(see utils.analyzers.SamplingProfiler). 0 disables the profiler.
+"""
+
+PROFILER_FILE: str = os.getenv("PROFILER_FILE", "")
+"""The file the profiler writes its collapsed stacks to, e.g. ../logs/profile.folded for flamegraph.pl."""
@@ -28,6 +28,7 @@ import models
 from models.validations import ValidationError
 from metrics import metrics_registry
 import utils.hub_connection
+from utils.async_runtime import async_runtime
 
 # Third party imports.
 import json
@@ -192,9 +193,10 @@ class Configuration:
         """
         Calls a method while transparently supporting both synchronous and asynchronous implementations.
 
-        Synchronous methods are called directly with no overhead. For asynchronous
-        methods, one of two execution strategies is chosen based on whether an event
-        loop is already running on the current thread:
+        Synchronous methods are called directly with no overhead. Asynchronous methods are
+        scheduled onto the event loop of the module in the shared async runtime, if it is enabled
+        (config.ASYNC_LOOP_THREADS > 0). Otherwise, one of two execution strategies is chosen based on
+        whether an event loop is already running on the current thread:
 
           - No running loop: a persistent event loop is reused for the lifetime of
             the calling thread via a thread-local variable. This avoids the cost of
@@ -216,6 +218,9 @@ class Configuration:
         if not inspect.iscoroutinefunction(method):
             return method(*args, **kwargs)
 
+        if async_runtime.enabled and not async_runtime.owns_current_thread():
+            return async_runtime.run(method, *args, **kwargs)
+
         try:
             asyncio.get_running_loop()
             # A loop is running on this thread — dispatch to a separate thread to avoid a deadlock.
@@ -582,9 +587,71 @@ class Configuration:
         self._create_input_modules()
         self._create_tag_modules()
         self._create_variable_modules()
+        self._refresh_routes()
         logger.info("Finished configuration start routine ({0} module(s) running)."
                     .format(len(self.configuration_dict)))
 
+    @staticmethod
+    def _plan_fusion() -> dict[str, str]:
+        """
+        Finds the links which can be fused (see fuse_links of processor modules).
+
+        A link is fused if its module has fuse_links enabled and no other link, and the linked module is a
+        processor which is not thread safe and is not linked by any other module. Such a processor is executed
+        on the calling thread anyway, so calling it directly only removes the worker in between. Chains of fused
+        links are executed as one unit. A chain closing a loop is not fused, it would never return.
+
+        :returns: The ids of the fused linked modules with the id of the linking module as key.
+        """
+        modules = dict(data_layer.module_data)
+        inbound = defaultdict(int)
+        for module_data in modules.values():
+            for link in set(getattr(getattr(module_data.instance, "configuration", None), "links", [])):
+                inbound[link] += 1
+
+        fused = {}
+        for module_id, module_data in modules.items():
+            configuration = getattr(module_data.instance, "configuration", None)
+            links = getattr(configuration, "links", [])
+            if not getattr(configuration, "fuse_links", False) or len(set(links)) != 1:
+                continue
+            target = modules.get(links[0])
+            if (target is None or not target.module_name.startswith("processors.")
+                    or getattr(target.instance, "_thread_safe", True) or inbound[links[0]] != 1):
+                continue
+            fused[module_id] = links[0]
+
+        # Drop loops: following the fused links from any module must end.
+        for module_id in list(fused):
+            visited, current = {module_id}, fused.get(module_id)
+            while current in fused:
+                if current in visited:
+                    fused.pop(current)
+                    break
+                visited.add(current)
+                current = fused[current]
+        return fused
+
+    @staticmethod
+    def _refresh_routes():
+        """
+        Rebuilds the routing tables of all running modules, since their links may have changed.
+        Modules only check their routing table when forwarding data, not for changed links.
+        The links to be fused are planned beforehand.
+        """
+        fused = Configuration._plan_fusion()
+        for module_id, module_data in list(data_layer.module_data.items()):
+            refresh_routes = getattr(module_data.instance, "refresh_routes", None)
+            if refresh_routes is None:
+                continue
+            try:
+                module_data.instance.fused_link = fused.get(module_id)
+                refresh_routes()
+            except Exception as e:
+                logger.error("Could not refresh the links of module '{0}' with the id '{1}': {2}"
+                             .format(module_data.module_name, module_data.configuration.id, str(e)),
+                             exc_info=config.EXC_INFO)
+
     def restart(self):
         """
         Restart the current configuration.
@@ -671,6 +738,7 @@ class Configuration:
 
                 if module_config is not None:
                     self._create_module(module_config=module_configuration)
+                    self._refresh_routes()
                 else:
                     # No new config — restart the existing instance by re-activating it.
                     # The previous start loop runs against this very instance and leaves it only
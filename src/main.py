@@ -95,6 +95,22 @@ if __name__ == "__main__":
         elif bool(int(os.environ.get('MCP', '0'))):
             logger.error("In order to use the mcp, enable the api.")
 
+        if config.METRICS_PORT:
+            try:
+                import utils.metrics_exporter
+
+                # Serve the metrics for Prometheus, also without the api.
+                utils.metrics_exporter.start()
+            except Exception as e:
+                logger.error("Could not start metrics exporter on port {0} ({1})."
+                             .format(config.METRICS_PORT, str(e)), exc_info=config.EXC_INFO)
+
+        if config.PROFILER_INTERVAL_MS:
+            import utils.analyzers
+
+            # Attribute the CPU time to modules, instead of attaching an external profiler.
+            utils.analyzers.start_profiler()
+
         # The frontend is served by the api itself, on the same port. It used to be a
         # second web server in a second process, whose whole job was to return HTML
         # that then called the api on another port.
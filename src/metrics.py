@@ -10,10 +10,12 @@ Per-module runtime metrics
 Each module instance owns a `ModuleMetrics` object, obtained once via
 `metrics_registry.register()`, which tracks:
 
-* throughput      - rolling received/processed event rates (`_SlidingWindow`)
+* throughput      - rolling received/processed event rates (`_SlidingWindow`,
+                     a ring of one-second buckets per thread shard)
                      at 1s/10s/60s windows, plus lifetime totals.
-* processing time - wall-clock duration of each `_run()` call, held in a
-                     fixed-size circular buffer (`_CircularStats`) with mean/percentile support.
+* processing time - wall-clock duration of each `_run()` call, held in
+                     mergeable quantile sketches (`_LatencyStats`) over a sliding
+                     window and the whole lifetime.
 * queue waits     - see "Two queue wait times" below.
 * queue depth     - live size of the module's own internal queue, if any.
 * errors / drops  - simple monotonic counters (`_AtomicInt`).
@@ -41,6 +43,36 @@ record the elapsed time under the flow key via
 ["flows"]` gives one latency histogram per independent data flow through
 the pipeline.
 
+Sampled tracing
+----------------
+With config.TRACE_SAMPLE_RATE set, every n-th flow gets a `_Trace` in its
+`_DataContext` (see `Tracer`), and every module it passes through records a span
+for its link wait, internal wait and `_run()` time. Finished traces are kept in a
+ring (`tracer.traces()`) and optionally appended to config.TRACE_FILE, to find the
+hop behind the spikes of a flow's end-to-end latency.
+
+Per-link metrics
+-----------------
+Every link between two modules which is served by persistent workers
+(`ModuleWorker`) owns a `LinkMetrics` object, obtained via
+`metrics_registry.register_link()`. It reports how the link distributes
+data objects between its workers and, for every worker (= partition, if
+the link is partitioned by key), the live queue depth and its estimated size
+in bytes (see `utils.memory_governor`), its high-water mark, the data objects
+dropped and - in latest-only mode - overwritten before they were forwarded,
+and the share of the time spent inside the linked module.
+This shows on which link the backpressure starts.
+
+Executors
+----------
+Shared thread pools (e.g. the pool serving all links in spawn mode) and the
+process pools of processors with `execution: process` own an `ExecutorMetrics`
+object, obtained via `metrics_registry.register_executor()`. It reports the
+pool size, busy workers, queue depth and wait, how many tasks were submitted
+and rejected, and - per worker, e.g. per worker process - the executed tasks
+and busy time. Executors are not discarded by `metrics_registry.reset()`, but
+by their owner via `metrics_registry.unregister_executor()` once shut down.
+
 Registry and snapshotting
 ---------------------------
 `MetricsRegistry` is a thread-safe, process-wide singleton
@@ -50,28 +82,51 @@ JSON-serializable dict:
 
     {
       "modules": [ <ModuleMetrics.snapshot()>, ... ],
+      "links": [ <LinkMetrics.snapshot()>, ... ],
+      "executors": { "<name>": <ExecutorMetrics.snapshot()>, ... },
       "flows": {
         "<source_module_id>": {
           "end_to_end_latency_ms": {
-            "p50": ..., "p95": ..., "p99": ..., "mean": ..., "sample_count": ...
+            "p50": ..., "p95": ..., "p99": ..., "mean": ..., "sample_count": ...,
+            "lifetime": { "p50": ..., "p95": ..., "p99": ..., "mean": ..., "sample_count": ... }
           }
         },
         ...
-      }
+      },
+      "cpu": <utils.analyzers.SamplingProfiler.cpu_shares()> or None,
+      "memory": <utils.memory_governor.MemoryGovernor.snapshot()> or None
     }
 
 All latency figures are reported in milliseconds; internal storage is in
-seconds. Percentiles use nearest-rank over the current buffer contents and
-return `None` once no samples have been recorded yet, so downstream
-consumers don't need to special-case an empty pipeline.
+seconds. Latencies are recorded into logarithmic histograms (`_QuantileSketch`),
+so recording is O(1) and snapshots never sort samples. Percentiles are
+nearest-rank within 1% relative error, over the last minute (sliding window)
+and, under `lifetime`, over all samples. They return `None` while no samples
+have been recorded, so downstream consumers don't need to special-case an
+empty pipeline. Histograms are mergeable, e.g. the end-to-end latency of
+several flows via `metrics_registry.end_to_end_latency()`.
+
+`utils.metrics_exporter` renders the registry in the OpenMetrics text format for
+Prometheus, served on /metrics if config.METRICS_PORT is set.
 """
+import collections
+import itertools
+import json
+import logging
+import math
 import queue as _queue_module
 import statistics
 import threading
 import time
+import uuid
 import weakref
 from typing import Dict, Optional
-import collections
+
+# Internal imports.
+import config
+
+logger = logging.getLogger(config.APP_NAME.lower() + '.' + __name__)
+"""The logger instance."""
 
 
 class _DataContext:
@@ -81,19 +136,21 @@ class _DataContext:
     Timestamps and flow metadata for one in-flight data object.
     Stored in `data_context_map` - never on the data object itself.
     """
-    __slots__ = ('pipeline_ts', 'source_id', 'link_ts', 'internal_ts', 'visited')
+    __slots__ = ('pipeline_ts', 'source_id', 'link_ts', 'internal_ts', 'visited', 'trace')
 
     def __init__(self,
                  pipeline_ts: float,
                  source_id: str,
                  link_ts: float,
                  visited: frozenset[str] = frozenset(),
+                 trace: Optional["_Trace"] = None,
                  ) -> None:
         """
         :param pipeline_ts: Monotonic time at which the data left its source module.
         :param source_id: Originating module's `configuration.id`; doubles as the flow key.
         :param link_ts: Monotonic time at which the data entered the current link queue.
         :param visited: Module ids already traversed by this flow. Defaults to empty.
+        :param trace: The trace of the flow, if it was sampled by the `tracer`.
         """
         self.pipeline_ts: float = pipeline_ts
         """When data left its source module."""
@@ -105,6 +162,8 @@ class _DataContext:
         """When data entered the internal queue."""
         self.visited: frozenset[str] = visited
         """Module ids already traversed by this flow."""
+        self.trace: Optional[_Trace] = trace
+        """The trace of the flow, if sampled. Shared by all data objects of the flow."""
 
     def remaining(self, links: set[str]) -> set[str]:
         """
@@ -128,19 +187,35 @@ class _DataContextMap:
 
     `models.Data` is a standard (non-frozen) dataclass, which Python makes unhashable by default.
 
-    Entries are keyed by `id(data)` (always hashable - just an int)
-    and cleaned up automatically via `weakref.finalize`, which only
-    requires the object to support weak references, not to be hashable.
+    Entries are keyed by `id(data)` (always hashable - just an int) and spread over
+    `shard_count` dicts. Every read and write is a single dict operation, which is atomic,
+    so no lock is taken at all.
+    Every entry holds a weak reference to its data object, whose callback removes the
+    entry once the data object is garbage-collected. This only requires the object to
+    support weak references, not to be hashable, and is much cheaper than a
+    `weakref.finalize` per object. The callback may be run by the cyclic garbage collector
+    at almost any point of any thread, also within another callback, which is why it must
+    not block (see `weakref._remove_dead_weakref`).
     """
 
+    shard_count: int = 64
+    """The number of shards. A power of two."""
+
     def __init__(self) -> None:
         """
-        Initialize an empty, lock-protected id-to-context map.
+        Initialize empty id-to-context shards.
         """
-        self._lock = threading.Lock()
-        """Guards all reads/writes of `_map`."""
-        self._map: Dict[int, _DataContext] = {}
-        """Maps `id(data)` to that object's `_DataContext`."""
+        self._shards: list[Dict[int, tuple]] = [{} for _ in range(self.shard_count)]
+        """Map `id(data)` to `(weak reference to data, _DataContext)`."""
+
+    def _index(self, key: int) -> int:
+        """
+        Select the shard of a key. Object ids are aligned to 16 bytes, so the lowest bits are skipped.
+
+        :param key: The `id()` of a data object.
+        :returns: The index of the shard.
+        """
+        return (key >> 4) & (self.shard_count - 1)
 
     def get(self, data) -> Optional[_DataContext]:
         """
@@ -149,35 +224,45 @@ class _DataContextMap:
         :param data: The data object.
         :returns: The associated `_DataContext`, or `None` if *data* has no context.
         """
-        with self._lock:
-            return self._map.get(id(data))
+        key = id(data)
+        entry = self._shards[self._index(key)].get(key)
+        if entry is None:
+            return None
+        ref, ctx = entry
+        # The entry of a collected object with the same id, whose callback has not run yet.
+        if ref is not None and ref() is not data:
+            return None
+        return ctx
 
     def set(self, data, ctx: _DataContext) -> None:
         """
-        Store *ctx* for *data* and register a finalizer that removes the
-        entry once *data* is garbage-collected.
+        Store *ctx* for *data*. The entry is removed once *data* is garbage-collected.
 
         :param data: The data object.
         :param ctx: The data context.
         :returns: None.
         """
         key = id(data)
-        with self._lock:
-            self._map[key] = ctx
         try:
-            weakref.finalize(data, self._cleanup, key)
+            ref = weakref.KeyedRef(data, self._cleanup, key)
         except TypeError:
-            pass
+            ref = None
+        self._shards[self._index(key)][key] = (ref, ctx)
 
-    def _cleanup(self, key: int) -> None:
+    def _cleanup(self, ref: weakref.KeyedRef) -> None:
         """
-        Delete the key from the map.
+        Weak reference callback: delete the entry of the collected data object.
+        An entry which was replaced meanwhile, i.e. for a new object with the same id, is kept.
+        Takes no lock: the entry is popped and put back if it was replaced.
 
-        :param key: The `id()` of the data object being finalized.
+        :param ref: The dead weak reference of the entry, carrying the `id()` of the data object as key.
         :returns: None.
         """
-        with self._lock:
-            self._map.pop(key, None)
+        shard = self._shards[self._index(ref.key)]
+        entry = shard.pop(ref.key, None)
+        if entry is not None and entry[0] is not ref:
+            # Unless an even newer entry was set meanwhile.
+            shard.setdefault(ref.key, entry)
 
     def propagate(self, old_data, new_data) -> None:
         """
@@ -202,28 +287,246 @@ Module-level singleton - the only instance used throughout the application.
 """
 
 
+class _Trace:
+    """
+    The spans of one sampled flow, collected by every module a data object of the flow passes through.
+    """
+    __slots__ = ('spans', '__weakref__')
+
+    def __init__(self, spans: list) -> None:
+        """
+        :param spans: Receives the spans. Kept by the `Tracer` to finish the trace once this object is collected.
+        """
+        self.spans: list[tuple] = spans
+        """The spans as (module_id, name, start, end) tuples of monotonic times."""
+
+    def add(self, module_id: str, name: str, start: float, end: float) -> None:
+        """
+        Record a span. Thread-safe, since appending to a list is atomic.
+
+        :param module_id: The id of the module the span belongs to.
+        :param name: The kind of the span: `link_wait`, `internal_wait` or `run`.
+        :param start: Monotonic time at which the span started.
+        :param end: Monotonic time at which the span ended.
+        :returns: None.
+        """
+        self.spans.append((module_id, name, start, end))
+
+
+class Tracer:
+    """
+    Samples every n-th flow leaving its source module and records a span per hop (link wait, internal wait and
+    `_run()` time of every module) for its data objects.
+
+    The `_Trace` is shared by the `_DataContext` of every data object of the flow, including the copies for
+    branches. A trace is finished as soon as none of these data objects is alive anymore - workers and modules
+    keep a reference to the last data object they handled, so usually once the next data objects passed. It is
+    then added to a ring of recent traces and, if configured, handed to a background thread appending it to a
+    JSON lines file, so the pipeline thread finishing the trace does no file I/O. Unsampled data objects only pay
+    for a `ctx.trace is not None` check per hop.
+    """
+
+    def __init__(self, sample_rate: int = 0, buffer_size: int = 1000, path: str = "") -> None:
+        """
+        :param sample_rate: Every n-th flow is traced. 0 disables the tracing.
+        :param buffer_size: The number of recent traces kept in memory.
+        :param path: The JSON lines file finished traces are appended to. Empty to keep them in memory only.
+        """
+        self.sample_rate: int = sample_rate
+        """Every n-th flow is traced. 0 disables the tracing."""
+        self.path: str = path
+        """The JSON lines file finished traces are appended to."""
+        self._counter = itertools.count()
+        """Counts the flows, to pick every n-th."""
+        self._traces: collections.deque = collections.deque(maxlen=buffer_size)
+        """The recently finished traces."""
+        self._writes: _queue_module.SimpleQueue = _queue_module.SimpleQueue()
+        """The finished traces (or `threading.Event`s of `flush()` calls) waiting to be written to the file."""
+        self._writer: Optional[threading.Thread] = None
+        """The thread writing to the file, started with the first sampled flow."""
+        self._writer_lock = threading.Lock()
+        """Guards the start of the writer."""
+
+    def sample(self, source_id: str, start: float) -> Optional[_Trace]:
+        """
+        Decide whether a new flow is traced.
+
+        :param source_id: The id of the module the flow originates from.
+        :param start: Monotonic time at which the flow started (`_DataContext.pipeline_ts`).
+        :returns: The trace for the flow, or `None` if it is not sampled.
+        """
+        if not self.sample_rate or next(self._counter) % self.sample_rate:
+            return None
+        if self.path:
+            # Here and not in _finish, which may be run by the garbage collector and must not take a lock.
+            self._start_writer()
+        spans = []
+        trace = _Trace(spans)
+        finalizer = weakref.finalize(trace, self._finish, uuid.uuid4().hex, source_id, start, time.time(), spans)
+        finalizer.atexit = False
+        return trace
+
+    def _finish(self, trace_id: str, source_id: str, start: float, timestamp: float, spans: list) -> None:
+        """
+        Store a trace whose data objects were all collected.
+
+        :param trace_id: The unique id of the trace.
+        :param source_id: The id of the module the flow originates from.
+        :param start: Monotonic time at which the flow started.
+        :param timestamp: Unix time at which the flow started.
+        :param spans: The spans of the trace.
+        :returns: None.
+        """
+        if not spans:
+            return
+        spans.sort(key=lambda span: span[2])
+        trace = {
+            "trace_id": trace_id,
+            "source_id": source_id,
+            "timestamp": timestamp,
+            "duration_ms": round((max(span[3] for span in spans) - start) * 1_000.0, 3),
+            "spans": [{"module_id": module_id,
+                       "name": name,
+                       "start_ms": round((span_start - start) * 1_000.0, 3),
+                       "duration_ms": round((span_end - span_start) * 1_000.0, 3)}
+                      for module_id, name, span_start, span_end in spans],
+        }
+        # Appending to a deque and a SimpleQueue is reentrant, as _finish may be run by the garbage collector
+        # within any code, also within another _finish.
+        self._traces.append(trace)
+        if self.path:
+            self._writes.put(trace)
+
+    def _start_writer(self) -> None:
+        """
+        Start the thread writing the finished traces to the file, if it is not running yet.
+
+        :returns: None.
+        """
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, daemon=True, name="Trace_Writer")
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        """
+        Append the finished traces to the file, all traces waiting at once with a single open.
+
+        :returns: None.
+        """
+        while True:
+            items = [self._writes.get()]
+            while not self._writes.empty():
+                items.append(self._writes.get())
+            lines = [json.dumps(item) + "\n" for item in items if not isinstance(item, threading.Event)]
+            if lines:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as file:
+                        file.writelines(lines)
+                except Exception as e:
+                    logger.error("Could not write {0} trace(s) to '{1}': {2}".format(len(lines), self.path, str(e)),
+                                 exc_info=config.EXC_INFO)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the traces finished so far are written to the file.
+
+        :param timeout: The maximum time to wait in seconds. `None` waits without a limit.
+        :returns: False if the timeout expired before, otherwise True.
+        """
+        if self._writer is None:
+            return True
+        written = threading.Event()
+        self._writes.put(written)
+        return written.wait(timeout)
+
+    def traces(self, source_id: Optional[str] = None) -> list[dict]:
+        """
+        The recently finished traces, oldest first.
+
+        :param source_id: Only return the traces of flows starting at this module. All if `None`.
+        :returns: A list of JSON-serializable dicts with `trace_id`, `source_id`, `timestamp` (unix time),
+            `duration_ms` and `spans` keys. Every span has `module_id`, `name`, `start_ms` (since the start of
+            the flow) and `duration_ms` keys.
+        """
+        return [trace for trace in list(self._traces) if source_id is None or trace["source_id"] == source_id]
+
+
+tracer = Tracer(sample_rate=config.TRACE_SAMPLE_RATE, buffer_size=config.TRACE_BUFFER_SIZE, path=config.TRACE_FILE)
+"""
+The single application-wide tracer.
+"""
+
+
+_thread_numbers = threading.local()
+"""Holds the number of the current thread, used to select the shard of a sharded counter."""
+_next_thread_number = itertools.count()
+"""Hands out the thread numbers."""
+
+
+def _thread_number() -> int:
+    """
+    :returns: A small number, unique for the calling thread.
+    """
+    try:
+        return _thread_numbers.number
+    except AttributeError:
+        _thread_numbers.number = number = next(_next_thread_number)
+        return number
+
+
+class _CounterShard:
+    """
+    One shard of a `_SlidingWindow`: a ring of event counts per time bucket.
+    """
+    __slots__ = ("lock", "bucket_ids", "counts", "total")
+
+    def __init__(self, size: int) -> None:
+        """
+        :param size: The number of buckets.
+        """
+        self.lock = threading.Lock()
+        """Guards all other attributes."""
+        self.bucket_ids: list[int] = [-1] * size
+        """The number of the time bucket every position of the ring currently counts."""
+        self.counts: list[int] = [0] * size
+        """The event count of every position of the ring."""
+        self.total: int = 0
+        """Lifetime count of events recorded in this shard."""
+
+
 class _SlidingWindow:
     """
     Thread-safe event counter.
 
-    Records event timestamps in a rolling deque pruned to `window` seconds on every write.
+    Counts events in a fixed ring of time buckets (one second by default) covering the rolling
+    window, so memory is constant regardless of the throughput. Every thread increments one of
+    `shard_count` shards, each with its own lock, and the shards are merged on read.
     `total` is a separate monotonically increasing lifetime counter.
     """
 
+    shard_count: int = 4
+    """The number of shards."""
+
     def __init__(self,
-                 window: float = 60.0) -> None:
+                 window: float = 60.0,
+                 resolution: float = 1.0) -> None:
         """
-        :param window: Size in seconds of the rolling window used to prune old
-            timestamps and as the default for `rate()`.
+        :param window: Size in seconds of the rolling window, which is the longest window
+            `rate()` can report, and the default for `rate()`.
+        :param resolution: The time covered by one bucket in seconds.
         """
-        self._lock = threading.Lock()
-        """Guards `_total` and `_dq`."""
         self._window = window
         """Default rolling-window size in seconds."""
-        self._dq: collections.deque[float] = collections.deque()
-        """Monotonic timestamps of events still within `_window` seconds of now."""
-        self._total: int = 0
-        """Lifetime count of events recorded, never pruned."""
+        self._resolution = resolution
+        """The time covered by one bucket in seconds."""
+        self._shards: list[_CounterShard] = [
+            _CounterShard(int(math.ceil(window / resolution)) + 1) for _ in range(self.shard_count)]
+        """The shards. One more bucket than the window needs, for the one currently filling up."""
 
     def record(self) -> None:
         """
@@ -231,13 +534,56 @@ class _SlidingWindow:
 
         :returns: None.
         """
+        bucket_id = int(time.monotonic() / self._resolution)
+        shard = self._shards[_thread_number() % self.shard_count]
+        index = bucket_id % len(shard.counts)
+        with shard.lock:
+            shard.total += 1
+            if shard.bucket_ids[index] == bucket_id:
+                shard.counts[index] += 1
+            else:
+                shard.bucket_ids[index] = bucket_id
+                shard.counts[index] = 1
+
+    def rates(self, windows: tuple) -> list[float]:
+        """
+        Events per second over several windows at once, merging the shards only once.
+
+        The window rarely starts at a bucket boundary. The events of the bucket it starts in are
+        assumed to be evenly spread over the bucket and only counted with the part inside the window.
+
+        :param windows: The window sizes in seconds, each at most the constructor window.
+        :returns: The rate for every window. 0.0 for a zero-length window.
+        """
         now = time.monotonic()
-        cutoff = now - self._window
-        with self._lock:
-            self._total += 1
-            self._dq.append(now)
-            while self._dq and self._dq[0] < cutoff:
-                self._dq.popleft()
+        resolution = self._resolution
+        current = int(now / resolution)
+        counts: Dict[int, int] = {}
+        for shard in self._shards:
+            with shard.lock:
+                bucket_ids, shard_counts = list(shard.bucket_ids), list(shard.counts)
+            for bucket_id, count in zip(bucket_ids, shard_counts):
+                if current - len(shard_counts) < bucket_id <= current:
+                    counts[bucket_id] = counts.get(bucket_id, 0) + count
+
+        rates = []
+        for window in windows:
+            if window <= 0:
+                rates.append(0.0)
+                continue
+            start = now - window
+            events = 0.0
+            for bucket_id, count in counts.items():
+                bucket_start = bucket_id * resolution
+                bucket_end = min(bucket_start + resolution, now)
+                if bucket_end <= start:
+                    continue
+                if bucket_start >= start or bucket_end <= bucket_start:
+                    events += count
+                else:
+                    events += count * (bucket_end - start) / (bucket_end - bucket_start)
+            rates.append(events / window)
+        return rates
 
     def rate(self, window: Optional[float] = None) -> float:
         """
@@ -247,13 +593,7 @@ class _SlidingWindow:
         :param window: The window size in seconds.
         :returns: The rate. 0.0 for a zero-length window.
         """
-        w = window if window is not None else self._window
-        if w <= 0:
-            return 0.0
-        cutoff = time.monotonic() - w
-        with self._lock:
-            count = sum(1 for t in self._dq if t >= cutoff)
-        return count / w
+        return self.rates((window if window is not None else self._window,))[0]
 
     @property
     def total(self) -> int:
@@ -262,68 +602,269 @@ class _SlidingWindow:
 
         :returns: The total number of events ever recorded.
         """
-        with self._lock:
-            return self._total
+        total = 0
+        for shard in self._shards:
+            with shard.lock:
+                total += shard.total
+        return total
 
 
-class _CircularStats:
+class _QuantileSketch:
     """
-    Fixed-size circular buffer of float samples with mean and percentile support.
+    Mergeable histogram of non-negative float samples with logarithmic buckets, answering
+    quantile queries with a relative error of at most `relative_accuracy`.
+
+    Recording a sample is O(1) and quantile queries only walk the occupied buckets (a few
+    hundred at most for latencies between microseconds and minutes), instead of sorting all
+    samples. Two sketches are merged by adding up their bucket counts, so the sketches of
+    several time slots or flows can be combined into one. Not thread-safe on its own.
     """
 
-    def __init__(self, maxlen: int = 1_000) -> None:
+    relative_accuracy: float = 0.01
+    """The maximum relative error of a reported quantile."""
+    _gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+    """The ratio between the upper bounds of two neighbouring buckets."""
+    _inverse_log_gamma: float = 1.0 / math.log(_gamma)
+    """The inverse of the logarithm of `_gamma`."""
+    min_value: float = 1e-9
+    """Samples up to this value are counted as zero."""
+
+    __slots__ = ("buckets", "zero_count", "total")
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty sketch.
+        """
+        self.buckets: Dict[int, int] = {}
+        """Maps the bucket index to its sample count. Bucket i holds samples in (gamma^(i-1), gamma^i]."""
+        self.zero_count: int = 0
+        """The number of samples up to `min_value`."""
+        self.total: float = 0.0
+        """The sum of all samples."""
+
+    def add(self, value: float) -> None:
         """
-        :param maxlen: Maximum number of samples retained; oldest samples are
-            evicted first once the buffer is full.
+        Record a sample.
+
+        :param value: The sample.
+        :returns: None.
+        """
+        if value > self.min_value:
+            index = math.ceil(math.log(value) * self._inverse_log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        else:
+            self.zero_count += 1
+        self.total += value
+
+    def merge(self, other: "_QuantileSketch") -> None:
+        """
+        Add all samples of another sketch to this one.
+
+        :param other: The other sketch, which is not changed.
+        :returns: None.
+        """
+        buckets = self.buckets
+        for index, count in other.buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.total += other.total
+
+    def copy(self) -> "_QuantileSketch":
+        """
+        :returns: An independent copy of this sketch.
+        """
+        sketch = _QuantileSketch()
+        sketch.buckets = dict(self.buckets)
+        sketch.zero_count, sketch.total = self.zero_count, self.total
+        return sketch
+
+    @property
+    def count(self) -> int:
+        """
+        :returns: The number of samples.
+        """
+        return self.zero_count + sum(self.buckets.values())
+
+    def quantiles(self, percentiles: tuple) -> list:
+        """
+        Nearest-rank percentiles, like over the sorted samples, within `relative_accuracy`.
+
+        :param percentiles: The percentiles (0-100) in ascending order.
+        :returns: The value for every percentile, or `None` for each when empty.
+        """
+        count = self.count
+        if not count:
+            return [None] * len(percentiles)
+        ranks = [max(0, min(int(count * p / 100.0), count - 1)) for p in percentiles]
+        values = []
+        seen = self.zero_count
+        indices = iter(sorted(self.buckets))
+        index = None
+        for rank in ranks:
+            if rank < self.zero_count:
+                values.append(0.0)
+                continue
+            while seen <= rank:
+                index = next(indices)
+                seen += self.buckets[index]
+            # The value in the middle of the bucket, in relative terms.
+            values.append(2.0 * self._gamma ** index / (self._gamma + 1.0))
+        return values
+
+    @property
+    def mean(self) -> Optional[float]:
+        """
+        :returns: The exact mean of all samples, or `None` if empty.
+        """
+        count = self.count
+        return self.total / count if count else None
+
+
+class _LatencyStats:
+    """
+    Thread-safe latency statistics over a sliding time window and over the whole lifetime, based on
+    `_QuantileSketch`.
+
+    The window is split into `slots` sketches, each covering `window / slots` seconds. When a sample falls into
+    a new time slot, the oldest sketch is folded into the sketch of all expired samples and replaced, so the
+    window view covers between `window - window / slots` and `window` seconds. Recording only updates a single
+    sketch under the lock; querying copies the sketches under the lock and merges them without holding it.
+    """
+
+    def __init__(self, window: float = 60.0, slots: int = 6) -> None:
+        """
+        :param window: The length of the sliding window in seconds.
+        :param slots: The number of time slots the window is split into.
         """
         self._lock = threading.Lock()
-        """Guards `_buf`."""
-        self._buf: collections.deque[float] = collections.deque(maxlen=maxlen)
-        """Circular buffer of the most recent samples, oldest evicted first."""
+        """Guards all sketches."""
+        self._slot_seconds: float = window / slots
+        """The time covered by one slot."""
+        self._slot_ids: list[int] = [-1] * slots
+        """The number of the time slot every sketch currently holds."""
+        self._slots: list[_QuantileSketch] = [_QuantileSketch() for _ in range(slots)]
+        """The sketches of the time slots, used round-robin."""
+        self._expired = _QuantileSketch()
+        """All samples of time slots which were replaced already."""
+        self.recorded: int = 0
+        """The number of samples recorded so far. Cheap to read, e.g. to check for new samples."""
 
     def record(self, value: float) -> None:
         """
-        Append a sample, evicting the oldest if the buffer is full.
+        Record a sample.
 
-        :param value: The value in seconds to append.
+        :param value: The value in seconds.
         :returns: None.
         """
+        slot_id = int(time.monotonic() / self._slot_seconds)
+        index = slot_id % len(self._slots)
+        with self._lock:
+            if self._slot_ids[index] != slot_id:
+                self._expired.merge(self._slots[index])
+                self._slot_ids[index] = slot_id
+                self._slots[index] = _QuantileSketch()
+            self._slots[index].add(value)
+            self.recorded += 1
+
+    def window(self) -> _QuantileSketch:
+        """
+        :returns: A sketch of all samples in the sliding window.
+        """
+        oldest = int(time.monotonic() / self._slot_seconds) - len(self._slots) + 1
+        with self._lock:
+            slots = [sketch.copy() for slot_id, sketch in zip(self._slot_ids, self._slots) if slot_id >= oldest]
+        merged = _QuantileSketch()
+        for sketch in slots:
+            merged.merge(sketch)
+        return merged
+
+    def lifetime(self) -> _QuantileSketch:
+        """
+        :returns: A sketch of all samples recorded so far.
+        """
         with self._lock:
-            self._buf.append(value)
+            slots = [sketch.copy() for sketch in self._slots]
+            merged = self._expired.copy()
+        for sketch in slots:
+            merged.merge(sketch)
+        return merged
+
+    def merge_into(self, window: _QuantileSketch, lifetime: _QuantileSketch) -> None:
+        """
+        Add the samples of these statistics to other sketches, e.g. for combining several flows.
+
+        :param window: Receives the samples in the sliding window.
+        :param lifetime: Receives all samples recorded so far.
+        :returns: None.
+        """
+        window.merge(self.window())
+        lifetime.merge(self.lifetime())
 
     def percentile(self, p: float) -> Optional[float]:
         """
-        Nearest-rank percentile of the samples currently in the buffer.
+        Nearest-rank percentile of the samples in the sliding window.
 
         :param p: p-th percentile (0-100).
-        :returns: Nearest-rank sample value. `None` when empty.
+        :returns: The percentile within `_QuantileSketch.relative_accuracy`. `None` when empty.
         """
-        with self._lock:
-            if not self._buf:
-                return None
-            s = sorted(self._buf)
-        return s[max(0, min(int(len(s) * p / 100.0), len(s) - 1))]
+        return self.window().quantiles((p,))[0]
 
     @property
     def mean(self) -> Optional[float]:
         """
-        Arithmetic mean of the current window.
-        `None` when empty.
-
-        :returns: The mean of all samples currently in the buffer, or `None` if empty.
+        :returns: The mean of the samples in the sliding window, or `None` if empty.
         """
-        with self._lock:
-            return statistics.mean(self._buf) if self._buf else None
+        return self.window().mean
 
     @property
     def count(self) -> int:
         """
-        Number of samples currently held in the buffer (≤ maxlen).
+        :returns: The number of samples in the sliding window.
+        """
+        return self.window().count
 
-        :returns: The current sample count.
+    def summary(self, scale: float = 1_000.0) -> dict:
         """
+        JSON-serializable summary of the sliding window and the lifetime, in milliseconds.
+
+        :param scale: The factor the values are multiplied with. 1 for samples which are not durations.
+        :returns: A dict with `p50`, `p95`, `p99`, `mean` and `sample_count` keys for the sliding window,
+            and the same keys for all samples under `lifetime`.
+        """
+        oldest = int(time.monotonic() / self._slot_seconds) - len(self._slots) + 1
         with self._lock:
-            return len(self._buf)
+            slots = [(slot_id >= oldest, sketch.copy()) for slot_id, sketch in zip(self._slot_ids, self._slots)]
+            lifetime = self._expired.copy()
+        window = _QuantileSketch()
+        for in_window, sketch in slots:
+            if in_window:
+                window.merge(sketch)
+            lifetime.merge(sketch)
+        return _summary(window, _summary(lifetime, scale=scale), scale=scale)
+
+
+def _summary(sketch: _QuantileSketch, lifetime: Optional[dict] = None, scale: float = 1_000.0) -> dict:
+    """
+    JSON-serializable summary of a sketch of durations.
+
+    :param sketch: The sketch of durations in seconds.
+    :param lifetime: The summary of the lifetime sketch, added under `lifetime` if given.
+    :param scale: The factor the values are multiplied with. Defaults to seconds to milliseconds.
+    :returns: A dict with `p50`, `p95`, `p99`, `mean` and `sample_count` keys, durations in milliseconds
+        rounded to 3 decimals (`None` if empty).
+    """
+    p50, p95, p99 = (round(v * scale, 3) if v is not None else None for v in sketch.quantiles((50, 95, 99)))
+    mean = sketch.mean
+    summary = {
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "mean": round(mean * scale, 3) if mean is not None else None,
+        "sample_count": sketch.count,
+    }
+    if lifetime is not None:
+        summary["lifetime"] = lifetime
+    return summary
 
 
 class _AtomicInt:
@@ -392,18 +933,29 @@ class ModuleMetrics:
         """Rolling counter of data objects that successfully completed `_run()`."""
 
         # Timing.
-        self._proc_time = _CircularStats(maxlen=1_000)  # time inside _run()
+        self._proc_time = _LatencyStats()  # time inside _run()
         """Samples of wall-clock time spent inside `_run()`, in seconds."""
-        self._link_wait = _CircularStats(maxlen=1_000)  # ModuleWorker queue wait
+        self._link_wait = _LatencyStats()  # ModuleWorker queue wait
         """Samples of ModuleWorker queue wait time (link_wait), in seconds."""
-        self._int_wait = _CircularStats(maxlen=1_000)  # internal queue wait
+        self._int_wait = _LatencyStats()  # internal queue wait
         """Samples of internal queue wait time (internal_wait), in seconds."""
+        self._batch_sizes = _LatencyStats()
+        """Samples of the number of data objects per batch (output modules in batch mode only)."""
+        self._batch_time = _LatencyStats()
+        """Samples of wall-clock time spent per batch, in seconds."""
 
         # Errors / drops.
         self._errors = _AtomicInt()
         """Lifetime count of processing errors."""
         self._drops = _AtomicInt()
         """Lifetime count of data objects dropped due to a full queue."""
+        self._backpressure = _AtomicInt()
+        """Lifetime count of backpressure signals received from downstream modules."""
+        # Validation.
+        self._validation_hits = _AtomicInt()
+        """Lifetime count of data objects whose shape was found in the validation cache."""
+        self._validation_misses = _AtomicInt()
+        """Lifetime count of data objects whose shape was not found in the validation cache."""
 
     def record_received(self) -> None:
         """
@@ -453,6 +1005,18 @@ class ModuleMetrics:
         if seconds >= 0:
             self._int_wait.record(seconds)
 
+    def record_batch(self, size: int, seconds: float) -> None:
+        """
+        Record one batch of data objects processed at once.
+
+        :param size: The number of data objects in the batch.
+        :param seconds: Wall-clock duration in seconds of processing the batch.
+        :returns: None.
+        """
+        self._batch_sizes.record(size)
+        if seconds >= 0:
+            self._batch_time.record(seconds)
+
     def record_error(self) -> None:
         """
         Increment error counter (call from every processing except block).
@@ -469,72 +1033,272 @@ class ModuleMetrics:
         """
         self._drops.inc()
 
+    def record_backpressure(self) -> None:
+        """
+        Increment backpressure counter (call when a downstream queue asked this module to slow down).
+
+        :returns: None.
+        """
+        self._backpressure.inc()
+
+    def record_validation_lookup(self, hit: bool) -> None:
+        """
+        Count one lookup of a data object shape in a validation cache (see utils.data_validation.ValidationCache).
+
+        :param hit: True if the shape was known.
+        :returns: None.
+        """
+        if hit:
+            self._validation_hits.inc()
+        else:
+            self._validation_misses.inc()
+
+    def counter_values(self) -> tuple:
+        """
+        The lifetime counters, read without taking their locks, e.g. for frequent scrapes of many modules.
+        Every value is a single int read, so a read can only miss increments which are in flight.
+
+        :returns: The received, processed, error, drop, backpressure, validation hit and validation miss totals.
+        """
+        return (sum([shard.total for shard in self._received._shards]),
+                sum([shard.total for shard in self._processed._shards]),
+                self._errors._value,
+                self._drops._value,
+                self._backpressure._value,
+                self._validation_hits._value,
+                self._validation_misses._value)
+
     def snapshot(self) -> dict:
         """
         JSON-serializable snapshot of all current metrics (latencies in ms).
 
         :returns: A dict with `module_id`, `module_name`, `throughput`,
             `processing_time_ms`, `link_queue_wait_ms`, `internal_queue_wait_ms`,
-            `queue`, and `errors` keys.
+            `batches`, `queue`, `errors`, and `validation_cache` keys.
         """
-
-        def _ms(v: Optional[float]) -> Optional[float]:
-            """
-            Convert a duration from seconds to rounded milliseconds.
-
-            :param v: Duration in seconds, or `None`.
-            :returns: Duration in milliseconds rounded to 3 decimals, or `None` if *v* is `None`.
-            """
-            return round(v * 1_000.0, 3) if v is not None else None
+        received = self._received.rates((1, 10, 60))
+        processed = self._processed.rates((1, 10, 60))
 
         return {
             "module_id": self.module_id,
             "module_name": self.module_name,
             "throughput": {
-                "received_per_sec_1s": round(self._received.rate(1), 2),
-                "received_per_sec_10s": round(self._received.rate(10), 2),
-                "received_per_sec_60s": round(self._received.rate(60), 2),
+                "received_per_sec_1s": round(received[0], 2),
+                "received_per_sec_10s": round(received[1], 2),
+                "received_per_sec_60s": round(received[2], 2),
                 "received_total": self._received.total,
-                "processed_per_sec_1s": round(self._processed.rate(1), 2),
-                "processed_per_sec_10s": round(self._processed.rate(10), 2),
-                "processed_per_sec_60s": round(self._processed.rate(60), 2),
+                "processed_per_sec_1s": round(processed[0], 2),
+                "processed_per_sec_10s": round(processed[1], 2),
+                "processed_per_sec_60s": round(processed[2], 2),
                 "processed_total": self._processed.total,
             },
-            "processing_time_ms": {
-                "p50": _ms(self._proc_time.percentile(50)),
-                "p95": _ms(self._proc_time.percentile(95)),
-                "p99": _ms(self._proc_time.percentile(99)),
-                "mean": _ms(self._proc_time.mean),
-                "sample_count": self._proc_time.count,
-            },
-            "link_queue_wait_ms": {
-                # ModuleWorker queue: how long data waited before run() was called.
-                "p50": _ms(self._link_wait.percentile(50)),
-                "p95": _ms(self._link_wait.percentile(95)),
-                "p99": _ms(self._link_wait.percentile(99)),
-                "mean": _ms(self._link_wait.mean),
-                "sample_count": self._link_wait.count,
-            },
-            "internal_queue_wait_ms": {
-                # Module's own queue: how long data waited between run() and _run().
-                # Only populated for output modules and thread-safe processor modules.
-                "p50": _ms(self._int_wait.percentile(50)),
-                "p95": _ms(self._int_wait.percentile(95)),
-                "p99": _ms(self._int_wait.percentile(99)),
-                "mean": _ms(self._int_wait.mean),
-                "sample_count": self._int_wait.count,
+            "processing_time_ms": self._proc_time.summary(),
+            # ModuleWorker queue: how long data waited before run() was called.
+            "link_queue_wait_ms": self._link_wait.summary(),
+            # Module's own queue: how long data waited between run() and _run().
+            # Only populated for output modules and thread-safe processor modules.
+            "internal_queue_wait_ms": self._int_wait.summary(),
+            # Batch mode of output modules: data objects per batch (within 1%) and time per batch.
+            "batches": {
+                "size": self._batch_sizes.summary(scale=1.0),
+                "time_ms": self._batch_time.summary(),
             },
             "queue": {
                 # Live depth of the module's own internal queue (None if not applicable).
                 "current_depth": self._queue.qsize() if self._queue is not None else None,
+                # Estimated size of the queued data objects (None if the queue does not keep track of it).
+                "current_bytes": getattr(self._queue, "bytes", None),
             },
             "errors": {
                 "error_total": self._errors.value,
                 "drop_total": self._drops.value,
+                "backpressure_total": self._backpressure.value,
+            },
+            "validation_cache": {
+                # Field and tag validation of data objects with an already seen shape.
+                "hit_total": self._validation_hits.value,
+                "miss_total": self._validation_misses.value,
             },
         }
 
 
+class LinkMetrics:
+    """
+    Runtime metrics for the workers of one link (source module → target module).
+    Obtain via `metrics_registry.register_link()`.
+    """
+
+    def __init__(self,
+                 source_id: str,
+                 target_id: str,
+                 dispatch: str,
+                 workers: list,
+                 ) -> None:
+        """
+        :param source_id: The id of the module forwarding the data objects.
+        :param target_id: The id of the linked module.
+        :param dispatch: How data objects are distributed between the workers
+            (`round_robin`, `partitioned` or `latest_only`).
+        :param workers: The workers of the link. Anything with a `qsize()` method, used
+            for live depth reporting in `snapshot()`. Workers with a `stats()` method (like
+            `ModuleWorker`) also report their lifetime counters.
+        """
+        self.source_id = source_id
+        """The id of the module forwarding the data objects."""
+        self.target_id = target_id
+        """The id of the linked module."""
+        self.dispatch = dispatch
+        """How data objects are distributed between the workers."""
+        self._workers = list(workers)
+        """The workers of the link; used only for reporting."""
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable snapshot of the current link metrics.
+
+        :returns: A dict with `source_id`, `target_id`, `dispatch` and `partitions` keys.
+            `partitions` holds one entry per worker with its `current_depth` and, if reported by the worker,
+            its `high_water_mark`, `drop_total`, `coalesced_total`, `busy_ms_total` and `busy_ratio`.
+            The link itself also gets `current_depth`, `current_bytes`, `high_water_mark` (of the fullest worker),
+            `drop_total` and `coalesced_total` keys over all workers reporting them.
+        """
+        partitions = []
+        for index, worker in enumerate(self._workers):
+            partition = {"worker": index, "current_depth": worker.qsize()}
+            stats = getattr(worker, "stats", None)
+            if stats is not None:
+                partition.update(stats())
+            partitions.append(partition)
+        snapshot = {
+            "source_id": self.source_id,
+            "target_id": self.target_id,
+            "dispatch": self.dispatch,
+            "partitions": partitions,
+        }
+        reported = [partition for partition in partitions if "drop_total" in partition]
+        if reported:
+            snapshot.update({
+                "current_depth": sum(partition["current_depth"] for partition in reported),
+                "current_bytes": sum(partition.get("current_bytes") or 0 for partition in reported),
+                "high_water_mark": max(partition["high_water_mark"] for partition in reported),
+                "drop_total": sum(partition["drop_total"] for partition in reported),
+                "coalesced_total": sum(partition["coalesced_total"] for partition in reported),
+            })
+        return snapshot
+
+
+class ExecutorMetrics:
+    """
+    Runtime metrics for a shared pool of worker threads.
+    Obtain via `metrics_registry.register_executor()`.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_workers: int,
+                 queue: Optional[_queue_module.Queue] = None,
+                 ) -> None:
+        """
+        :param name: The unique name of the executor.
+        :param max_workers: The maximum number of worker threads.
+        :param queue: The task queue of the executor, used to report live queue depth in `snapshot()`.
+        """
+        self.name = name
+        """The unique name of the executor."""
+        self.max_workers = max_workers
+        """The maximum number of worker threads."""
+        self._queue = queue
+        """The task queue of the executor; used only for live depth reporting."""
+        self.workers: int = 0
+        """The current number of worker threads. Set by the executor."""
+        self.busy: int = 0
+        """The current number of worker threads executing a task. Set by the executor."""
+
+        self._submitted = _AtomicInt()
+        """Lifetime count of accepted tasks."""
+        self._rejected = _AtomicInt()
+        """Lifetime count of tasks rejected due to a full queue."""
+        self._queue_wait = _LatencyStats()
+        """Samples of the time tasks waited in the queue, in seconds."""
+        self._per_worker: Dict[str, list] = {}
+        """Maps a worker (e.g. the pid of a worker process) to its task count and busy seconds."""
+        self._per_worker_lock = threading.Lock()
+        """Guards `_per_worker`."""
+
+    def record_submitted(self) -> None:
+        """
+        Call once per accepted task.
+
+        :returns: None.
+        """
+        self._submitted.inc()
+
+    def record_rejected(self) -> None:
+        """
+        Call once per task rejected due to a full queue.
+
+        :returns: None.
+        """
+        self._rejected.inc()
+
+    def record_queue_wait(self, seconds: float) -> None:
+        """
+        Record the time one task waited in the queue before a worker picked it up.
+
+        :param seconds: The wait time in seconds.
+        :returns: None.
+        """
+        if seconds >= 0:
+            self._queue_wait.record(seconds)
+
+    def record_task(self, worker: str, seconds: float) -> None:
+        """
+        Record one task executed by a worker, e.g. as reported back by a worker process.
+
+        :param worker: The name of the worker, e.g. the pid of a worker process.
+        :param seconds: The time the worker spent on the task.
+        :returns: None.
+        """
+        with self._per_worker_lock:
+            entry = self._per_worker.setdefault(worker, [0, 0.0])
+            entry[0] += 1
+            entry[1] += max(0.0, seconds)
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable snapshot of the current executor metrics (latencies in ms).
+
+        :returns: A dict with `max_workers`, `workers`, `busy`, `queue`, `queue_wait_ms`,
+            `submitted_total`, `rejected_total` and `per_worker` keys.
+        """
+
+        def _ms(v: Optional[float]) -> Optional[float]:
+            """
+            Convert a duration from seconds to rounded milliseconds.
+
+            :param v: Duration in seconds, or `None`.
+            :returns: Duration in milliseconds rounded to 3 decimals, or `None` if *v* is `None`.
+            """
+            return round(v * 1_000.0, 3) if v is not None else None
+
+        with self._per_worker_lock:
+            per_worker = {worker: {"tasks_total": count, "busy_ms_total": _ms(busy)}
+                          for worker, (count, busy) in self._per_worker.items()}
+
+        return {
+            "max_workers": self.max_workers,
+            "workers": self.workers,
+            "busy": self.busy,
+            "queue": {
+                "current_depth": self._queue.qsize() if self._queue is not None else None,
+            },
+            "queue_wait_ms": self._queue_wait.summary(),
+            "submitted_total": self._submitted.value,
+            "rejected_total": self._rejected.value,
+            "per_worker": per_worker,
+        }
+
+
 class MetricsRegistry:
     """
     Pipeline-level registry.
@@ -564,11 +1328,23 @@ class MetricsRegistry:
                 """Maps module_id to its `ModuleMetrics` instance."""
                 obj._module_lock = threading.Lock()
                 """Guards `_modules`."""
+                obj._links: Dict[tuple[str, str], LinkMetrics] = {}
+                """Maps (source module_id, target module_id) to its `LinkMetrics` instance."""
+                obj._link_lock = threading.Lock()
+                """Guards `_links`."""
+                obj._executors: Dict[str, ExecutorMetrics] = {}
+                """Maps the executor name to its `ExecutorMetrics` instance."""
+                obj._executor_lock = threading.Lock()
+                """Guards `_executors`."""
                 # Per-flow E2E latency: keyed by source module_id.
-                obj._flows: Dict[str, _CircularStats] = {}
+                obj._flows: Dict[str, _LatencyStats] = {}
                 """Maps source module_id (flow key) to its end-to-end latency samples."""
                 obj._flow_lock = threading.Lock()
-                """Guards `_flows` (only for adding/removing keys; `_CircularStats` is self-locking)."""
+                """Guards `_flows` (only for adding/removing keys; `_LatencyStats` is self-locking)."""
+                obj._profiler = None
+                """The sampling profiler reporting the CPU time per module, if registered."""
+                obj._memory_governor = None
+                """The memory governor reporting the queued bytes per module, if registered."""
                 cls._instance = obj
         return cls._instance
 
@@ -596,9 +1372,97 @@ class MetricsRegistry:
                 )
             return self._modules[module_id]
 
+    def register_link(
+            self,
+            source_id: str,
+            target_id: str,
+            dispatch: str,
+            workers: list,
+    ) -> LinkMetrics:
+        """
+        Creates the `LinkMetrics` for the link from *source_id* to *target_id*,
+        replacing the one of a previous instance of the same link. Thread-safe.
+
+        :param source_id: The id of the module forwarding the data objects.
+        :param target_id: The id of the linked module.
+        :param dispatch: How data objects are distributed between the workers.
+        :param workers: The workers of the link, for live depth reporting.
+        :returns: The new `LinkMetrics` instance.
+        """
+        link = LinkMetrics(source_id=source_id, target_id=target_id, dispatch=dispatch, workers=workers)
+        with self._link_lock:
+            self._links[(source_id, target_id)] = link
+        return link
+
+    def unregister_link(self, link: LinkMetrics) -> None:
+        """
+        Removes the given `LinkMetrics`, if it is still the registered one for its link.
+        Thread-safe.
+
+        :param link: The `LinkMetrics` instance returned by `register_link()`.
+        :returns: None.
+        """
+        with self._link_lock:
+            key = (link.source_id, link.target_id)
+            if self._links.get(key) is link:
+                del self._links[key]
+
+    def register_executor(
+            self,
+            name: str,
+            max_workers: int,
+            queue: Optional[_queue_module.Queue] = None,
+    ) -> ExecutorMetrics:
+        """
+        Returns the `ExecutorMetrics` for *name*, creating it on first call.
+        Thread-safe.
+
+        :param name: The unique name of the executor.
+        :param max_workers: The maximum number of worker threads.
+        :param queue: Pass the task queue of the executor for live depth reporting.
+        :returns: The `ExecutorMetrics` instance for *name*.
+        """
+        with self._executor_lock:
+            if name not in self._executors:
+                self._executors[name] = ExecutorMetrics(name=name, max_workers=max_workers, queue=queue)
+            return self._executors[name]
+
+    def unregister_executor(self, name: str) -> None:
+        """
+        Removes the `ExecutorMetrics` of an executor which was shut down. Thread-safe.
+
+        :param name: The name of the executor.
+        :returns: None.
+        """
+        with self._executor_lock:
+            self._executors.pop(name, None)
+
+    def register_profiler(self, profiler) -> None:
+        """
+        Adds the CPU time per module of a sampling profiler to `snapshot()`.
+        Like executors, it is not discarded by `reset()`.
+
+        :param profiler: Anything with a `cpu_shares()` method returning a JSON-serializable dict,
+            like `utils.analyzers.SamplingProfiler`. `None` to remove the registered one.
+        :returns: None.
+        """
+        self._profiler = profiler
+
+    def register_memory_governor(self, governor) -> None:
+        """
+        Adds the queued bytes per module of a memory governor to `snapshot()`.
+        Like executors, it is not discarded by `reset()`.
+
+        :param governor: Anything with a `snapshot()` method returning a JSON-serializable dict,
+            like `utils.memory_governor.MemoryGovernor`. `None` to remove the registered one.
+        :returns: None.
+        """
+        self._memory_governor = governor
+
     def reset(self) -> None:
         """
-        Discards all per-module and per-flow metrics collected so far.
+        Discards all per-module, per-link and per-flow metrics collected so far.
+        Executor metrics are kept, since the executors outlive any configuration.
         Intended to be called when a configuration is (re)started, so metrics from a
         previous run do not linger alongside the newly started modules. Thread-safe.
 
@@ -606,6 +1470,8 @@ class MetricsRegistry:
         """
         with self._module_lock:
             self._modules.clear()
+        with self._link_lock:
+            self._links.clear()
         with self._flow_lock:
             self._flows.clear()
 
@@ -624,10 +1490,27 @@ class MetricsRegistry:
             return
         with self._flow_lock:
             if key not in self._flows:
-                self._flows[key] = _CircularStats(maxlen=2_000)
-        # Record outside the lock - _CircularStats is internally thread-safe.
+                self._flows[key] = _LatencyStats()
+        # Record outside the lock - _LatencyStats is internally thread-safe.
         self._flows[key].record(seconds)
 
+    def end_to_end_latency(self, source_id: Optional[str] = None, output_id: Optional[str] = None) -> dict:
+        """
+        End-to-end latency over several flows, merged from their histograms.
+
+        :param source_id: Only merge the flows starting at this module. All sources if `None`.
+        :param output_id: Only merge the flows ending at this module. All ends if `None`.
+        :returns: A dict like `end_to_end_latency_ms` of a single flow in `snapshot()`.
+        """
+        with self._flow_lock:
+            flows = [stats for key, stats in self._flows.items()
+                     if (source_id is None or key.split("->", 1)[0] == source_id)
+                     and (output_id is None or key.split("->", 1)[1] == output_id)]
+        window, lifetime = _QuantileSketch(), _QuantileSketch()
+        for stats in flows:
+            stats.merge_into(window, lifetime)
+        return _summary(window, _summary(lifetime))
+
     def overall_performance(self) -> dict:
         """
         Overall performance KPI across all registered modules.
@@ -668,30 +1551,35 @@ class MetricsRegistry:
 
         {
           "modules": [ <ModuleMetrics.snapshot()>, ... ],
+          "links": [ <LinkMetrics.snapshot()>, ... ],
+          "executors": { "<name>": <ExecutorMetrics.snapshot()>, ... },
           "flows": {
             "<source_module_id>": {
               "end_to_end_latency_ms": { "p50": ..., "p95": ..., "p99": ...,
-                                         "mean": ..., "sample_count": ... }
+                                         "mean": ..., "sample_count": ...,
+                                         "lifetime": { "p50": ..., ... } }
             },
             ...
-          }
+          },
+          "cpu": { "cpu_ms_total": ..., "modules": { "<module_id>": { "cpu_ms_total": ..., "share": ... } } },
+          "memory": { "limit_bytes": ..., "queued_bytes": ..., "high_water_mark": ...,
+                      "modules": { "<module_id>": { "limit_bytes": ..., "queued_bytes": ..., "high_water_mark": ... } } }
         }
 
-        :returns: A dict with a `modules` list and a `flows` dict, as described above.
+        :returns: A dict with a `modules` list, a `links` list, an `executors` dict, a `flows` dict,
+            the `cpu` dict of the registered profiler and the `memory` dict of the registered memory governor
+            (`None` without one), as described above.
         """
 
-        def _ms(v: Optional[float]) -> Optional[float]:
-            """
-            Convert a duration from seconds to rounded milliseconds.
-
-            :param v: Duration in seconds, or `None`.
-            :returns: Duration in milliseconds rounded to 3 decimals, or `None` if *v* is `None`.
-            """
-            return round(v * 1_000.0, 3) if v is not None else None
-
         with self._module_lock:
             modules = [m.snapshot() for m in self._modules.values()]
 
+        with self._link_lock:
+            links = [link.snapshot() for link in self._links.values()]
+
+        with self._executor_lock:
+            executors = {name: executor.snapshot() for name, executor in self._executors.items()}
+
         with self._flow_lock:
             flow_ids = list(self._flows.keys())
 
@@ -699,16 +1587,17 @@ class MetricsRegistry:
         for fid in flow_ids:
             stats = self._flows[fid]
             flows[fid] = {
-                "end_to_end_latency_ms": {
-                    "p50": _ms(stats.percentile(50)),
-                    "p95": _ms(stats.percentile(95)),
-                    "p99": _ms(stats.percentile(99)),
-                    "mean": _ms(stats.mean),
-                    "sample_count": stats.count,
-                }
+                "end_to_end_latency_ms": stats.summary()
             }
 
-        return {"modules": modules, "flows": flows}
+        profiler = self._profiler
+        cpu = profiler.cpu_shares() if profiler is not None else None
+
+        governor = self._memory_governor
+        memory = governor.snapshot() if governor is not None else None
+
+        return {"modules": modules, "links": links, "executors": executors, "flows": flows, "cpu": cpu,
+                "memory": memory}
 
 
 metrics_registry = MetricsRegistry()
@@ -1,2 +1,2 @@
-from .interfaces import Data, Log, InstalledPackage, ModuleData, MothershipData
+from .interfaces import Data, DataSnapshot, Log, InstalledPackage, ModuleData, MothershipData
 from .configuration import Module, TagModule, InputModule, VariableModule, OutputModule, ProcessorModule
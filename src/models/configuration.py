@@ -6,10 +6,40 @@ import string
 import os
 import random
 import ast
+import copy
 
 # Internal imports.
 import models.validations
 
+_env_generation: int = 0
+"""Increased whenever the environment variables change. Resolved attribute values of older generations are stale."""
+
+_resolved_values: dict[tuple[int, str], tuple] = {}
+"""
+The resolved attribute values of all module configurations (see Module.__getattribute__).
+
+Maps (id(configuration), attribute name) to (class, raw value, env generation, resolved value). An entry is only
+used if class, raw value (by identity) and generation still match, so it can neither outlive a change of the
+attribute or the environment, nor be mistaken for the attribute of a new configuration which reuses the id of a
+collected one. Kept outside the configurations, since their __dict__ is expected to only hold their fields.
+"""
+
+_immutable_types: frozenset[type] = frozenset({str, int, float, bool, type(None)})
+"""Resolved values of these types are handed out as they are, all others as copies."""
+
+_resolved_values_limit: int = 100_000
+"""The cache is cleared once it holds more entries, e.g. after many configurations were created and collected."""
+
+
+def invalidate_env_cache():
+    """
+    Discards all resolved attribute values of module configurations.
+    Has to be called whenever environment variables referenced by configurations (${env.<name>}) change.
+    """
+    global _env_generation
+    _env_generation += 1
+    _resolved_values.clear()
+
 
 @dataclass
 class Module:
@@ -80,8 +110,34 @@ class Module:
     def __getattribute__(self, name):
         """
         Replace all environment variables if attribute is accessed for non-dynamic attributes.
+
+        The resolved value is cached until the attribute or the environment changes (see invalidate_env_cache),
+        so the field metadata is only evaluated once. Resolved values which would be new, mutable objects on every
+        uncached access (e.g. lists) are handed out as copies.
+        """
+        input_value = object.__getattribute__(self, name)
+        key = (id(self), name)
+        entry = _resolved_values.get(key)
+        if (entry is not None and entry[1] is input_value and entry[2] == _env_generation
+                and entry[0] is type(self)):
+            resolved = entry[3]
+        else:
+            resolved = Module._resolve(self, name, input_value)
+            if len(_resolved_values) >= _resolved_values_limit:
+                _resolved_values.clear()
+            _resolved_values[key] = (type(self), input_value, _env_generation, resolved)
+        if resolved is input_value or type(resolved) in _immutable_types:
+            return resolved
+        return copy.deepcopy(resolved)
+
+    def _resolve(self, name, input_value):
+        """
+        Replace all environment variables in the value of an attribute for non-dynamic attributes.
+
+        :param name: The name of the attribute.
+        :param input_value: The raw value of the attribute.
+        :returns: The resolved value.
         """
-        input_value = super().__getattribute__(name)
         # Get the field metadata.
         try:
             dataclass_fields = super().__getattribute__('__dataclass_fields__')
@@ -184,13 +240,87 @@ class ProcessorModule(Module):
         default=False)
     worker_count_per_link: int = field(
         metadata=dict(description="The number of worker threads created for each linked module. "
-                                  "Data objects are distributed between workers in round-robin order. "
-                                  "Higher values can improve throughput but may result in out-of-order processing. "
+                                  "Data objects are distributed between workers in round-robin order, "
+                                  "or by partition_key if it is set. "
+                                  "Higher values can improve throughput but may result in out-of-order processing, "
+                                  "unless a partition_key is set. "
                                   "Set to 0 to use spawn mode: a new thread is created for every call instead "
                                   "of using persistent workers. In this mode, forward_latest_data_only is ignored.",
                       category="general",
                       required=False),
         default=1)
+    partition_key: str = field(
+        metadata=dict(description="If set, data objects are distributed between the workers of a link by the hash "
+                                  "of this key instead of in round-robin order. Data objects with the same key "
+                                  "are always forwarded by the same worker and therefore stay in order. "
+                                  "Use 'measurement', 'tags.<name>' or 'fields.<name>'. Data objects without "
+                                  "the key are forwarded by the first worker.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Regex(r"^(measurement|(tags|fields)\..+)?$",
+                                                        error="'{input}' is not a valid partition key. Use "
+                                                              "'measurement', 'tags.<name>' or 'fields.<name>'.")),
+        default="")
+    batch_size_per_link: int = field(
+        metadata=dict(description="The maximum number of data objects a worker hands to a linked module at once. "
+                                  "Linked modules can process a batch more efficiently than single data objects, "
+                                  "if they implement run_batch. 1 disables batching. "
+                                  "Has no effect in spawn mode or if forward_latest_data_only is true.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=1, exclusive=False)),
+        default=1)
+    batch_latency_ms_per_link: int = field(
+        metadata=dict(description="The maximum time in milliseconds a worker waits for a batch to fill up, "
+                                  "once it holds the first data object. 0 forwards whatever is queued at once. "
+                                  "Only used if batch_size_per_link is greater than 1.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
+    copy_on_write: bool = field(
+        metadata=dict(description="If true, all linked modules share one snapshot of a data object instead of "
+                                  "receiving a deep copy each. A linked module only gets a private copy of a "
+                                  "mutable field or tag value (e.g. a list) once it accesses it. "
+                                  "Recommended for modules with many links.",
+                      category="general",
+                      required=False),
+        default=False)
+    fuse_links: bool = field(
+        metadata=dict(description="If true, and this module has exactly one link to a processor which is not "
+                                  "thread safe and is not linked by any other module, the data is handed over to "
+                                  "that processor directly on the same thread instead of through a worker. "
+                                  "Chains of such processors are executed as one unit. The worker settings of "
+                                  "the link have no effect then.",
+                      category="general",
+                      required=False),
+        default=False)
+    execution: str = field(
+        metadata=dict(description="Where the module logic is executed. 'thread': in the threads of the "
+                                  "application. 'process': in a pool of worker processes, so CPU-bound "
+                                  "processors are not slowed down by the global interpreter lock. Results are "
+                                  "forwarded in order. Only for processors which do not depend on a start "
+                                  "routine or on dynamic variables of other modules.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.OneOf(["thread", "process"])),
+        default="thread")
+    process_count: int = field(
+        metadata=dict(description="The number of worker processes if execution is 'process'. "
+                                  "0 uses one process per CPU.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
+    max_queue_mb: int = field(
+        metadata=dict(description="The maximum estimated size in MB of the data objects queued for this module, "
+                                  "in the queues of all links to it and its internal queue (if any). Once "
+                                  "reached, further data objects are dropped, like with a full queue (see "
+                                  "BACKPRESSURE_TIMEOUT). 0 uses the default limit (QUEUE_LIMIT_MB).",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
 
 
 @dataclass
@@ -227,13 +357,52 @@ class TagModule(Module):
         default=False)
     worker_count_per_link: int = field(
         metadata=dict(description="The number of worker threads created for each linked module. "
-                                  "Data objects are distributed between workers in round-robin order. "
-                                  "Higher values can improve throughput but may result in out-of-order processing. "
+                                  "Data objects are distributed between workers in round-robin order, "
+                                  "or by partition_key if it is set. "
+                                  "Higher values can improve throughput but may result in out-of-order processing, "
+                                  "unless a partition_key is set. "
                                   "Set to 0 to use spawn mode: a new thread is created for every call instead "
                                   "of using persistent workers. In this mode, forward_latest_data_only is ignored.",
                       category="general",
                       required=False),
         default=1)
+    partition_key: str = field(
+        metadata=dict(description="If set, data objects are distributed between the workers of a link by the hash "
+                                  "of this key instead of in round-robin order. Data objects with the same key "
+                                  "are always forwarded by the same worker and therefore stay in order. "
+                                  "Use 'measurement', 'tags.<name>' or 'fields.<name>'. Data objects without "
+                                  "the key are forwarded by the first worker.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Regex(r"^(measurement|(tags|fields)\..+)?$",
+                                                        error="'{input}' is not a valid partition key. Use "
+                                                              "'measurement', 'tags.<name>' or 'fields.<name>'.")),
+        default="")
+    batch_size_per_link: int = field(
+        metadata=dict(description="The maximum number of data objects a worker hands to a linked module at once. "
+                                  "Linked modules can process a batch more efficiently than single data objects, "
+                                  "if they implement run_batch. 1 disables batching. "
+                                  "Has no effect in spawn mode or if forward_latest_data_only is true.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=1, exclusive=False)),
+        default=1)
+    batch_latency_ms_per_link: int = field(
+        metadata=dict(description="The maximum time in milliseconds a worker waits for a batch to fill up, "
+                                  "once it holds the first data object. 0 forwards whatever is queued at once. "
+                                  "Only used if batch_size_per_link is greater than 1.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
+    copy_on_write: bool = field(
+        metadata=dict(description="If true, all linked modules share one snapshot of a data object instead of "
+                                  "receiving a deep copy each. A linked module only gets a private copy of a "
+                                  "mutable field or tag value (e.g. a list) once it accesses it. "
+                                  "Recommended for modules with many links.",
+                      category="general",
+                      required=False),
+        default=False)
 
 
 @dataclass
@@ -255,13 +424,52 @@ class VariableModule(Module):
         default=False)
     worker_count_per_link: int = field(
         metadata=dict(description="The number of worker threads created for each linked module. "
-                                  "Data objects are distributed between workers in round-robin order. "
-                                  "Higher values can improve throughput but may result in out-of-order processing. "
+                                  "Data objects are distributed between workers in round-robin order, "
+                                  "or by partition_key if it is set. "
+                                  "Higher values can improve throughput but may result in out-of-order processing, "
+                                  "unless a partition_key is set. "
                                   "Set to 0 to use spawn mode: a new thread is created for every call instead "
                                   "of using persistent workers. In this mode, forward_latest_data_only is ignored.",
                       category="general",
                       required=False),
         default=1)
+    partition_key: str = field(
+        metadata=dict(description="If set, data objects are distributed between the workers of a link by the hash "
+                                  "of this key instead of in round-robin order. Data objects with the same key "
+                                  "are always forwarded by the same worker and therefore stay in order. "
+                                  "Use 'measurement', 'tags.<name>' or 'fields.<name>'. Data objects without "
+                                  "the key are forwarded by the first worker.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Regex(r"^(measurement|(tags|fields)\..+)?$",
+                                                        error="'{input}' is not a valid partition key. Use "
+                                                              "'measurement', 'tags.<name>' or 'fields.<name>'.")),
+        default="")
+    batch_size_per_link: int = field(
+        metadata=dict(description="The maximum number of data objects a worker hands to a linked module at once. "
+                                  "Linked modules can process a batch more efficiently than single data objects, "
+                                  "if they implement run_batch. 1 disables batching. "
+                                  "Has no effect in spawn mode or if forward_latest_data_only is true.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=1, exclusive=False)),
+        default=1)
+    batch_latency_ms_per_link: int = field(
+        metadata=dict(description="The maximum time in milliseconds a worker waits for a batch to fill up, "
+                                  "once it holds the first data object. 0 forwards whatever is queued at once. "
+                                  "Only used if batch_size_per_link is greater than 1.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
+    copy_on_write: bool = field(
+        metadata=dict(description="If true, all linked modules share one snapshot of a data object instead of "
+                                  "receiving a deep copy each. A linked module only gets a private copy of a "
+                                  "mutable field or tag value (e.g. a list) once it accesses it. "
+                                  "Recommended for modules with many links.",
+                      category="general",
+                      required=False),
+        default=False)
     measurement: str = field(
         metadata=dict(description="The measurement name.",
                       category="basic",
@@ -295,3 +503,39 @@ class OutputModule(Module):
                       category="basic",
                       required=False),
         default=False)
+    max_in_flight: int = field(
+        metadata=dict(description="The maximum number of data objects stored concurrently, if the module "
+                                  "is implemented asynchronously and the shared async runtime is enabled "
+                                  "(ASYNC_LOOP_THREADS greater than 0). Data objects may then be stored "
+                                  "out of order. 1 stores one data object after the other.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=1, exclusive=False)),
+        default=1)
+    max_batch_size: int = field(
+        metadata=dict(description="The maximum number of data objects stored at once. If greater than 1, the "
+                                  "queued data objects are collected into batches, which are stored by a "
+                                  "single call, if the module supports it. 1 stores one data object after "
+                                  "the other.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=1, exclusive=False)),
+        default=1)
+    max_batch_latency_ms: int = field(
+        metadata=dict(description="The maximum time in milliseconds to wait for further data objects "
+                                  "before an incomplete batch is stored (see max_batch_size). "
+                                  "0 stores the data objects which are already queued.",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
+    max_queue_mb: int = field(
+        metadata=dict(description="The maximum estimated size in MB of the data objects queued for this module, "
+                                  "in its internal queue and the queues of all links to it. Once reached, "
+                                  "further data objects are buffered (if configured) or dropped, like with a "
+                                  "full queue (see BACKPRESSURE_TIMEOUT). 0 uses the default limit "
+                                  "(QUEUE_LIMIT_MB).",
+                      category="general",
+                      required=False,
+                      validate=models.validations.Range(min=0, exclusive=False)),
+        default=0)
@@ -1,9 +1,11 @@
 """
 Models used for interfaces and similar things.
 """
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from dataclasses import dataclass, field
+from decimal import Decimal
 from typing import Any, Optional
+import copy
 
 
 @dataclass
@@ -28,6 +30,224 @@ class Data:
         default_factory=dict)
 
 
+_IMMUTABLE_TYPES: tuple[type, ...] = (str, int, float, complex, bool, bytes, type(None),
+                                      date, datetime, timedelta, Decimal)
+"""Value types which can not be changed in place and are therefore never copied by copy-on-write copies."""
+
+
+def _is_immutable(value: Any) -> bool:
+    """
+    Checks if a value can be shared between data objects without ever being changed in place.
+
+    :param value: The value to check.
+    :returns: True if the value (and everything it contains) is immutable.
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in value)
+    return False
+
+
+class CopyOnWriteDict(dict):
+    """
+    A fields or tags dict whose mutable values are shared with other copies of the same snapshot.
+
+    The top level is an ordinary dict of its own, so adding, replacing or removing a key never affects
+    another copy. Mutable values (e.g. lists or nested dicts) are shared until they are handed out for
+    the first time - by indexing, get, items, values, pop, ... - since that is the only way to change them
+    in place. They are deep-copied at that moment. Immutable values are never copied at all.
+
+    Bulk operations implemented in C (e.g. dict(d), {**d} or json.dumps) read the shared values directly.
+    That is fine for reading, but the values obtained that way must not be changed in place.
+    """
+    __slots__ = ("_shared",)
+
+    def __init__(self, snapshot: dict, shared: frozenset = frozenset()):
+        """
+        :param snapshot: The snapshot dict. It is not modified.
+        :param shared: The keys of the snapshot whose (mutable) values are shared and not yet copied.
+        """
+        super().__init__(snapshot)
+        self._shared: Optional[set] = set(shared) if shared else None
+        """The keys whose values are still shared with the snapshot. None if there are none."""
+
+    def _own(self, key: Any):
+        """
+        Replaces the shared value of the given key with a private deep copy.
+
+        :param key: The key.
+        """
+        if self._shared and key in self._shared:
+            dict.__setitem__(self, key, copy.deepcopy(dict.__getitem__(self, key)))
+            self._shared.discard(key)
+
+    def _own_all(self):
+        """
+        Replaces all shared values with private deep copies.
+        """
+        if self._shared:
+            for key in list(self._shared):
+                self._own(key)
+
+    def _release(self, keys):
+        """
+        Forgets about the given keys being shared, since their values were replaced or removed.
+
+        :param keys: The keys.
+        """
+        if self._shared:
+            self._shared.difference_update(keys)
+
+    def shared_keys(self) -> frozenset:
+        """
+        Returns the keys whose values are still shared with other copies of the same snapshot.
+
+        :returns: The keys.
+        """
+        return frozenset(self._shared) if self._shared else frozenset()
+
+    def __getitem__(self, key):
+        self._own(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._own(key)
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self._own(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key, *args):
+        self._own(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        if self._shared and key in self._shared:
+            self._shared.discard(key)
+            value = copy.deepcopy(value)
+        return key, value
+
+    def values(self):
+        self._own_all()
+        return super().values()
+
+    def items(self):
+        self._own_all()
+        return super().items()
+
+    def copy(self) -> dict:
+        self._own_all()
+        return dict(self)
+
+    def __setitem__(self, key, value):
+        self._release((key,))
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._release((key,))
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        self._release(other.keys())
+        super().update(other)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        self._own_all()
+        return super().__or__(other)
+
+    def clear(self):
+        self._shared = None
+        super().clear()
+
+    def __copy__(self) -> dict:
+        return self.copy()
+
+    def __deepcopy__(self, memo) -> dict:
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        # Unpickled (e.g. in another process) as an ordinary dict, which is a copy anyway.
+        return dict, (dict(self),)
+
+
+def _snapshot_dict(values: dict) -> tuple[dict, frozenset]:
+    """
+    Takes a snapshot of a fields or tags dict for copy-on-write copies.
+
+    Immutable values are taken over as they are. Mutable values are deep-copied once, so later changes of the
+    original do not show up in the snapshot - unless the original is a copy-on-write copy itself, whose still
+    shared values belong to a snapshot nobody changes and are therefore taken over as well.
+
+    :param values: The fields or tags dict.
+    :returns: The snapshot and the keys of its mutable values.
+    """
+    if not isinstance(values, dict):
+        return copy.deepcopy(values), frozenset()
+    already_shared = values.shared_keys() if isinstance(values, CopyOnWriteDict) else frozenset()
+    snapshot = {}
+    shared = []
+    # dict.items, so reading a copy-on-write dict does not make private copies of its shared values.
+    for key, value in dict.items(values):
+        if not _is_immutable(value):
+            if key not in already_shared:
+                value = copy.deepcopy(value)
+            shared.append(key)
+        snapshot[key] = value
+    return snapshot, frozenset(shared)
+
+
+class DataSnapshot:
+    """
+    An unchangeable snapshot of a data object, from which any number of copy-on-write copies can be taken.
+
+    Used for forwarding one data object to several linked modules: instead of one deep copy per link,
+    the snapshot is taken once and every link receives a cheap copy sharing its values (see CopyOnWriteDict).
+
+    :param data: The data object to take the snapshot of.
+    """
+    __slots__ = ("measurement", "time", "_fields", "_fields_shared", "_tags", "_tags_shared")
+
+    def __init__(self, data: Data):
+        self.measurement: str = data.measurement
+        """The measurement name."""
+        self.time: Any = data.time if _is_immutable(data.time) else copy.deepcopy(data.time)
+        """The timestamp."""
+        self._fields, self._fields_shared = _snapshot_dict(data.fields)
+        self._tags, self._tags_shared = _snapshot_dict(data.tags)
+
+    def copy(self) -> Data:
+        """
+        Creates a new data object sharing the values of the snapshot until they are changed.
+
+        :returns: The data object.
+        """
+        return Data(measurement=self.measurement,
+                    fields=self._copy_dict(self._fields, self._fields_shared),
+                    time=self.time if _is_immutable(self.time) else copy.deepcopy(self.time),
+                    tags=self._copy_dict(self._tags, self._tags_shared))
+
+    @staticmethod
+    def _copy_dict(snapshot: Any, shared: frozenset) -> Any:
+        """
+        Creates a copy-on-write copy of a snapshot dict.
+
+        :param snapshot: The snapshot of the fields or tags.
+        :param shared: The keys of the mutable values of the snapshot.
+        :returns: The copy. Something else than a dict (which is not intended for fields and tags) is deep-copied.
+        """
+        if isinstance(snapshot, dict):
+            return CopyOnWriteDict(snapshot, shared)
+        return copy.deepcopy(snapshot)
+
+
 @dataclass
 class ModuleData:
     """
@@ -9,18 +9,23 @@ import os
 import asyncio
 import inspect
 import threading
-from queue import Queue, Full
-from typing import Any, Optional
+from queue import Queue, Full, Empty
+from typing import Any, Optional, NamedTuple
+import itertools
 import copy
 import ast
 import time
+import zlib
+import functools
 
 # Internal imports.
 import config
 import data_layer
 import models
 import utils.plugin_interface
-from metrics import data_context_map, _DataContext, metrics_registry
+from utils.async_runtime import async_runtime
+from utils.memory_governor import memory_governor, ByteQueue
+from metrics import data_context_map, _DataContext, metrics_registry, LinkMetrics, tracer, _AtomicInt
 
 
 class DynamicVariableException(Exception):
@@ -31,6 +36,143 @@ class DynamicVariableException(Exception):
     pass
 
 
+class _Template:
+    """
+    An input of AbstractModule._dyn, parsed once for a combination of input string and data types.
+
+    Holds the extracted dynamic variables and the converters to try. An input without dynamic variables
+    does not depend on anything but itself, so its result (or error) is computed once as well.
+
+    :param input_string: The input, as string.
+    :param data_type: The data types to try, as given to _dyn.
+    :raises DynamicVariableException: If a data type is unknown or a marker is incomplete.
+    """
+    __slots__ = ("input_string", "data_type", "converters", "variables", "whole", "constant", "constant_error")
+
+    available_data_types = {"str": str, "bool": bool, "float": float, "int": int, "list": list, "dict": dict}
+    """A dictionary containing all available data types for conversion."""
+
+    immutable_types = (str, int, float, bool, type(None), bytes, complex)
+    """Constant results of these types are handed out as they are, all others as copies."""
+
+    _unset = object()
+    """Marks a template without constant result."""
+
+    def __init__(self, input_string: str, data_type: list):
+        self.input_string: str = input_string
+        """The input, as string."""
+        self.data_type: list = data_type
+        """The data types to try, as given to _dyn. Used for error messages."""
+        self.converters: list[type] = []
+        """The data types to try."""
+        for item in data_type:
+            key = str(item).lower()
+            if key not in self.available_data_types:
+                raise DynamicVariableException(
+                    f"Unknown data type {item}. "
+                    f"Allowed types are: {', '.join(self.available_data_types)}."
+                )
+            self.converters.append(self.available_data_types[key])
+
+        variables: list[str] = []
+        remaining = input_string
+        while True:
+            # Search the first marker, take the variable up to the next closing brace and remove
+            # all occurrences of that variable before searching again.
+            start = remaining.find("${")
+            if start == -1:
+                break
+            end = remaining[start:].find("}")
+            if end == -1:
+                raise DynamicVariableException("Found an incomplete marker in '{0}'.".format(input_string))
+            end = start + end
+            variable_text = remaining[start + len("${"):end]
+            variables.append(variable_text)
+            remaining = remaining.replace("${" + variable_text + "}", '')
+
+        self.variables: tuple[tuple[str, list[str]], ...] = tuple(
+            ("${" + variable_text + "}", variable_text.split('.', 1)) for variable_text in variables)
+        """The markers of the dynamic variables with their module id and key, in order of appearance."""
+        self.whole: bool = len(variables) == 1 and input_string.startswith("${") and input_string.endswith("}")
+        """Is the input a single dynamic variable. Its value then keeps its data type."""
+        self.constant = self._unset
+        """The result, if the input has no dynamic variables."""
+        self.constant_error: Optional[str] = None
+        """The error message, if the input has no dynamic variables and can not be converted."""
+        if not self.variables:
+            try:
+                self.constant = self.convert(self.literal(input_string))
+            except DynamicVariableException as e:
+                self.constant_error = str(e)
+
+    @staticmethod
+    def literal(value: Any) -> Any:
+        """
+        Makes strings to lists, dicts, numbers etc., if they are.
+
+        :param value: The value.
+        :returns: The evaluated value, or the value itself if it is no literal.
+        """
+        if not isinstance(value, str):
+            # The value of a single dynamic variable, which is only evaluated if it is a string.
+            return value
+        try:
+            return ast.literal_eval(value)
+        except Exception as e:
+            return value
+
+    def convert(self, value: Any) -> Any:
+        """
+        Converts the value to the first of the data types which fits.
+
+        :param value: The value.
+        :returns: The converted value. The value itself if no data types are given.
+        :raises DynamicVariableException: If the value can not be converted to any of the data types.
+        """
+        for defined_data_type in self.converters:
+            try:
+                if defined_data_type == list:
+                    if not isinstance(value, list):
+                        value = [value]
+                else:
+                    value = defined_data_type(value)
+                return value
+            except Exception as e:
+                continue
+        if self.converters:
+            raise DynamicVariableException(
+                f"Could not convert dynamic variable '{value}' "
+                f"to one of the given data types: {', '.join(str(x) for x in self.data_type)}.")
+        return value
+
+    def result(self) -> Any:
+        """
+        The result of an input without dynamic variables.
+
+        :returns: The result. Mutable results are copied, so callers can not change the cached one.
+        :raises DynamicVariableException: If the input can not be converted.
+        """
+        if self.constant_error is not None:
+            raise DynamicVariableException(self.constant_error)
+        if isinstance(self.constant, self.immutable_types):
+            return self.constant
+        return copy.deepcopy(self.constant)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_template(input_string: str, data_type: tuple) -> _Template:
+    """
+    Returns the parsed template for a combination of input string and data types.
+    The least recently used templates are dropped once 1024 are cached.
+
+    :param input_string: The input, as string.
+    :param data_type: The data types to try.
+    :returns: The template.
+    :raises DynamicVariableException: If a data type is unknown or a marker is incomplete.
+    """
+    return _Template(input_string=input_string, data_type=list(data_type))
+
+
 class ModuleWorker:
     """
     A single persistent worker thread for one linked module.
@@ -42,6 +184,10 @@ class ModuleWorker:
         Any pending data is overwritten by newer arrivals.
         Use for high-frequency sensors where backlog processing is meaningless.
         If False (default), all data objects are queued and processed in order.
+    :param batch_size: The maximum number of queued data objects handed to the linked module at once.
+        Only used in queue mode. 1 (default) disables batching.
+    :param batch_latency: The maximum seconds a worker waits for a batch to fill up, once it holds the first
+        data object of the batch. 0 (default) hands over whatever is queued without waiting.
     """
 
     stop_flush_share: float = 0.8
@@ -59,29 +205,51 @@ class ModuleWorker:
             configuration_id: str,
             module_id: str,
             logger: logging.Logger,
-            forward_latest_data_only: bool = False
+            forward_latest_data_only: bool = False,
+            batch_size: int = 1,
+            batch_latency: float = 0.0
     ):
         """
         Initialize the worker thread for the linked module.
 
-        Depending on ``forward_latest_data_only``, the worker either runs in:
+        Depending on ``forward_latest_data_only`` and ``batch_size``, the worker either runs in:
 
         - **Latest-only mode**: keeps only the newest submitted data object.
         - **Queue mode**: processes all submitted data objects in FIFO order.
+        - **Batch mode**: queue mode, but hands the queued data objects to run_batch of the linked module
+          in batches of up to ``batch_size``.
 
         :param configuration_id: The id of the current module.
         :param module_id: The id of the linked module.
         :param logger: The logger instance of the parent module.
         :param forward_latest_data_only: Whether only the latest data object should be processed.
+        :param batch_size: The maximum number of data objects handed to the linked module at once.
+        :param batch_latency: The maximum seconds to wait for a batch to fill up.
         """
         self.module_id = module_id
         self.logger = logger
         self.forward_latest_data_only = forward_latest_data_only
+        self.batch_size: int = max(1, batch_size)
+        """The maximum number of data objects handed to the linked module at once."""
+        self.batch_latency: float = max(0.0, batch_latency)
+        """The maximum seconds to wait for a batch to fill up."""
 
         # Slow-worker tracking (shared by both modes, written only by the worker thread).
         self.processing_since: Optional[float] = None
         self.slow_worker_warned: bool = False
 
+        # Per-link metrics (see stats).
+        self.started_at: float = time.monotonic()
+        """When the worker was started."""
+        self.busy_seconds: float = 0.0
+        """The time spent inside the linked module, excluding the current call. Written only by the worker thread."""
+        self.high_water_mark: int = 0
+        """The highest number of data objects waiting to be forwarded so far."""
+        self.drops = _AtomicInt()
+        """The number of data objects dropped due to a full queue or on stop."""
+        self.coalesced: int = 0
+        """The number of pending data objects overwritten by newer ones in latest-only mode. Guarded by slot_lock."""
+
         self.stop_deadline: Optional[float] = None
         """
         The point in time (time.monotonic) after which the worker gives up on its backlog.
@@ -99,13 +267,13 @@ class ModuleWorker:
             self.stop_flag: bool = False
             target = self._loop_latest
         else:
-            # Queue mode.
-            self.queue: Queue = Queue(maxsize=config.STOP_LIMIT)
+            # Queue mode. The queued data objects are charged to the budget of the linked module.
+            self.queue: ByteQueue = ByteQueue(maxsize=config.STOP_LIMIT, budget=memory_governor.budget(module_id))
             self.last_warned_multiple: int = 0
             """Number showing multiple for the last warning log message. Shows that the queue is growing."""
             self.error_issued: bool = False
             """Flag showing if a error log message, that the queue is full, was issued."""
-            target = self._loop
+            target = self._loop if self.batch_size == 1 else self._loop_batch
 
         self.thread = threading.Thread(
             target=target,
@@ -119,8 +287,10 @@ class ModuleWorker:
 
         In latest-only mode, any previously pending data is replaced by the newly submitted object.
 
-        In queue mode, the data is appended to the internal queue unless the queue is full,
-        in which case the data is dropped.
+        In queue mode, the data is appended to the internal queue unless the queue is full or the memory
+        budget of the linked module is exceeded (see utils.memory_governor), in which case the data is dropped.
+        With config.BACKPRESSURE_TIMEOUT, the queue is waited for that long first, and the module the data
+        originates from is asked to slow down.
 
         :param data: The data object to forward to the linked module.
         """
@@ -141,20 +311,29 @@ class ModuleWorker:
         # Latest-only mode.
         if self.forward_latest_data_only:
             with self.slot_lock:
+                if self.slot is not None:
+                    self.coalesced += 1
                 self.slot = data
+            self.high_water_mark = 1
             self.has_data.set()  # Wake the worker (idempotent if already set).
             return
 
         # Queue mode.
         qsize = self.queue.qsize()
-        if self.queue.full():
+        if self.queue.full() or self.queue.over_budget():
+            if config.BACKPRESSURE_TIMEOUT > 0:
+                # Backpressure: slow down the source and wait for the worker to catch up.
+                AbstractModule._signal_backpressure(data)
+                if self.queue.put_within_budget(data, timeout=config.BACKPRESSURE_TIMEOUT):
+                    return
+            self.drops.inc()
             if not self.error_issued:
-                self.logger.error(f"Queue for linked module '{self.module_id}' is full "
-                                  f"({config.STOP_LIMIT} data objects). Dropping data...")
+                self.logger.error(f"Queue for linked module '{self.module_id}' is full ({qsize}/{config.STOP_LIMIT} "
+                                  f"data objects, {self.queue.bytes} bytes). Dropping data...")
                 self.error_issued = True
             return
         elif qsize < config.STOP_LIMIT - 100 and self.error_issued:  # 100 as hysteresis band.
-            self.logger.info(f"Queue for linked module '{self.module_id}' is back below stop limit.")
+            self.logger.info(f"Queue for linked module '{self.module_id}' is back below its limits.")
             self.error_issued = False
 
         current_multiple = qsize // config.WARNING_LIMIT
@@ -168,6 +347,38 @@ class ModuleWorker:
             self.last_warned_multiple = current_multiple
 
         self.queue.put_nowait(data)
+        if qsize >= self.high_water_mark:
+            self.high_water_mark = qsize + 1
+
+    def qsize(self) -> int:
+        """
+        The number of data objects waiting to be forwarded by this worker.
+
+        :returns: The queue size. In latest-only mode, 1 if a data object is pending, else 0.
+        """
+        if self.forward_latest_data_only:
+            return 0 if self.slot is None else 1
+        return self.queue.qsize()
+
+    def stats(self) -> dict:
+        """
+        The lifetime counters of this worker, for the per-link metrics (see metrics.LinkMetrics).
+
+        :returns: A dict with `current_bytes` (the estimated size of the queued data objects, None in latest-only
+            mode), `high_water_mark`, `drop_total`, `coalesced_total`, `busy_ms_total` and `busy_ratio`
+            (the share of the time since the start spent inside the linked module) keys.
+        """
+        now = time.monotonic()
+        since = self.processing_since
+        busy = self.busy_seconds + (now - since if since is not None else 0.0)
+        return {
+            "current_bytes": None if self.forward_latest_data_only else self.queue.bytes,
+            "high_water_mark": self.high_water_mark,
+            "drop_total": self.drops.value,
+            "coalesced_total": self.coalesced,
+            "busy_ms_total": round(busy * 1_000.0, 3),
+            "busy_ratio": round(min(1.0, busy / max(now - self.started_at, 1e-9)), 4),
+        }
 
     def _loop_latest(self):
         """
@@ -199,7 +410,18 @@ class ModuleWorker:
                 self.logger.error(f"Could not execute linked module '{self.module_id}': {e}",
                                   exc_info=config.EXC_INFO)
             finally:
-                self.processing_since = None  # Always clear, even on exception.
+                self._account_busy_time()
+
+    def _account_busy_time(self):
+        """
+        Adds the time of the call to the linked module which just ended to busy_seconds and clears processing_since.
+        Always called after a call, even on exception.
+        """
+        since = self.processing_since
+        # Cleared first: a concurrent stats call may miss this call for a moment, but never counts it twice.
+        self.processing_since = None
+        if since is not None:
+            self.busy_seconds += time.monotonic() - since
 
     def _loop(self):
         """
@@ -216,6 +438,7 @@ class ModuleWorker:
             if self.stop_deadline is not None and time.monotonic() >= self.stop_deadline:
                 dropped = self.queue.qsize()
                 if dropped:
+                    self.drops.inc(dropped)
                     self.logger.warning(f"Worker for linked module '{self.module_id}' could not work off its "
                                         f"backlog within the stop timeout. Dropping {dropped} data object(s).")
                 break
@@ -231,9 +454,63 @@ class ModuleWorker:
                 self.logger.error(f"Could not execute linked module '{self.module_id}': {e}",
                                   exc_info=config.EXC_INFO)
             finally:
-                self.processing_since = None  # Always clear, even on exception.
+                self._account_busy_time()
                 self.queue.task_done()
 
+    def _loop_batch(self):
+        """
+        Worker loop for batch mode.
+
+        Waits for the first data object of a batch, then collects further queued data objects until either
+        batch_size is reached or batch_latency has passed, and hands the batch to run_batch of the linked
+        module. Modules without run_batch receive the data objects one by one via run. The order of
+        submission is kept, within and across batches.
+
+        Stops like _loop: at the ``None`` sentinel - after forwarding the data objects collected before it -
+        or once the stop deadline set by signal_stop is reached.
+        """
+        stop = False
+        while not stop:
+            if self.stop_deadline is not None and time.monotonic() >= self.stop_deadline:
+                dropped = self.queue.qsize()
+                if dropped:
+                    self.drops.inc(dropped)
+                    self.logger.warning(f"Worker for linked module '{self.module_id}' could not work off its "
+                                        f"backlog within the stop timeout. Dropping {dropped} data object(s).")
+                break
+            data = self.queue.get()
+            if data is None:
+                break
+            batch = [data]
+            deadline = time.monotonic() + self.batch_latency
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    data = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except Empty:
+                    break
+                if data is None:
+                    stop = True
+                    break
+                batch.append(data)
+            try:
+                linked = data_layer.module_data.get(self.module_id)
+                if linked and linked.instance.active:
+                    self.processing_since = time.monotonic()  # Mark start.
+                    run_batch = getattr(linked.instance, "run_batch", None)
+                    if run_batch is not None:
+                        run_batch(batch)
+                    else:
+                        for data in batch:
+                            linked.instance.run(data)
+            except Exception as e:
+                self.logger.error(f"Could not execute linked module '{self.module_id}': {e}",
+                                  exc_info=config.EXC_INFO)
+            finally:
+                self._account_busy_time()
+                for _ in batch:
+                    self.queue.task_done()
+
     def signal_stop(self, timeout: Optional[float] = None):
         """
         Ask the worker thread to stop, without waiting for it.
@@ -292,6 +569,158 @@ class ModuleWorker:
         return self.join(timeout=deadline - time.monotonic())
 
 
+class SpawnPool:
+    """
+    A shared, bounded pool of daemon threads serving all links in spawn mode (worker_count_per_link = 0).
+
+    Threads are started on demand up to max_workers and end after idle_timeout seconds without work.
+    While all threads are busy, data objects wait in a queue of at most max_queue entries, which charges their
+    estimated size to the memory budget named after the pool (see utils.memory_governor).
+    Beyond that, or while the budget is exceeded, they are rejected - or, with config.BACKPRESSURE_TIMEOUT > 0,
+    the source of the flow is asked to slow down and the submission waits up to that timeout for a free slot.
+
+    While a thread executes a task, it carries the name of the link (Link_<source>_to_<target>),
+    so running links can still be told apart - e.g. when a stop routine reports leaked threads.
+
+    :param max_workers: The maximum number of threads.
+    :param max_queue: The maximum number of queued data objects.
+    :param name: The name of the pool, used for its threads and metrics.
+    """
+
+    idle_timeout: float = 60.0
+    """The seconds an idle thread waits for new work before it ends."""
+
+    def __init__(self, max_workers: int, max_queue: int, name: str = "spawn_pool"):
+        self.max_workers = max(1, max_workers)
+        """The maximum number of threads."""
+        self.name = name
+        """The name of the pool, used for its threads and metrics."""
+        self.queue: ByteQueue = ByteQueue(maxsize=max(1, max_queue), budget=memory_governor.budget(name))
+        """The queue of pending tasks: (link name, function, data object, submit timestamp)."""
+        self.lock = threading.Lock()
+        """Guards the thread bookkeeping."""
+        self.threads: set[threading.Thread] = set()
+        """The running threads of the pool."""
+        self.idle: int = 0
+        """The number of threads waiting for work."""
+        self.counter: int = 0
+        """Used to number the threads of the pool."""
+        self.metrics = metrics_registry.register_executor(name=name, max_workers=self.max_workers,
+                                                          queue=self.queue)
+        """The metrics of the pool."""
+
+    def submit(self, name: str, function, data: models.Data) -> bool:
+        """
+        Schedule function(data) on a thread of the pool.
+
+        :param name: The name of the link, set as the thread name while the task is executed.
+        :param function: The function to be called, e.g. the run method of the linked module.
+        :param data: The data object given to the function.
+        :returns: True if the task was accepted, false if it was rejected since the queue is full or over budget.
+        """
+        task = (name, function, data, time.monotonic())
+        try:
+            if self.queue.over_budget():
+                raise Full
+            self.queue.put_nowait(task)
+        except Full:
+            if config.BACKPRESSURE_TIMEOUT <= 0:
+                self.metrics.record_rejected()
+                return False
+            AbstractModule._signal_backpressure(data)
+            if not self.queue.put_within_budget(task, timeout=config.BACKPRESSURE_TIMEOUT):
+                self.metrics.record_rejected()
+                return False
+        self.metrics.record_submitted()
+
+        with self.lock:
+            # Only start a thread if the idle ones can not take all pending tasks.
+            if self.queue.qsize() > self.idle and len(self.threads) < self.max_workers:
+                self.counter += 1
+                thread = threading.Thread(target=self._loop, name=f"{self.name}_{self.counter}", daemon=True)
+                self.threads.add(thread)
+                self.metrics.workers = len(self.threads)
+                thread.start()
+        return True
+
+    def _loop(self):
+        """
+        Executes queued tasks until no task arrived for idle_timeout seconds.
+        """
+        thread = threading.current_thread()
+        thread_name = thread.name
+        while True:
+            with self.lock:
+                self.idle += 1
+            try:
+                name, function, data, submitted = self.queue.get(timeout=self.idle_timeout)
+            except Empty:
+                with self.lock:
+                    self.idle -= 1
+                    # A task may have arrived right after the timeout, without a thread being started for it.
+                    if self.queue.qsize() > self.idle:
+                        continue
+                    self.threads.discard(thread)
+                    self.metrics.workers = len(self.threads)
+                return
+            with self.lock:
+                self.idle -= 1
+                self.metrics.busy += 1
+            self.metrics.record_queue_wait(time.monotonic() - submitted)
+            thread.name = name
+            try:
+                function(data)
+            except Exception as e:
+                logging.getLogger(config.APP_NAME.lower() + '.' + __name__).error(
+                    "Could not execute link '{0}': {1}".format(name, str(e)), exc_info=config.EXC_INFO)
+            finally:
+                thread.name = thread_name
+                with self.lock:
+                    self.metrics.busy -= 1
+                self.queue.task_done()
+
+
+spawn_pool = SpawnPool(max_workers=config.SPAWN_MAX_WORKERS, max_queue=config.SPAWN_MAX_QUEUE)
+"""The pool executing the links in spawn mode of all modules."""
+
+
+class Route(NamedTuple):
+    """
+    The link of a module to one linked module, as resolved by AbstractModule.refresh_routes.
+    """
+    module_id: str
+    """The id of the linked module."""
+    name: str
+    """The name of the link (Link_<source>_to_<target>), e.g. for threads forwarding data through it."""
+    workers: tuple[ModuleWorker, ...]
+    """The persistent workers of the link. Empty in spawn mode."""
+    counter: Any
+    """An itertools.count for the round-robin dispatch. Its next value is drawn atomically, without a lock."""
+    fused: bool = False
+    """Is the linked module called directly on the forwarding thread (see AbstractModule.fused_link)."""
+
+
+class RoutingTable(NamedTuple):
+    """
+    The immutable routing table of a module: everything _call_links needs to forward a data object.
+
+    A new table is built by AbstractModule.refresh_routes whenever the links of the module may have changed
+    and replaces the previous one as a whole, so it can be read on the data path without any lock.
+    """
+    version: int
+    """Increased with every rebuild of the table of a module."""
+    links: frozenset[str]
+    """The ids of all linked modules."""
+    routes: tuple[Route, ...]
+    """One route per linked module, in the configured order."""
+    spawn: bool
+    """Are the links in spawn mode (worker_count_per_link = 0)."""
+    partition_key: str
+    """The configured partition_key. Empty for the round-robin dispatch."""
+    copy_on_write: bool
+    """Do the linked modules share one copy-on-write snapshot of a data object."""
+
+
 _thread_local = threading.local()
 """
 Thread-local storage for persistent async event loops.
@@ -355,27 +784,158 @@ class AbstractModule(ABC):
         """A lock for checking existing workers thread-safe."""
         self._workers: dict[str, list[ModuleWorker]] = {}
         """Worker threads for calling linked modules."""
-        self._worker_index: dict[str, int] = {}
-        """Round-robin worker index for each linked module."""
+        self._routes: Optional[RoutingTable] = None
+        """The current routing table. None until built (again) by refresh_routes."""
+        self._routes_version: int = 0
+        """The version of the latest routing table."""
+        self._spawn_error_issued: bool = False
+        """Flag showing if an error log message, that the spawn pool is saturated, was issued."""
+        self.fused_link: Optional[str] = None
+        """
+        The id of a linked processor which is called directly on the forwarding thread, without a worker.
+        Planned by the configuration (see fuse_links), applied by refresh_routes.
+        """
+        self._link_metrics: dict[str, LinkMetrics] = {}
+        """The metrics of the workers of each linked module."""
+        self._permit_lock = threading.Lock()
+        """A lock for the permit delay."""
+        self._permit_delay: float = 0.0
+        """The seconds the next permit is delayed, due to backpressure of downstream modules."""
+        self._last_backpressure: float = 0.0
+        """The point in time (time.monotonic) backpressure was signaled the last time."""
+        self._permit_acquired: bool = False
+        """Did the module acquire a permit itself since it forwarded data the last time."""
+
+        self.refresh_routes()
+
+    def refresh_routes(self) -> RoutingTable:
+        """
+        Rebuilds the routing table of the module from its configured links.
 
+        Workers are started for newly linked modules and stopped for removed links. Links are expected
+        to change rarely, so instead of checking for changes on every data object, this is called by the
+        configuration whenever modules are started, added or updated - and by _call_links for the first
+        data object after the module was stopped and restarted in place.
+
+        :returns: The new routing table.
+        """
+        links = list(dict.fromkeys(getattr(self.configuration, "links", [])))
         worker_count = getattr(self.configuration, "worker_count_per_link", 1)
-        for module_id in getattr(self.configuration, "links", []):
-            if worker_count > 0:
-                # Persistent-worker mode.
-                self._workers[module_id] = [
-                    ModuleWorker(
-                        configuration_id=self.configuration.id,
-                        module_id=module_id,
-                        logger=self.logger,
-                        forward_latest_data_only=getattr(
-                            self.configuration, "forward_latest_data_only", False)
-                    )
-                    for _ in range(worker_count)
-                ]
-                self._worker_index[module_id] = 0
-            else:
-                # Spawn mode: register the link with an empty list as a sentinel.
-                self._workers[module_id] = []
+        fused = self.fused_link if self.fused_link in links else None
+        with self._workers_lock:
+            rebuild = self._routes is not None
+            existing = set(self._workers.keys())
+
+            # Add workers for newly linked modules.
+            for module_id in links:
+                if module_id in existing or module_id == fused:
+                    continue
+                if worker_count == 0:
+                    # Spawn mode: register the link with an empty list as a sentinel.
+                    if rebuild:
+                        self.logger.info(f"Detected new link to module '{module_id}'. Using spawn mode.")
+                    self._workers[module_id] = []
+                else:
+                    if rebuild:
+                        self.logger.info(f"Detected new link to module '{module_id}'. Starting worker.")
+                    self._workers[module_id] = self._create_workers(module_id=module_id, worker_count=worker_count)
+
+            # Remove workers for unlinked modules and the fused link.
+            removed = {}
+            for module_id in existing - (set(links) - {fused}):
+                if module_id == fused:
+                    self.logger.info(f"Fusing link to module '{module_id}'. Stopping worker.")
+                else:
+                    self.logger.info(f"Detected removed link to module '{module_id}'. Stopping worker.")
+                removed[module_id] = self._workers.pop(module_id)
+                link = self._link_metrics.pop(module_id, None)
+                if link is not None:
+                    metrics_registry.unregister_link(link)
+
+            self._routes_version += 1
+            routes = RoutingTable(
+                version=self._routes_version,
+                links=frozenset(links),
+                routes=tuple(Route(module_id=module_id,
+                                   name=f"Link_{self.configuration.id}_to_{module_id}",
+                                   workers=tuple(self._workers.get(module_id, ())),
+                                   counter=itertools.count(),
+                                   fused=module_id == fused)
+                             for module_id in links),
+                spawn=worker_count == 0,
+                partition_key=getattr(self.configuration, "partition_key", ""),
+                copy_on_write=getattr(self.configuration, "copy_on_write", False))
+            self._routes = routes
+
+        # Stop removed workers outside the lock — .stop() blocks until the thread joins.
+        # The workers are signaled first and then waited for against a single deadline. A worker
+        # which does not make it is left behind rather than blocking the caller.
+        removed_workers = [worker for worker_list in removed.values() for worker in worker_list]
+        if removed_workers:
+            deadline = time.monotonic() + config.STOP_TIMEOUT
+            for worker in removed_workers:
+                worker.signal_stop(timeout=config.STOP_TIMEOUT)
+            for worker in removed_workers:
+                worker.join(timeout=deadline - time.monotonic())
+            leaked = [worker.thread.name for worker in removed_workers if worker.thread.is_alive()]
+            if leaked:
+                self.logger.error("The worker thread(s) of the removed link(s) did not stop within {0} s and are "
+                                  "leaked: {1}.".format(config.STOP_TIMEOUT, ", ".join(leaked)))
+        return routes
+
+    def _create_workers(self, module_id: str, worker_count: int) -> list[ModuleWorker]:
+        """
+        Creates the persistent workers for one linked module, as configured for this module.
+
+        The workers are registered for the per-link metrics.
+
+        :param module_id: The id of the linked module.
+        :param worker_count: The number of workers to create.
+        :returns: The started workers.
+        """
+        workers = [
+            ModuleWorker(
+                configuration_id=self.configuration.id,
+                module_id=module_id,
+                logger=self.logger,
+                forward_latest_data_only=getattr(self.configuration, "forward_latest_data_only", False),
+                batch_size=getattr(self.configuration, "batch_size_per_link", 1),
+                batch_latency=getattr(self.configuration, "batch_latency_ms_per_link", 0) / 1000.0
+            )
+            for _ in range(worker_count)
+        ]
+        if getattr(self.configuration, "forward_latest_data_only", False):
+            dispatch = "latest_only"
+        elif getattr(self.configuration, "partition_key", ""):
+            dispatch = "partitioned"
+        else:
+            dispatch = "round_robin"
+        self._link_metrics[module_id] = metrics_registry.register_link(
+            source_id=self.configuration.id, target_id=module_id, dispatch=dispatch, workers=workers)
+        return workers
+
+    @staticmethod
+    def _partition(data: models.Data, partition_key: str, partitions: int) -> int:
+        """
+        Selects the worker for a data object by the hash of its partition key.
+
+        The hash is stable, so the same key always selects the same worker - even across restarts.
+
+        :param data: The data object.
+        :param partition_key: 'measurement', 'tags.<name>' or 'fields.<name>'.
+        :param partitions: The number of workers.
+        :returns: The index of the worker. 0 if the data object does not have the key.
+        """
+        if partitions == 1:
+            return 0
+        if partition_key == "measurement":
+            value = data.measurement
+        else:
+            container, _, name = partition_key.partition(".")
+            value = (data.tags if container == "tags" else data.fields).get(name, None)
+        if value is None:
+            return 0
+        return zlib.crc32(str(value).encode()) % partitions
 
     @classmethod
     def import_third_party_requirements(cls) -> bool:
@@ -479,14 +1039,117 @@ class AbstractModule(ABC):
                 return False
         return started.is_set()
 
+    permit_delay_min: float = 0.01
+    """The seconds a permit is delayed after the first backpressure signal. Doubled with every further signal."""
+    permit_delay_max: float = 1.0
+    """The maximum seconds a permit is delayed."""
+
+    def signal_backpressure(self):
+        """
+        Asks the module to slow down, since a queue downstream of it is full.
+
+        Called by the link workers and the internal queues of processor and output modules for the module a data
+        object originates from (see config.BACKPRESSURE_TIMEOUT). Every signal doubles the delay of the next
+        permits (see acquire_permit), up to permit_delay_max.
+        """
+        with self._permit_lock:
+            self._permit_delay = min(max(self._permit_delay * 2, self.permit_delay_min), self.permit_delay_max)
+            self._last_backpressure = time.monotonic()
+        metrics = getattr(self, "_metrics", None)
+        if metrics is not None:
+            metrics.record_backpressure()
+
+    def acquire_permit(self) -> bool:
+        """
+        Waits until the module may produce the next data object.
+
+        Returns at once as long as no backpressure was signaled. Otherwise, the permit is delayed, so the module
+        produces data at the rate downstream modules can take instead of producing data which is dropped.
+        The delay is halved again whenever a full delay period passed without a new backpressure signal.
+
+        Input and variable modules acquire a permit automatically before forwarding data. Polling modules should
+        call it themselves before requesting the next data object from their source - the data is then requested
+        later instead of held back after it was read. The automatic permit is skipped in that case.
+
+        :returns: True if the module is still active.
+        """
+        with self._permit_lock:
+            delay = self._permit_delay
+            if delay and time.monotonic() - self._last_backpressure > delay:
+                # Downstream caught up during the last period: recover gradually.
+                delay = delay / 2 if delay / 2 >= self.permit_delay_min else 0.0
+                self._permit_delay = delay
+        self._permit_acquired = True
+        deadline = time.monotonic() + delay
+        while self.active and time.monotonic() < deadline:
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+        return self.active
+
+    def _acquire_forwarding_permit(self):
+        """
+        Acquires a permit before data is forwarded, unless the module acquired one itself since it forwarded
+        data the last time (see acquire_permit).
+        """
+        if not self._permit_acquired:
+            self.acquire_permit()
+        self._permit_acquired = False
+
+    @staticmethod
+    def _signal_backpressure(data: models.Data):
+        """
+        Signals backpressure to the module the given data object originates from.
+
+        :param data: The data object which could not be queued.
+        """
+        ctx = data_context_map.get(data)
+        if ctx is None:
+            return
+        module_entry = data_layer.module_data.get(ctx.source_id)
+        signal = getattr(getattr(module_entry, "instance", None), "signal_backpressure", None)
+        if signal is not None:
+            try:
+                signal()
+            except Exception:
+                pass
+
+    def _await_queue_space(self, queue: ByteQueue, data: models.Data) -> bool:
+        """
+        Checks if the given internal queue holds less than config.STOP_LIMIT data objects and is within its
+        memory budget (see utils.memory_governor).
+
+        If it is full and config.BACKPRESSURE_TIMEOUT is set, the module the data object originates from is asked
+        to slow down, and the queue is waited for until it has space again - for at most the timeout.
+
+        :param queue: The internal queue of the module.
+        :param data: The data object to be queued.
+        :returns: True if the data object can be queued.
+        """
+        if queue.qsize() < config.STOP_LIMIT and not queue.over_budget():
+            return True
+        if config.BACKPRESSURE_TIMEOUT <= 0:
+            return False
+        self._signal_backpressure(data)
+        deadline = time.monotonic() + config.BACKPRESSURE_TIMEOUT
+        # Queue.get notifies not_full, no matter whether the queue itself is bounded.
+        # Bytes freed by other queues of the budget do not, so the budget is polled.
+        with queue.not_full:
+            while len(queue.queue) >= config.STOP_LIMIT or queue.over_budget():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.active:
+                    return False
+                queue.not_full.wait(timeout=min(remaining, queue.poll_interval))
+        return True
+
     @staticmethod
     def _invoke_async(method, *args, **kwargs):
         """
         Executes an async method from a synchronous context.
 
         Used internally by __init_subclass__ to safely call async stop()
-        implementations. Follows the same two-branch strategy used across all
-        module base classes:
+        implementations. If the shared async_runtime is enabled (config.ASYNC_LOOP_THREADS > 0),
+        the coroutine is scheduled onto the event loop of the module and awaited. Otherwise,
+        or if called from an event loop thread of the runtime, follows the same two-branch strategy
+        used across all module base classes:
 
           - No running loop: a persistent thread-local event loop is reused.
           - Running loop detected: the coroutine is dispatched to a dedicated
@@ -496,6 +1159,9 @@ class AbstractModule(ABC):
         :param args: Positional arguments forwarded to the method.
         :param kwargs: Keyword arguments forwarded to the method.
         """
+        if async_runtime.enabled and not async_runtime.owns_current_thread():
+            return async_runtime.run(method, *args, **kwargs)
+
         try:
             asyncio.get_running_loop()
             result, exc = [None], [None]
@@ -541,7 +1207,8 @@ class AbstractModule(ABC):
             def _wrapped_stop(self, *args, **kwargs):
                 try:
                     if inspect.iscoroutinefunction(original_stop):
-                        AbstractModule._invoke_async(original_stop, self, *args, **kwargs)
+                        # Bound, so the shared async runtime can select the event loop of the module.
+                        AbstractModule._invoke_async(original_stop.__get__(self), *args, **kwargs)
                     else:
                         original_stop(self, *args, **kwargs)
                 finally:
@@ -567,6 +1234,12 @@ class AbstractModule(ABC):
         timeout = config.STOP_TIMEOUT if timeout is None else timeout
         with self._workers_lock:
             workers = [worker for worker_list in self._workers.values() for worker in worker_list]
+            # Stopped workers must not be used again, if the module is restarted in place.
+            self._workers.clear()
+            self._routes = None
+            for link in self._link_metrics.values():
+                metrics_registry.unregister_link(link)
+            self._link_metrics.clear()
         if not workers:
             return []
 
@@ -597,10 +1270,21 @@ class AbstractModule(ABC):
         Calls all links of the module.
         The linked module is only called if self.active is true.
 
-        When worker_count_per_link > 0, submits data to the persistent round-robin worker pool.
+        When worker_count_per_link > 0, submits data to the persistent worker pool: in round-robin order,
+        or - if a partition_key is configured - to the worker selected by the hash of the key, so data objects
+        with the same key keep their order.
+
+        When worker_count_per_link == 0 (spawn mode), every call is executed by a thread of the shared, bounded
+        spawn_pool instead, without any ordering guarantee. forward_latest_data_only is ignored in spawn mode.
+
+        A fused link (see fused_link) calls the linked processor directly instead, on the current thread.
 
-        When worker_count_per_link == 0 (spawn mode), a fresh daemon thread is created for every call instead.
-        forward_latest_data_only is ignored in spawn mode.
+        Every linked module receives its own copy of the data object. By default, this is a deep copy per link.
+        With copy_on_write, a snapshot is taken once and every link receives a copy sharing its values,
+        so the cost of forwarding no longer grows with the size of the data object times the number of links.
+
+        The links are taken from the routing table of the module (see refresh_routes), which is read without
+        a lock and only rebuilt when the links may have changed.
 
         :param data: The data object.
         """
@@ -629,12 +1313,22 @@ class AbstractModule(ABC):
         pipeline_ts = existing_ctx.pipeline_ts if existing_ctx else now
         source_id = existing_ctx.source_id if existing_ctx else self.configuration.id
         visited = existing_ctx.visited if existing_ctx else frozenset()
-
-        current_links = set(getattr(self.configuration, "links", []))
-        worker_count = getattr(self.configuration, "worker_count_per_link", 1)
-
-        remaining = current_links - visited
-        if not remaining:
+        trace = existing_ctx.trace if existing_ctx else tracer.sample(source_id, now)
+
+        # Read once: refresh_routes replaces the table as a whole, it is never changed in place.
+        routes = self._routes
+        if routes is None:
+            # _stop_workers dropped the table. It is rebuilt for a module restarted in place, but not by a late
+            # call into a stopped module - the workers would be started for a module nobody stops again.
+            if not self.active:
+                return
+            routes = self.refresh_routes()
+            if not self.active:
+                # Stopped while rebuilding, possibly after _stop_workers already ran.
+                self._stop_workers()
+                return
+
+        if not routes.links - visited:
             # No unvisited link remains - true sink, or every link loops back into an already-visited module.
             # Either way, this is the end of this branch of the flow.
             metrics_registry.record_end_to_end(
@@ -643,54 +1337,16 @@ class AbstractModule(ABC):
                 seconds=now - pipeline_ts,
             )
 
-        with self._workers_lock:
-            existing = set(self._workers.keys())
+        next_visited = visited | {self.configuration.id}
 
-            # Add workers for newly linked modules.
-            for module_id in current_links - existing:
-                if worker_count == 0:
-                    self.logger.info(f"Detected new link to module '{module_id}'. Using spawn mode.")
-                    self._workers[module_id] = []
-                else:
-                    self.logger.info(f"Detected new link to module '{module_id}'. Starting worker.")
-                    self._workers[module_id] = [
-                        ModuleWorker(
-                            configuration_id=self.configuration.id,
-                            module_id=module_id,
-                            logger=self.logger,
-                            forward_latest_data_only=getattr(self.configuration, "forward_latest_data_only", False)
-                        )
-                        for _ in range(worker_count)
-                    ]
-                    self._worker_index[module_id] = 0
-
-            # Remove workers for unlinked modules.
-            removed = {}
-            for module_id in existing - current_links:
-                self.logger.info(f"Detected removed link to module '{module_id}'. Stopping worker.")
-                removed[module_id] = self._workers.pop(module_id)
-                self._worker_index.pop(module_id, None)
+        # One snapshot for all links instead of one deep copy per link.
+        # A fused link always uses one: it exists to take the cost out of the hop.
+        snapshot = None
+        if routes.routes and (routes.copy_on_write or routes.routes[0].fused):
+            snapshot = models.DataSnapshot(data)
 
-            workers_snapshot = list(self._workers.items())
-
-        # Stop removed workers outside the lock — .stop() blocks until the thread joins.
-        # This runs in the data path, so the workers are signaled first and then waited for
-        # against a single deadline. A worker which does not make it is left behind rather than
-        # blocking the module which is currently forwarding data.
-        removed_workers = [worker for worker_list in removed.values() for worker in worker_list]
-        if removed_workers:
-            deadline = time.monotonic() + config.STOP_TIMEOUT
-            for worker in removed_workers:
-                worker.signal_stop(timeout=config.STOP_TIMEOUT)
-            for worker in removed_workers:
-                worker.join(timeout=deadline - time.monotonic())
-            leaked = [worker.thread.name for worker in removed_workers if worker.thread.is_alive()]
-            if leaked:
-                self.logger.error("The worker thread(s) of the removed link(s) did not stop within {0} s and are "
-                                  "leaked: {1}.".format(config.STOP_TIMEOUT, ", ".join(leaked)))
-
-        for module_id, worker_list in workers_snapshot:
-            data_copy = copy.deepcopy(data)
+        for route in routes.routes:
+            data_copy = snapshot.copy() if snapshot is not None else copy.deepcopy(data)
 
             # Store context for the copy with a fresh link_ts for this specific link.
             # pipeline_ts and source_id are inherited from the flow origin;
@@ -699,32 +1355,51 @@ class AbstractModule(ABC):
                 pipeline_ts=pipeline_ts,
                 source_id=source_id,
                 link_ts=time.monotonic(),  # stamped after copy, per link.
-                visited=visited | {self.configuration.id},
+                visited=next_visited,
+                trace=trace,
             ))
 
-            if worker_count == 0:
-                # Spawn mode: each call gets its own thread.
+            if route.fused:
+                # Fused: the linked processor runs on this thread, as part of the same execution unit.
+                linked = data_layer.module_data.get(route.module_id)
+                if linked is None:
+                    self.logger.error("Could not find linked module '{0}' in the module data."
+                                      .format(route.module_id))
+                elif linked.instance.active:
+                    linked.instance.run(data_copy)
+            elif routes.spawn:
+                # Spawn mode: each call is executed by a thread of the shared pool.
                 try:
-                    linked = data_layer.module_data[module_id]
+                    linked = data_layer.module_data[route.module_id]
                     if linked.instance.active:
-                        threading.Thread(
-                            target=linked.instance.run,
-                            args=(data_copy,),
-                            name=f"Link_{self.configuration.id}_to_{module_id}",
-                            daemon=True).start()
+                        if not spawn_pool.submit(name=route.name, function=linked.instance.run, data=data_copy):
+                            metrics = getattr(self, "_metrics", None)
+                            if metrics is not None:
+                                metrics.record_drop()
+                            if not self._spawn_error_issued:
+                                self.logger.error("The spawn pool is saturated. Dropping data for linked module "
+                                                  "'{0}'...".format(route.module_id))
+                                self._spawn_error_issued = True
+                        elif self._spawn_error_issued:
+                            self.logger.info("The spawn pool accepts data again.")
+                            self._spawn_error_issued = False
                 except KeyError as e:
-                    self.logger.error("Could not find linked module '{0}' in the module data.".format(module_id))
+                    self.logger.error("Could not find linked module '{0}' in the module data."
+                                      .format(route.module_id))
                 except Exception as e:
-                    self.logger.error("Could not execute linked module '{0}': {1}".format(module_id, str(e)),
+                    self.logger.error("Could not execute linked module '{0}': {1}".format(route.module_id, str(e)),
                                       exc_info=config.EXC_INFO)
             else:
-                # Persistent-worker mode: round-robin dispatch.
-                if not worker_list:
-                    self.logger.error(f"Could not find worker(s) for linked module '{module_id}'.")
+                workers = route.workers
+                if not workers:
+                    self.logger.error(f"Could not find worker(s) for linked module '{route.module_id}'.")
                     continue
-                index = self._worker_index.get(module_id, 0)
-                worker_list[index % len(worker_list)].submit(data_copy)
-                self._worker_index[module_id] = (index + 1) % len(worker_list)
+                if routes.partition_key:
+                    # Persistent-worker mode: key-affine dispatch.
+                    workers[self._partition(data, routes.partition_key, len(workers))].submit(data_copy)
+                else:
+                    # Persistent-worker mode: round-robin dispatch.
+                    workers[next(route.counter) % len(workers)].submit(data_copy)
 
     def _dyn(self, input_data: Any, data_type: list[str] | str | None = None) -> Any:
         """
@@ -744,10 +1419,8 @@ class AbstractModule(ABC):
         :param data_type: The data type we try the dynamic variable. Can be list, dict, str, int, float, or bool.
         :returns: The input with the dynamic variables replaced by the actual value.
         """
+        input_string = None
         try:
-            available_data_types = {"str": str, "bool": bool, "float": float, "int": int, "list": list, "dict": dict}
-            """A dictionary containing all available data types for conversion."""
-
             # To be safe, we make the input_string a string.
             input_string = str(input_data)
 
@@ -756,143 +1429,83 @@ class AbstractModule(ABC):
                 data_type = []
             if not isinstance(data_type, list):
                 data_type = [data_type]
-            # Make every entry a lowered string.
-            converted_data_types: list[type] = []
-            for item in data_type:
-                key = str(item).lower()
-
-                if key not in available_data_types:
-                    raise DynamicVariableException(
-                        f"Unknown data type {item}. "
-                        f"Allowed types are: {', '.join(available_data_types)}."
-                    )
-
-                converted_data_types.append(available_data_types[key])
-
-            extracted_variables: list[str] = []
-            """The extracted dynamic variables as str, without the markers (e.g. 'REST_Test.[0]')."""
-
-            def _extract_variables(input_string_temp: str):
-                """
-                Recursively search for variables in string.
-                """
-                start = input_string_temp.find("${")
-                if start != -1:
-                    end = input_string_temp[start:].find("}")
-                    if end != -1:
-                        end = start + end
-                else:
-                    # No end found.
-                    return
 
-                # Check if the markers were found in the string.
-                if start != -1 and end != -1 and start < end:
-                    result = input_string_temp[start + len("${"):end]
-                elif start != -1 and end == -1:
-                    raise DynamicVariableException("Found an incomplete marker in '{0}'.".format(input_string))
-                else:
-                    # If there are no more markers, we leave this function.
-                    return
-
-                extracted_variables.append(result)
-                new_input_string = input_string_temp.replace("${" + result + "}", '')
-                # Recursively call this function until there are no more dynamic variables.
-                _extract_variables(new_input_string)
+            # The input is parsed once per combination of input string and data types.
+            try:
+                template = _compile_template(input_string, tuple(data_type))
+            except TypeError:
+                # A data type which can not be hashed, so the template can not be cached.
+                template = _Template(input_string=input_string, data_type=data_type)
 
-            # Make input to string to be safe and extract dynamic variables if there are.
-            _extract_variables(str(input_string))
+            if not template.variables:
+                return template.result()
 
             processed_input_string = input_string
-            if extracted_variables:
-                for variable_text in extracted_variables:
-                    module_id = variable_text.split('.', 1)[0]
-                    key = variable_text.split('.', 1)[1]
-                    if module_id == "local":
-                        if getattr(self, "current_input_data", None) is not None:
-                            data = self.current_input_data
-                            # Check if the key is 'measurement'.
-                            if key.lower() == "measurement":
-                                value = data.measurement
-                            elif key.lower() == "time":
-                                value = data.time
-                            else:
-                                # Check if the key is in the fields dict.
-                                value = data.fields.get(key, None)
-                                if value is None:
-                                    # If it was not in the fields dict, we check if the key is in the tags dict.
-                                    value = data.tags.get(key, None)
-                                if value is None:
-                                    raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                                   "Could not find key '{1}' in fields or tags."
-                                                                   .format(input_string, key))
+            for marker, variable_parts in template.variables:
+                module_id = variable_parts[0]
+                key = variable_parts[1]
+                if module_id == "local":
+                    if getattr(self, "current_input_data", None) is not None:
+                        data = self.current_input_data
+                        # Check if the key is 'measurement'.
+                        if key.lower() == "measurement":
+                            value = data.measurement
+                        elif key.lower() == "time":
+                            value = data.time
                         else:
-                            raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                           "Referenced module has no latest data. "
-                                                           "Only tag, output, and processor modules support 'local'."
-                                                           .format(input_string))
-                    elif module_id == "env":
-                        value = os.getenv(key, None)
-                        if value is None:
-                            raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                           "Could not find key '{1}' in environment variables."
-                                                           .format(input_string, key))
+                            # Check if the key is in the fields dict.
+                            value = data.fields.get(key, None)
+                            if value is None:
+                                # If it was not in the fields dict, we check if the key is in the tags dict.
+                                value = data.tags.get(key, None)
+                            if value is None:
+                                raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
+                                                               "Could not find key '{1}' in fields or tags."
+                                                               .format(input_string, key))
                     else:
-                        module_entry = data_layer.module_data.get(module_id, None)
-                        if module_entry is not None:
-                            if module_entry.latest_data is not None:
-                                data = module_entry.latest_data
-                                # Check if the key is in the fields dict.
-                                value = data.fields.get(key, None)
-                                if value is None:
-                                    # If it was not in the fields dict, we check if the key is in the tags dict.
-                                    value = data.tags.get(key, None)
-                                if value is None:
-                                    raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                                   "Could not find key '{1}' in fields or tags."
-                                                                   .format(input_string, key))
-                            else:
+                        raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
+                                                       "Referenced module has no latest data. "
+                                                       "Only tag, output, and processor modules support 'local'."
+                                                       .format(input_string))
+                elif module_id == "env":
+                    value = os.getenv(key, None)
+                    if value is None:
+                        raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
+                                                       "Could not find key '{1}' in environment variables."
+                                                       .format(input_string, key))
+                else:
+                    module_entry = data_layer.module_data.get(module_id, None)
+                    if module_entry is not None:
+                        if module_entry.latest_data is not None:
+                            data = module_entry.latest_data
+                            # Check if the key is in the fields dict.
+                            value = data.fields.get(key, None)
+                            if value is None:
+                                # If it was not in the fields dict, we check if the key is in the tags dict.
+                                value = data.tags.get(key, None)
+                            if value is None:
                                 raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                               "Referenced module has no latest data."
-                                                               .format(input_string))
+                                                               "Could not find key '{1}' in fields or tags."
+                                                               .format(input_string, key))
                         else:
                             raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
-                                                           "Could not find module with the id '{1}'."
-                                                           .format(input_string, module_id))
-
-                    # Replace the input with the value.
-                    if len(extracted_variables) == 1 and input_string.startswith(
-                            "${") and input_string.endswith("}"):
-                        # If it was only one dynamic variable, we keep the data type of the input.
-                        processed_input_string = value
+                                                           "Referenced module has no latest data."
+                                                           .format(input_string))
                     else:
-                        # We have to convert it to a string.
-                        processed_input_string = processed_input_string.replace(
-                            "${" + variable_text + "}", str(value))
-
-            try:
-                # This make strings to lists and dicts, if they are.
-                processed_input_string = ast.literal_eval(processed_input_string)
-            except Exception as e:
-                pass
+                        raise DynamicVariableException("Could not replace dynamic variable '{0}'. "
+                                                       "Could not find module with the id '{1}'."
+                                                       .format(input_string, module_id))
+
+                # Replace the input with the value.
+                if template.whole:
+                    # If it was only one dynamic variable, we keep the data type of the input.
+                    processed_input_string = value
+                else:
+                    # We have to convert it to a string.
+                    processed_input_string = processed_input_string.replace(marker, str(value))
 
-            # Try to convert to the given data type.
-            successfully_converted: bool = False
-            for defined_data_type in converted_data_types:
-                try:
-                    if defined_data_type == list:
-                        if not isinstance(processed_input_string, list):
-                            processed_input_string = [processed_input_string]
-                    else:
-                        processed_input_string = defined_data_type(processed_input_string)
-                    successfully_converted = True
-                    break
-                except Exception as e:
-                    continue
-            if not successfully_converted and converted_data_types:
-                raise DynamicVariableException(
-                    f"Could not convert dynamic variable '{processed_input_string}' "
-                    f"to one of the given data types: {', '.join(str(x) for x in data_type)}.")
-            return processed_input_string
+            # This make strings to lists and dicts, if they are. Then try to convert to the given data type.
+            return template.convert(template.literal(processed_input_string))
         except DynamicVariableException:
             raise
         except Exception as e:
@@ -51,8 +51,12 @@ class AbstractInputModule(AbstractModule):
         invoked through a metrics-instrumented run() like Tag/Processor/Output modules, so this is
         the one common hook every InputModule passes through to record its own metrics.
 
+        A permit is acquired first (see AbstractModule.acquire_permit), so the module slows down while
+        downstream modules signal backpressure.
+
         :param data: The data object.
         """
+        self._acquire_forwarding_permit()
         self._metrics.record_received()
         t0 = time.monotonic()
         try:
@@ -103,8 +107,12 @@ class AbstractVariableModule(AbstractModule):
         invoked through a metrics-instrumented run() like Tag/Processor/Output modules, so this is
         the one common hook every VariableModule passes through to record its own metrics.
 
+        A permit is acquired first (see AbstractModule.acquire_permit), so the module slows down while
+        downstream modules signal backpressure.
+
         :param data: The data object.
         """
+        self._acquire_forwarding_permit()
         self._metrics.record_received()
         t0 = time.monotonic()
         try:
@@ -166,7 +174,10 @@ class AbstractTagModule(AbstractModule):
 
             ctx = data_context_map.get(data)
             if ctx is not None:
-                self._metrics.record_link_wait(time.monotonic() - ctx.link_ts)
+                now = time.monotonic()
+                self._metrics.record_link_wait(now - ctx.link_ts)
+                if ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "link_wait", ctx.link_ts, now)
             self._metrics.record_received()
 
             # Set the current data object.
@@ -181,8 +192,11 @@ class AbstractTagModule(AbstractModule):
                 key_values = self._run() or {}
             else:
                 key_values = AbstractModule._invoke_async(method=self._run) or {}
-            self._metrics.record_processing_time(time.monotonic() - t0)
+            t1 = time.monotonic()
+            self._metrics.record_processing_time(t1 - t0)
             self._metrics.record_processed()
+            if ctx is not None and ctx.trace is not None:
+                ctx.trace.add(self.configuration.id, "run", t0, t1)
 
             if self.configuration.is_field:
                 if self.configuration.replace_existing:
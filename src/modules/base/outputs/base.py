@@ -4,11 +4,13 @@ The derived child class has to be named 'OutputModule'.
 """
 import time
 import inspect
+import collections
 from abc import abstractmethod
 from dataclasses import dataclass
 import queue
 import threading
-from typing import Optional
+import concurrent.futures
+from typing import Any, Optional
 
 # Internal imports.
 import config
@@ -16,7 +18,9 @@ import data_layer
 import models
 import utils.data_validation
 from modules.base.base import AbstractModule
+from utils.async_runtime import async_runtime
 from metrics import metrics_registry, data_context_map
+from utils.memory_governor import memory_governor, ByteQueue
 
 
 class AbstractOutputModule(AbstractModule):
@@ -37,7 +41,14 @@ class AbstractOutputModule(AbstractModule):
     tag_requirements: list[str] = []
     """Data validation requirements for the tags dict."""
     can_be_buffer: bool = False
-    """If True, the child has to implement 'store_buffer_data' and 'get_buffer_data'."""
+    """If True, the child has to implement 'store_buffer_data' and 'get_buffer_data'
+    (and can implement 'get_buffer_data_batch' and 'ack_buffer_data')."""
+    buffer_chunk_size: int = 100
+    """The maximum number of buffered data objects retrieved at once (see _get_buffer_chunk)."""
+    _buffer_stores: dict[str, int] = {}
+    """The number of data objects each module id stored in the buffer. Shared by the instances of a module id."""
+    _buffer_stores_lock = threading.Lock()
+    """Guards _buffer_stores."""
 
     @dataclass
     class Configuration(models.OutputModule):
@@ -48,8 +59,9 @@ class AbstractOutputModule(AbstractModule):
 
     def __init__(self, configuration: Configuration):
         super().__init__(configuration=configuration)
-        self.queue: queue.Queue = queue.Queue()
-        """A queue containing all the received data to be stored."""
+        self.queue: ByteQueue = ByteQueue(budget=memory_governor.budget(
+            configuration.id, limit_mb=getattr(configuration, "max_queue_mb", 0)))
+        """A queue containing all the received data to be stored. Charged to the memory budget of the module."""
         self.current_input_data: Optional[models.Data] = None
         """The currently received data object. Used for replacing dynamic variables with local data."""
         self._first_execution: bool = True
@@ -59,8 +71,20 @@ class AbstractOutputModule(AbstractModule):
             module_name=configuration.module_name,
             queue=self.queue,
         )
+        self._field_validation_cache = utils.data_validation.ValidationCache(
+            on_lookup=self._metrics.record_validation_lookup)
+        """Results of shape-only field requirements for the shapes of already validated data objects."""
+        self._tag_validation_cache = utils.data_validation.ValidationCache(
+            on_lookup=self._metrics.record_validation_lookup)
+        """Results of shape-only tag requirements for the shapes of already validated data objects."""
         self.queue_size_last_warning_band: int = 0
         """The queue size band for which the last warning message was emitted."""
+        self._buffer_checked: tuple = (None, -1)
+        """The buffer module and the value of _buffer_stores when the buffer was last found empty."""
+        self._buffer_unacked: Optional[tuple] = None
+        """The buffer module and the offset of the last retrieved chunk, until it was stored (see _ack_buffer)."""
+        self._in_flight = threading.BoundedSemaphore(max(1, getattr(configuration, "max_in_flight", 1)))
+        """Limits the number of concurrently executed _run coroutines (see max_in_flight)."""
 
     def _validate_data(self, data: models.Data):
         """
@@ -71,13 +95,13 @@ class AbstractOutputModule(AbstractModule):
         :raises utils.data_validation.ValidationError: If requirements are not satisfied.
         """
         valid_field_data, _, field_validation_messages = utils.data_validation.validate(
-            data=data.fields, requirements=self.field_requirements)
+            data=data.fields, requirements=self.field_requirements, cache=self._field_validation_cache)
         if not valid_field_data:
             messages = utils.data_validation.format_message(field_validation_messages)
             raise utils.data_validation.ValidationError(
                 "Invalid field input data: {0}".format(" ".join(messages)))
         valid_tag_data, _, tag_validation_messages = utils.data_validation.validate(
-            data=data.tags, requirements=self.tag_requirements)
+            data=data.tags, requirements=self.tag_requirements, cache=self._tag_validation_cache)
         if not valid_tag_data:
             messages = utils.data_validation.format_message(tag_validation_messages)
             raise utils.data_validation.ValidationError(
@@ -91,8 +115,10 @@ class AbstractOutputModule(AbstractModule):
         updates the latest data entry in the data layer, and enqueues the data for
         processing by the queue worker thread. The queue worker is started lazily on the first call.
 
-        If the queue has reached config.STOP_LIMIT, the data is forwarded to the configured buffer module instead
-        of being dropped. If no buffer is configured, the data is lost and an error is logged.
+        If the queue has reached config.STOP_LIMIT or its memory budget (see utils.memory_governor), the data is
+        forwarded to the configured buffer module instead of being dropped. If no buffer is configured, the data is lost and an error is logged.
+        With config.BACKPRESSURE_TIMEOUT, the queue is waited for that long first, and the module the data
+        originates from is asked to slow down.
 
         A warning is logged once per config.WARNING_LIMIT band the queue grows into, and re-armed
         once the queue recovers below config.WARNING_LIMIT.
@@ -115,7 +141,10 @@ class AbstractOutputModule(AbstractModule):
 
             ctx = data_context_map.get(data)
             if ctx is not None:
-                self._metrics.record_link_wait(time.monotonic() - ctx.link_ts)
+                now = time.monotonic()
+                self._metrics.record_link_wait(now - ctx.link_ts)
+                if ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "link_wait", ctx.link_ts, now)
             self._metrics.record_received()
 
             queue_size = self.queue.qsize()
@@ -143,7 +172,7 @@ class AbstractOutputModule(AbstractModule):
             # Validate the field input data.
             self._validate_data(data=data)
 
-            if self.queue.qsize() < config.STOP_LIMIT:
+            if self._await_queue_space(self.queue, data):
                 # Stamp internal-queue entry time into the context - not onto data.
                 if ctx is not None:
                     ctx.internal_ts = time.monotonic()
@@ -155,13 +184,28 @@ class AbstractOutputModule(AbstractModule):
                 buffered = self._buffer(data=data, invalid=False)
                 if not buffered:
                     self._metrics.record_drop()
-                    self.logger.error("Could not store data because the queue size exceeded the stop limit "
-                                      "and no buffer is configured.")
+                    self.logger.error("Could not store data because the queue exceeded its stop limit or memory "
+                                      "budget and no buffer is configured.")
         except Exception as e:
             self._metrics.record_error()
             self.logger.error("Could not store data in queue: {0}".format(str(e)),
                               exc_info=config.EXC_INFO)
 
+    def run_batch(self, batch: list[models.Data]):
+        """
+        External entry point for passing several data objects into the module at once.
+
+        Called by the link workers instead of run if the linking module has batch_size_per_link greater than 1.
+        The default implementation passes the data objects to run one by one, in order.
+        Override it if the module can process several data objects more efficiently at once
+        (e.g. validating or queueing in bulk). An override takes over everything run does for each data object:
+        validation, metrics and queueing (or buffering) the data objects.
+
+        :param batch: The data objects, oldest first.
+        """
+        for data in batch:
+            self.run(data)
+
     def _process_queue(self):
         """
         Continuously drains the data queue and processes each item by invoking _run.
@@ -173,7 +217,24 @@ class AbstractOutputModule(AbstractModule):
 
         Errors raised during processing are caught and logged per item so that a single
         failing item does not halt the queue worker.
+
+        If _run is async, the shared async runtime is enabled and max_in_flight is greater than 1, the
+        coroutines are not awaited one after the other: up to max_in_flight of them are executed concurrently
+        on the event loop of the module (see _submit_async). Replayed buffered data is then only removed from
+        the buffer once all of its coroutines are done.
+        If max_batch_size is greater than 1, the data objects are stored in batches instead
+        (see _process_queue_batches).
         """
+        if getattr(self.configuration, "max_batch_size", 1) > 1:
+            self._process_queue_batches()
+            return
+        run_concurrently = (inspect.iscoroutinefunction(self._run) and async_runtime.enabled
+                            and getattr(self.configuration, "max_in_flight", 1) > 1)
+        # Buffered data is replayed in batches if the module can store batches.
+        batched_replay = type(self)._run_batch is not AbstractOutputModule._run_batch
+        buffered = collections.deque()
+        # The coroutines storing the data of the current buffer chunk, with their data objects.
+        replayed = []
         while self.active:
             # Do not process anything while the module is not ready. A module can also lose
             # its readiness again (e.g. a start method which blocks and raises on a connection
@@ -182,44 +243,242 @@ class AbstractOutputModule(AbstractModule):
             self._await_started()
 
             # Prioritize buffered data before consuming from the live queue.
-            data = self._get_buffer()
-            if data is None:
+            if not buffered:
+                # The previous chunk was stored, once the coroutines storing it are done.
+                if not self._await_stores([future for future, _ in replayed]):
+                    break
+                replayed.clear()
+                self._ack_buffer()
+                chunk = self._get_buffer_chunk(self.buffer_chunk_size)
+                if chunk and batched_replay:
+                    self._store_batch(chunk)
+                    continue
+                buffered.extend(chunk)
+                if buffered:
+                    time.sleep(0)
+            from_buffer = bool(buffered)
+            if from_buffer:
+                data = buffered.popleft()
+            else:
                 try:
                     data = self.queue.get(block=True, timeout=1)  # This blocks until timeout.
                     self.queue.task_done()
                 except queue.Empty:
                     time.sleep(0)
                     continue
-            else:
-                time.sleep(0)
 
-            ctx = data_context_map.get(data)
-            if ctx is not None and ctx.internal_ts is not None:
-                self._metrics.record_internal_wait(time.monotonic() - ctx.internal_ts)
+            ctx = self._record_dequeue(data)
 
             # Set the last received data for dynamic variables.
             self.current_input_data = data
+            if run_concurrently:
+                future = self._submit_async(data, ctx)
+                if from_buffer and future is not None:
+                    replayed.append((future, data))
+                continue
+            self._store(data, ctx)
+
+        stored = self._await_stores([future for future, _ in replayed])
+        if self._buffer_unacked is not None and self._buffer_unacked[1] is None:
+            # Retrieved by the default get_buffer_data_batch, which already removed the chunk from the buffer, but
+            # not stored before the module was stopped: buffer them again, behind any newer buffered data.
+            for data in [data for future, data in replayed if not future.done()] + list(buffered):
+                self._buffer(data=data, invalid=False)
+            self._buffer_unacked = None
+        elif stored and not buffered:
+            self._ack_buffer()
+        # Otherwise, the chunk stays in the buffer and is replayed again as a whole, in order.
+
+    def _await_stores(self, futures: list[concurrent.futures.Future]) -> bool:
+        """
+        Waits until the coroutines scheduled by _submit_async are done.
+
+        :param futures: The futures returned by _submit_async.
+        :returns: True if all of them are done, False if the module was stopped before.
+        """
+        pending = futures
+        while pending:
+            _, pending = concurrent.futures.wait(pending, timeout=1)
+            if pending and not self.active:
+                return False
+        return True
+
+    def _process_queue_batches(self):
+        """
+        The batch mode of _process_queue, used if max_batch_size is greater than 1.
+
+        A batch is either the buffered data, if any, or the next queued data objects: up to max_batch_size of
+        them, waiting at most max_batch_latency_ms after the first one. It is stored by _store_batch. Batches are
+        stored one after the other, also if _run is async. Buffered and queued data objects are not mixed in one
+        batch, so no queued data object is stored before older buffered ones.
+        """
+        max_size = self.configuration.max_batch_size
+        max_latency = getattr(self.configuration, "max_batch_latency_ms", 0) / 1000.0
+        while self.active:
+            self._await_started()
+
+            # Prioritize buffered data before consuming from the live queue.
+            batch = self._get_buffer_chunk(max_size)
+            if batch:
+                self._store_batch(batch)
+                self._ack_buffer()
+                continue
             try:
-                t0 = time.monotonic()
-                if not inspect.iscoroutinefunction(self._run):
-                    data = self._run(data)
-                else:
-                    data = AbstractModule._invoke_async(self._run, data)
-                elapsed = time.monotonic() - t0
-                self._metrics.record_processing_time(elapsed)
-                self._metrics.record_processed()
+                batch.append(self.queue.get(block=True, timeout=1))  # This blocks until timeout.
+                self.queue.task_done()
+            except queue.Empty:
+                time.sleep(0)
+                continue
 
-                if ctx is not None:
-                    metrics_registry.record_end_to_end(
-                        source_id=ctx.source_id,
-                        output_id=self.configuration.id,
-                        seconds=time.monotonic() - ctx.pipeline_ts,
-                    )
+            deadline = time.monotonic() + max_latency
+            while len(batch) < max_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self.queue.get(block=True, timeout=remaining))
+                    else:
+                        batch.append(self.queue.get_nowait())
+                    self.queue.task_done()
+                except queue.Empty:
+                    break
+            self._store_batch(batch)
+
+    def _record_dequeue(self, data: models.Data):
+        """
+        Records the time the data object waited in the queue of the module.
+
+        :param data: The data object taken from the queue (or the buffer).
+        :returns: The context of the data object, if any.
+        """
+        ctx = data_context_map.get(data)
+        if ctx is not None and ctx.internal_ts is not None:
+            now = time.monotonic()
+            self._metrics.record_internal_wait(now - ctx.internal_ts)
+            if ctx.trace is not None:
+                ctx.trace.add(self.configuration.id, "internal_wait", ctx.internal_ts, now)
+        return ctx
+
+    def _record_stored(self, ctx, t0: float, t1: float):
+        """
+        Records the end of a flow: a data object was stored.
+
+        :param ctx: The context of the data object, if any.
+        :param t0: The monotonic time the data object was started to be stored.
+        :param t1: The monotonic time the data object was stored.
+        """
+        if ctx is not None:
+            if ctx.trace is not None:
+                ctx.trace.add(self.configuration.id, "run", t0, t1)
+            metrics_registry.record_end_to_end(
+                source_id=ctx.source_id,
+                output_id=self.configuration.id,
+                seconds=time.monotonic() - ctx.pipeline_ts,
+            )
+
+    def _store(self, data: models.Data, ctx):
+        """
+        Stores a single data object by invoking _run and records the metrics.
+        Errors are caught and logged.
+
+        :param data: The data object to store.
+        :param ctx: The context of the data object, if any.
+        """
+        try:
+            t0 = time.monotonic()
+            if not inspect.iscoroutinefunction(self._run):
+                self._run(data)
+            else:
+                AbstractModule._invoke_async(self._run, data)
+            t1 = time.monotonic()
+            self._metrics.record_processing_time(t1 - t0)
+            self._metrics.record_processed()
+            self._record_stored(ctx, t0, t1)
+        except Exception as e:
+            self._metrics.record_error()
+            self.logger.error("Something went wrong while executing output module {0} ({1}): {2}"
+                              .format(self.configuration.module_name, self.configuration.id, str(e)),
+                              exc_info=config.EXC_INFO)
+
+    def _store_batch(self, batch: list[models.Data]):
+        """
+        Stores a batch of data objects by invoking _run_batch and records the metrics.
+
+        If _run_batch is not overridden, the data objects are stored one after the other by _store.
+        If _run_batch raises, the error is logged and the data objects are stored one after the other by _run
+        instead, so each of them is stored or buffered on its own.
+
+        :param batch: The data objects to store, oldest first.
+        """
+        contexts = [self._record_dequeue(data) for data in batch]
+        # Set the last received data for dynamic variables.
+        self.current_input_data = batch[-1]
+        if type(self)._run_batch is AbstractOutputModule._run_batch:
+            for data, ctx in zip(batch, contexts):
+                self._store(data, ctx)
+            return
+        try:
+            t0 = time.monotonic()
+            if not inspect.iscoroutinefunction(self._run_batch):
+                self._run_batch(batch)
+            else:
+                AbstractModule._invoke_async(self._run_batch, batch)
+            t1 = time.monotonic()
+        except Exception as e:
+            self._metrics.record_error()
+            self.logger.error("Could not store a batch of {0} data objects in output module {1} ({2}), "
+                              "storing them one by one: {3}"
+                              .format(len(batch), self.configuration.module_name, self.configuration.id, str(e)),
+                              exc_info=config.EXC_INFO)
+            for data, ctx in zip(batch, contexts):
+                self._store(data, ctx)
+            return
+        self._metrics.record_batch(len(batch), t1 - t0)
+        for ctx in contexts:
+            self._metrics.record_processing_time((t1 - t0) / len(batch))
+            self._metrics.record_processed()
+            self._record_stored(ctx, t0, t1)
+
+    def _submit_async(self, data: models.Data, ctx):
+        """
+        Schedules the async _run for a data object onto the shared async runtime without awaiting it.
+        Blocks while max_in_flight coroutines of this module are executed.
+        Metrics and errors are recorded once the coroutine is done.
+
+        :param data: The data object to store.
+        :param ctx: The context of the data object, if any.
+        :returns: The future of the coroutine, or None if it was not scheduled.
+        """
+        while not self._in_flight.acquire(timeout=1):
+            if not self.active:
+                return None
+        t0 = time.monotonic()
+
+        def _done(future):
+            try:
+                future.result()
+                t1 = time.monotonic()
+                self._metrics.record_processing_time(t1 - t0)
+                self._metrics.record_processed()
+                self._record_stored(ctx, t0, t1)
             except Exception as e:
                 self._metrics.record_error()
                 self.logger.error("Something went wrong while executing output module {0} ({1}): {2}"
                                   .format(self.configuration.module_name, self.configuration.id, str(e)),
                                   exc_info=config.EXC_INFO)
+            finally:
+                self._in_flight.release()
+
+        try:
+            future = async_runtime.submit(self._run, data)
+            future.add_done_callback(_done)
+            return future
+        except Exception as e:
+            self._in_flight.release()
+            self._metrics.record_error()
+            self.logger.error("Could not schedule output module {0} ({1}): {2}"
+                              .format(self.configuration.module_name, self.configuration.id, str(e)),
+                              exc_info=config.EXC_INFO)
+            return None
 
     @abstractmethod
     def _run(self, data: models.Data):
@@ -253,6 +512,23 @@ class AbstractOutputModule(AbstractModule):
             # Use invalid=True if the data itself is malformed, so it is not retried.
             self._buffer(data=data, invalid=False)
 
+    def _run_batch(self, batch: list[models.Data]):
+        """
+        Internal method for storing several data objects at once, used if max_batch_size is greater than 1.
+        Override it if the destination supports bulk writes. May be declared as either a regular or an async method.
+        The default implementation calls _run for each data object.
+
+        Raise only if none of the data objects was stored: they are then passed to _run one by one.
+        If only some of them could not be stored, call self._buffer for each of those instead (see _run).
+
+        :param batch: The data objects to be processed, oldest first.
+        """
+        for data in batch:
+            if not inspect.iscoroutinefunction(self._run):
+                self._run(data)
+            else:
+                AbstractModule._invoke_async(self._run, data)
+
     def _buffer(self, data: models.Data, invalid: bool = False) -> bool:
         """
         Forwards data that could not be stored to a configured buffer module.
@@ -274,29 +550,79 @@ class AbstractOutputModule(AbstractModule):
                     success = data_layer.buffer_instance.store_buffer_data(self.configuration.id + "_bin", data)
                 else:
                     success = data_layer.buffer_instance.store_buffer_data(self.configuration.id + "_buffer", data)
+                    if success:
+                        with AbstractOutputModule._buffer_stores_lock:
+                            stores = AbstractOutputModule._buffer_stores
+                            stores[self.configuration.id] = stores.get(self.configuration.id, 0) + 1
         except Exception as e:
             self.logger.error("Could not store data in buffer: {0}".format(str(e)),
                               exc_info=config.EXC_INFO)
         return success
 
-    def _get_buffer(self) -> Optional[models.Data]:
+    def _buffer_pending(self) -> bool:
+        """
+        Checks if the buffer module may hold data of this module, without asking the buffer module.
+
+        The buffer is asked once after the module or the buffer module was started, since data can remain
+        from a previous run. After that, only once this module id stored data in the buffer again (see _buffer).
+
+        :returns: True if the buffer has to be polled, False if it is known to hold no data of this module.
         """
-        Retrieves the oldest buffered data entry for this module from the buffer module.
+        buffer_instance = data_layer.buffer_instance
+        if buffer_instance is None:
+            return False
+        return self._buffer_checked != (buffer_instance,
+                                        AbstractOutputModule._buffer_stores.get(self.configuration.id, 0))
+
+    def _get_buffer_chunk(self, size: int) -> list[models.Data]:
+        """
+        Retrieves up to size of the oldest buffered data entries for this module from the buffer module.
 
         Called by _process_queue before consuming from the live queue so that previously
         buffered data is replayed in order before new data is processed.
+        The buffer module is only asked if it may hold data of this module (see _buffer_pending).
+        The data stays in the buffer module until _ack_buffer is called, once it was stored.
+
+        A buffer module which does not override get_buffer_data_batch removes every data object as soon as it is
+        retrieved. A crash before it is stored loses it, so only a single data object is retrieved at once from
+        such a buffer module.
 
-        :returns: The oldest buffered data object, or None if no buffer is configured or
-                  the buffer is empty.
+        :param size: The maximum number of data objects to retrieve.
+        :returns: The buffered data objects, oldest first. Empty if no buffer is configured or the buffer is empty.
         """
-        data = None
+        chunk = []
+        if not self._buffer_pending():
+            return chunk
+        buffer_instance = data_layer.buffer_instance
+        # Read before polling, so data buffered in the meantime is polled for again.
+        stores = AbstractOutputModule._buffer_stores.get(self.configuration.id, 0)
+        if type(buffer_instance).get_buffer_data_batch is AbstractOutputModule.get_buffer_data_batch:
+            size = 1
         try:
-            if data_layer.buffer_instance:
-                data = data_layer.buffer_instance.get_buffer_data(self.configuration.id + "_buffer")
+            chunk, offset = buffer_instance.get_buffer_data_batch(self.configuration.id + "_buffer", size)
+            if chunk:
+                self._buffer_unacked = (buffer_instance, offset)
+            else:
+                self._buffer_checked = (buffer_instance, stores)
         except Exception as e:
             self.logger.error("Could not get data from buffer: {0}".format(str(e)),
                               exc_info=config.EXC_INFO)
-        return data
+        return chunk
+
+    def _ack_buffer(self):
+        """
+        Removes the data retrieved by _get_buffer_chunk from the buffer module, once it was stored.
+        If the application stops before, the data is replayed again.
+        """
+        if self._buffer_unacked is None:
+            return
+        buffer_instance, offset = self._buffer_unacked
+        self._buffer_unacked = None
+        try:
+            buffer_instance.ack_buffer_data(self.configuration.id + "_buffer", offset)
+        except Exception as e:
+            self.logger.error("Could not remove replayed data from buffer: {0}".format(str(e)),
+                              exc_info=config.EXC_INFO)
 
     def store_buffer_data(self, module_id: str, data: models.Data) -> bool:
         """
@@ -337,3 +663,41 @@ class AbstractOutputModule(AbstractModule):
             self.logger.error("Could not get buffered data: {0}".format(str(e)),
                               exc_info=config.EXC_INFO)
         return data
+
+    def get_buffer_data_batch(self, module_id: str, count: int) -> tuple[list[models.Data], Any]:
+        """
+        Retrieves up to count of the oldest buffered data entries for the given module id, without removing them.
+        They are removed by ack_buffer_data, once they were stored. Until then, the same entries are retrieved again.
+
+        Override it together with ack_buffer_data in output modules that set can_be_buffer = True, if the buffer
+        can read several entries at once. The default implementation retrieves and removes the entries one by one
+        with get_buffer_data, so they are not replayed again if the application crashes before they were stored.
+        To lose at most one entry then, output modules only retrieve a single entry at once from buffer modules
+        which do not override it (see _get_buffer_chunk). The implementation must be thread-safe, but entries of
+        the same module id are only retrieved by one thread at a time.
+
+        :param module_id: The id of the output module whose buffered data is requested.
+        :param count: The maximum number of entries.
+        :returns: The entries, oldest first (empty if the buffer is empty), and the offset after the last of them,
+            which is passed to ack_buffer_data. None if the entries were removed already, as by this default
+            implementation.
+        """
+        batch = []
+        while len(batch) < count:
+            data = self.get_buffer_data(module_id)
+            if data is None:
+                break
+            batch.append(data)
+        return batch, None
+
+    def ack_buffer_data(self, module_id: str, offset: Any):
+        """
+        Removes the buffered data entries retrieved by get_buffer_data_batch for the given module id.
+
+        Must be implemented by output modules which override get_buffer_data_batch.
+        The default implementation does nothing, since the default get_buffer_data_batch removes the entries itself.
+
+        :param module_id: The id of the output module whose buffered data was stored.
+        :param offset: The offset returned by get_buffer_data_batch.
+        """
+        pass
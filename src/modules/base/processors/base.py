@@ -9,6 +9,11 @@ import threading
 import inspect
 import queue
 import time
+import os
+import copy
+import collections
+import multiprocessing
+import concurrent.futures
 
 # Internal imports.
 import config
@@ -16,6 +21,43 @@ import models
 from modules.base.base import AbstractModule
 import utils.data_validation
 from metrics import metrics_registry, data_context_map
+from utils.memory_governor import memory_governor, ByteQueue
+
+
+_process_instance = None
+"""The module instance executing _run in a worker process (see execution = 'process')."""
+
+
+def _init_process(module_class, configuration):
+    """
+    Creates the module instance of a worker process. Called once in every worker process.
+
+    The instance is not started and has no links: it only executes _run.
+
+    :param module_class: The class of the processor module.
+    :param configuration: The configuration of the processor module.
+    """
+    global _process_instance
+    configuration = copy.copy(configuration)
+    configuration.links = []
+    _process_instance = module_class(configuration=configuration)
+    _process_instance.started.set()
+
+
+def _run_in_process(data: models.Data) -> tuple[models.Data, str, float]:
+    """
+    Executes _run of the module instance of a worker process.
+
+    :param data: The data object.
+    :returns: The data object after processing, the pid of the worker process and the seconds _run took.
+    """
+    t0 = time.monotonic()
+    _process_instance.current_input_data = data
+    if not inspect.iscoroutinefunction(_process_instance._run):
+        data = _process_instance._run(data)
+    else:
+        data = AbstractModule._invoke_async(_process_instance._run, data)
+    return data, str(os.getpid()), time.monotonic() - t0
 
 
 class AbstractProcessorModule(AbstractModule):
@@ -47,18 +89,27 @@ class AbstractProcessorModule(AbstractModule):
         super().__init__(configuration=configuration)
         self.current_input_data: Optional[models.Data] = None
         """The currently received data object. Used for replacing dynamic variables with local data."""
-        self.queue: queue.Queue = queue.Queue()
-        """A queue containing all the received data to be processed."""
+        self.queue: ByteQueue = ByteQueue(budget=memory_governor.budget(
+            configuration.id, limit_mb=getattr(configuration, "max_queue_mb", 0)))
+        """A queue containing all the received data to be processed. Charged to the memory budget of the module."""
         self._thread_safe: bool = thread_safe
         """If enabled, _run is only called by one thread like for output modules. 
         This has to be set before the execution of the start method."""
+        self._in_processes: bool = getattr(configuration, "execution", "thread") == "process"
+        """Is _run executed in a pool of worker processes. The data is then always queued, like if thread_safe."""
         self._first_execution: bool = True
         """If the module was called by its first link, this is set to false."""
         self._metrics = metrics_registry.register(
             module_id=configuration.id,
             module_name=configuration.module_name,
-            queue=self.queue if thread_safe else None,
+            queue=self.queue if thread_safe or self._in_processes else None,
         )
+        self._field_validation_cache = utils.data_validation.ValidationCache(
+            on_lookup=self._metrics.record_validation_lookup)
+        """Results of shape-only field requirements for the shapes of already validated data objects."""
+        self._tag_validation_cache = utils.data_validation.ValidationCache(
+            on_lookup=self._metrics.record_validation_lookup)
+        """Results of shape-only tag requirements for the shapes of already validated data objects."""
         self.queue_size_last_warning_band: int = 0
         """The queue size band for which the last warning message was emitted."""
 
@@ -72,6 +123,9 @@ class AbstractProcessorModule(AbstractModule):
         Errors raised during processing are caught and logged per item so that a single
         failing item does not halt the queue worker.
         """
+        if self._in_processes:
+            self._process_queue_in_processes()
+            return
         while self.active:
             # Do not process anything while the module is not ready. A module can also lose
             # its readiness again (e.g. a start method which blocks and raises on a connection
@@ -88,7 +142,10 @@ class AbstractProcessorModule(AbstractModule):
 
             ctx = data_context_map.get(data)
             if ctx is not None and ctx.internal_ts is not None:
-                self._metrics.record_internal_wait(time.monotonic() - ctx.internal_ts)
+                now = time.monotonic()
+                self._metrics.record_internal_wait(now - ctx.internal_ts)
+                if ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "internal_wait", ctx.internal_ts, now)
 
             # Set the last received data for dynamic variables.
             self.current_input_data = data
@@ -102,8 +159,11 @@ class AbstractProcessorModule(AbstractModule):
                 else:
                     data = AbstractModule._invoke_async(self._run, data)
 
-                self._metrics.record_processing_time(time.monotonic() - t0)
+                t1 = time.monotonic()
+                self._metrics.record_processing_time(t1 - t0)
                 self._metrics.record_processed()
+                if ctx is not None and ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "run", t0, t1)
 
                 # Propagate context if _run() returned a new data object.
                 data_context_map.propagate(original_data, data)
@@ -116,6 +176,76 @@ class AbstractProcessorModule(AbstractModule):
                                   .format(self.configuration.module_name, self.configuration.id, str(e)),
                                   exc_info=config.EXC_INFO)
 
+    def _process_queue_in_processes(self):
+        """
+        Drains the data queue like _process_queue, but executes _run in a pool of worker processes.
+
+        Up to two data objects per worker process are in flight at once. The results are forwarded in the
+        order the data objects were received. The pool is created on start and shut down as soon as the
+        module is no longer active. Every worker process has its own instance of the module, which is not
+        started - so _run must not depend on the start routine or on dynamic variables of other modules.
+        """
+        process_count = getattr(self.configuration, "process_count", 0) or os.cpu_count() or 1
+        name = "processes_{0}".format(self.configuration.id)
+        executor_metrics = metrics_registry.register_executor(name=name, max_workers=process_count)
+        executor_metrics.workers = process_count
+        # Spawned instead of forked: forking a process with running threads can deadlock the child.
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=process_count,
+                                                      mp_context=multiprocessing.get_context("spawn"),
+                                                      initializer=_init_process,
+                                                      initargs=(type(self), self.configuration))
+        pending = collections.deque()
+        try:
+            while self.active:
+                self._await_started()
+
+                # Keep the pool busy, then wait for the oldest data object to keep the order.
+                try:
+                    data = self.queue.get(block=not pending, timeout=1)
+                    self.queue.task_done()
+                    ctx = data_context_map.get(data)
+                    if ctx is not None and ctx.internal_ts is not None:
+                        now = time.monotonic()
+                        self._metrics.record_internal_wait(now - ctx.internal_ts)
+                        if ctx.trace is not None:
+                            ctx.trace.add(self.configuration.id, "internal_wait", ctx.internal_ts, now)
+                    self.current_input_data = data
+                    pending.append((data, time.monotonic(), pool.submit(_run_in_process, data)))
+                    executor_metrics.record_submitted()
+                    # Up to twice as many tasks as processes are in flight; the others wait in the pool.
+                    executor_metrics.busy = min(len(pending), process_count)
+                    if len(pending) < 2 * process_count:
+                        continue
+                except queue.Empty:
+                    if not pending:
+                        continue
+
+                original_data, t0, future = pending.popleft()
+                executor_metrics.busy = min(len(pending), process_count)
+                try:
+                    data, worker, seconds = future.result()
+                    executor_metrics.record_task(worker=worker, seconds=seconds)
+                    t1 = time.monotonic()
+                    self._metrics.record_processing_time(t1 - t0)
+                    self._metrics.record_processed()
+                    ctx = data_context_map.get(original_data)
+                    if ctx is not None and ctx.trace is not None:
+                        ctx.trace.add(self.configuration.id, "run", t0, t1)
+
+                    # The result is always a new data object, coming from another process.
+                    data_context_map.propagate(original_data, data)
+
+                    # Call the subsequent links.
+                    self._call_links(data)
+                except Exception as e:
+                    self._metrics.record_error()
+                    self.logger.error("Something went wrong while executing processor module {0} ({1}): {2}"
+                                      .format(self.configuration.module_name, self.configuration.id, str(e)),
+                                      exc_info=config.EXC_INFO)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            metrics_registry.unregister_executor(name)
+
     def _validate_data(self, data: models.Data):
         """
         Validates the incoming data against field and tag requirements.
@@ -125,13 +255,13 @@ class AbstractProcessorModule(AbstractModule):
         :raises utils.data_validation.ValidationError: If requirements are not satisfied.
         """
         valid_field_data, _, field_validation_messages = utils.data_validation.validate(
-            data=data.fields, requirements=self.field_requirements)
+            data=data.fields, requirements=self.field_requirements, cache=self._field_validation_cache)
         if not valid_field_data:
             messages = utils.data_validation.format_message(field_validation_messages)
             raise utils.data_validation.ValidationError(
                 "Invalid field input data: {0}".format(" ".join(messages)))
         valid_tag_data, _, tag_validation_messages = utils.data_validation.validate(
-            data=data.tags, requirements=self.tag_requirements)
+            data=data.tags, requirements=self.tag_requirements, cache=self._tag_validation_cache)
         if not valid_tag_data:
             messages = utils.data_validation.format_message(tag_validation_messages)
             raise utils.data_validation.ValidationError(
@@ -142,14 +272,16 @@ class AbstractProcessorModule(AbstractModule):
         External entry point for passing data into the module.
 
         Validates the incoming data against the module's field and tag requirements before processing.
-        What happens next depends on thread_safe mode:
+        What happens next depends on thread_safe mode (execution 'process' behaves like thread_safe enabled):
 
           - thread_safe disabled: _run is called directly on the calling thread and
             the result is forwarded to downstream links before returning.
           - thread_safe enabled: data is placed on the internal queue and processed
             by a dedicated queue worker thread. The queue worker is started lazily on
-            the first call. Incoming data is silently dropped if the queue has reached
-            config.STOP_LIMIT to prevent unbounded memory growth; a warning is logged
+            the first call. Incoming data is dropped if the queue has reached
+            config.STOP_LIMIT or its memory budget (see utils.memory_governor) to prevent unbounded
+            memory growth - with config.BACKPRESSURE_TIMEOUT
+            only after waiting that long for the queue to drain; a warning is logged
             once per config.WARNING_LIMIT band the queue grows into, and re-armed once
             the queue recovers below config.WARNING_LIMIT.
 
@@ -165,7 +297,10 @@ class AbstractProcessorModule(AbstractModule):
 
             ctx = data_context_map.get(data)
             if ctx is not None:
-                self._metrics.record_link_wait(time.monotonic() - ctx.link_ts)
+                now = time.monotonic()
+                self._metrics.record_link_wait(now - ctx.link_ts)
+                if ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "link_wait", ctx.link_ts, now)
             self._metrics.record_received()
 
             # Set the current data object.
@@ -176,7 +311,7 @@ class AbstractProcessorModule(AbstractModule):
             if not data.measurement:
                 return
 
-            if self._thread_safe:
+            if self._thread_safe or self._in_processes:
                 if self._first_execution:
                     self._first_execution = False
                     # Start the queue processing for storing incoming data.
@@ -193,12 +328,14 @@ class AbstractProcessorModule(AbstractModule):
                                         "We have currently '{0}' elements in our queue to process."
                                         .format(str(queue_size)))
                     self.queue_size_last_warning_band = warning_band
-                if self.queue.qsize() < config.STOP_LIMIT:
+                if self._await_queue_space(self.queue, data):
                     # Stamp internal-queue entry time in the context (not on the data object).
                     if ctx is not None:
                         ctx.internal_ts = time.monotonic()
                     # Queue the data to be stored.
                     self.queue.put(data)
+                else:
+                    self._metrics.record_drop()
             else:
                 # Non-thread-safe: run synchronously on the calling thread.
                 # There is no queue to hold the data, so we wait here for the module to be ready.
@@ -209,8 +346,11 @@ class AbstractProcessorModule(AbstractModule):
                     data = self._run(data)
                 else:
                     data = AbstractModule._invoke_async(self._run, data)
-                self._metrics.record_processing_time(time.monotonic() - t0)
+                t1 = time.monotonic()
+                self._metrics.record_processing_time(t1 - t0)
                 self._metrics.record_processed()
+                if ctx is not None and ctx.trace is not None:
+                    ctx.trace.add(self.configuration.id, "run", t0, t1)
 
                 # Propagate context if _run() returned a new data object.
                 data_context_map.propagate(original_data, data)
@@ -223,6 +363,21 @@ class AbstractProcessorModule(AbstractModule):
                               .format(self.configuration.module_name, self.configuration.id, str(e)),
                               exc_info=config.EXC_INFO)
 
+    def run_batch(self, batch: list[models.Data]):
+        """
+        External entry point for passing several data objects into the module at once.
+
+        Called by the link workers instead of run if the linking module has batch_size_per_link greater than 1.
+        The default implementation passes the data objects to run one by one, in order.
+        Override it if the module can process several data objects more efficiently at once
+        (e.g. vectorized). An override takes over everything run does for each data object:
+        validation, metrics and forwarding the results to the links.
+
+        :param batch: The data objects, oldest first.
+        """
+        for data in batch:
+            self.run(data)
+
     @abstractmethod
     def _run(self, data: models.Data) -> models.Data:
         """
@@ -0,0 +1,663 @@
+"""
+Buffers the data of other output modules in an append-only log on the local disk.
+The data is replayed as soon as the output module can store it again.
+
+Configure it with `is_buffer` and set `buffered` for the output modules whose data should be buffered.
+Each output module gets its own log: a folder below `path` holding segment files, which are written one after the other.
+A segment file is read via a memory map and deleted as soon as it has been replayed completely.
+
+Written data is synced to the disk in intervals (see `fsync_interval_ms`), or right away if it is 0.
+Data written since the last sync can be lost on a power loss.
+For the same reason, data replayed since the last sync is replayed again after a restart.
+
+The oldest segments of a log are deleted if the log grows larger than `max_size_mb`, or if they are older than
+`max_age_hours`. A warning is logged in that case.
+
+Values are restored with their type if they are None, bool, int, float, complex, str, bytes, datetime, date, time,
+timedelta, Decimal or numpy scalars and arrays, or lists, tuples, sets or dicts of them. Any other value is stored as
+its string, which is logged once per type. Timestamps keep their offset to UTC, or that they have no timezone.
+"""
+__version__: int = 1
+"""The auto-generated version of the module."""
+import os
+import mmap
+import logging
+import time
+import zlib
+import struct
+import marshal
+import threading
+import urllib.parse
+from dataclasses import dataclass, field
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Optional
+
+# Internal imports.
+import config
+import models
+from modules.base.outputs.base import AbstractOutputModule
+
+_HEADER = struct.Struct("<II")
+"""The header of a record: the length and the CRC32 checksum of the encoded data object."""
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+"""The reference point of the stored timestamps."""
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+"""The reference point of the stored timestamps without a timezone."""
+_MARSHALABLE: tuple[type, ...] = (type(None), bool, int, float, complex, str, bytes)
+"""Value types which are stored as they are."""
+_TUPLE, _DATETIME, _DATE, _TIME, _TIMEDELTA, _DECIMAL, _NUMPY_SCALAR, _NUMPY_ARRAY = range(8)
+"""The type codes of the tagged tuples, which store the values marshal can not store (see `_tagged`)."""
+_logger = logging.getLogger(config.APP_NAME.lower() + '.' + __name__)
+"""Logs the values which can only be stored as strings."""
+_stringified: set[type] = set()
+"""The types which were stored as strings, so each of them is logged once."""
+
+
+def _tagged(value: Any) -> Any:
+    """
+    Converts a value into one that marshal can store. Containers are converted item by item. Every tuple becomes a
+    tagged tuple of a type code and the data to restore the value, see `_untagged`: tuples, datetimes, dates,
+    times, timedeltas, decimals and numpy scalars and arrays. Subclasses of the stored types are stored as their
+    base type. Any other value is stored as its string.
+
+    :param value: The value to convert.
+    :returns: The converted value.
+    """
+    cls = type(value)
+    if cls in _MARSHALABLE:
+        return value
+    if isinstance(value, dict):
+        return {_tagged(key): _tagged(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_tagged(item) for item in value]
+    if isinstance(value, tuple):
+        return _TUPLE, tuple(_tagged(item) for item in value)
+    if isinstance(value, frozenset):
+        return frozenset(_tagged(item) for item in value)
+    if isinstance(value, set):
+        return {_tagged(item) for item in value}
+    if isinstance(value, datetime):
+        return _DATETIME, value.isoformat()
+    if isinstance(value, date):
+        return _DATE, value.isoformat()
+    if isinstance(value, dt_time):
+        return _TIME, value.isoformat()
+    if isinstance(value, timedelta):
+        return _TIMEDELTA, value.days, value.seconds, value.microseconds
+    if isinstance(value, Decimal):
+        return _DECIMAL, str(value)
+    if cls.__module__ == "numpy" and hasattr(value, "dtype") and hasattr(value, "tobytes"):
+        if getattr(value, "ndim", 0):
+            return _NUMPY_ARRAY, value.dtype.str, value.shape, value.tobytes()
+        return _NUMPY_SCALAR, value.dtype.str, value.tobytes()
+    for base in _MARSHALABLE:
+        if isinstance(value, base):
+            return base(value)
+    if cls not in _stringified:
+        _stringified.add(cls)
+        _logger.warning("Values of type '{0}' can not be buffered as they are and are stored as strings."
+                        .format(cls.__qualname__))
+    return str(value)
+
+
+def _untagged(value: Any) -> Any:
+    """
+    Restores a value converted by `_tagged`.
+
+    :param value: The converted value.
+    :returns: The restored value.
+    """
+    cls = type(value)
+    if cls is tuple:
+        code = value[0]
+        if code == _TUPLE:
+            return tuple(_untagged(item) for item in value[1])
+        if code == _DATETIME:
+            return datetime.fromisoformat(value[1])
+        if code == _DATE:
+            return date.fromisoformat(value[1])
+        if code == _TIME:
+            return dt_time.fromisoformat(value[1])
+        if code == _TIMEDELTA:
+            return timedelta(days=value[1], seconds=value[2], microseconds=value[3])
+        if code == _DECIMAL:
+            return Decimal(value[1])
+        # A numpy value was stored, so numpy is installed.
+        import numpy
+        if code == _NUMPY_SCALAR:
+            return numpy.frombuffer(value[2], dtype=value[1])[0]
+        return numpy.frombuffer(value[3], dtype=value[1]).reshape(value[2]).copy()
+    if cls is dict:
+        return {_untagged(key): _untagged(item) for key, item in value.items()}
+    if cls is list:
+        return [_untagged(item) for item in value]
+    if cls is frozenset:
+        return frozenset(_untagged(item) for item in value)
+    if cls is set:
+        return {_untagged(item) for item in value}
+    return value
+
+
+def _is_plain(values: dict) -> bool:
+    """
+    :param values: The fields or tags of a data object.
+    :returns: True if all keys and values are of the types marshal stores as they are.
+    """
+    for key, value in values.items():
+        if type(key) not in _MARSHALABLE or type(value) not in _MARSHALABLE:
+            return False
+    return True
+
+
+def encode(data: models.Data) -> bytes:
+    """
+    Encodes a data object. The timestamp is stored as microseconds since the epoch, with its offset to UTC in
+    seconds, or None if it has no timezone.
+
+    :param data: The data object to encode.
+    :returns: The encoded data object.
+    """
+    timestamp, offset = data.time, None
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = (timestamp - _NAIVE_EPOCH) // timedelta(microseconds=1)
+        else:
+            offset = timestamp.utcoffset() // timedelta(seconds=1)
+            timestamp = (timestamp - _EPOCH) // timedelta(microseconds=1)
+    elif timestamp is not None:
+        timestamp = str(timestamp)
+    fields, tags = dict(data.fields), dict(data.tags)
+    if _is_plain(fields) and _is_plain(tags):
+        # The common case: flat values, which marshal stores as they are.
+        return marshal.dumps((data.measurement, fields, tags, timestamp, offset, False))
+    # marshal would store objects supporting the buffer protocol (e.g. numpy values) as bytes, so every other
+    # value is tagged.
+    return marshal.dumps((data.measurement, _tagged(fields), _tagged(tags), timestamp, offset, True))
+
+
+def decode(payload: bytes) -> models.Data:
+    """
+    Decodes a data object encoded by encode.
+
+    :param payload: The encoded data object.
+    :returns: The data object.
+    """
+    record = marshal.loads(payload)
+    if len(record) == 4:
+        # Written before the types and the offsets were kept: values as strings, the timestamp in UTC.
+        measurement, fields, tags, timestamp = record
+        if type(timestamp) is int:
+            timestamp = _EPOCH + timedelta(microseconds=timestamp)
+        return models.Data(measurement=measurement, fields=fields, tags=tags, time=timestamp)
+    measurement, fields, tags, timestamp, offset, tagged = record
+    if tagged:
+        fields, tags = _untagged(fields), _untagged(tags)
+    if type(timestamp) is int:
+        if offset is None:
+            timestamp = _NAIVE_EPOCH + timedelta(microseconds=timestamp)
+        else:
+            timezone_ = timezone.utc if not offset else timezone(timedelta(seconds=offset))
+            timestamp = (_EPOCH + timedelta(microseconds=timestamp)).astimezone(timezone_)
+    return models.Data(measurement=measurement, fields=fields, tags=tags, time=timestamp)
+
+
+class SegmentLog:
+    """
+    The append-only log of one module id: a folder of numbered segment files.
+
+    Records are appended to the newest segment, which is replaced by a new one once it has reached segment_size bytes.
+    They are read from the read offset, which is kept in the file 'offset' and only moved forward by ack.
+    Segments before the read offset are deleted.
+    Every record starts with its length and CRC32 checksum. A torn record at the end of the newest segment (e.g. after
+    a power loss) is cut off when the log is opened. A corrupted record in an older segment skips the rest of that segment.
+
+    All methods are thread-safe.
+
+    :param path: The folder of the log.
+    :param segment_size: The size in bytes after which a new segment is started.
+    :param max_size: The maximum size in bytes of all segments. 0 for no limit.
+    :param logger: The logger for reporting corrupted or deleted data.
+    """
+
+    def __init__(self, path: str, segment_size: int, max_size: int = 0, logger=None):
+        self.path: str = path
+        """The folder of the log."""
+        self.segment_size: int = segment_size
+        """The size in bytes after which a new segment is started."""
+        self.max_size: int = max_size
+        """The maximum size in bytes of all segments. 0 for no limit."""
+        self.logger = logger
+        """The logger of the module."""
+        self._lock = threading.Lock()
+        """Guards all of the following."""
+        self._map: Optional[mmap.mmap] = None
+        """The memory map of the segment which is currently read."""
+        self._map_segment: Optional[int] = None
+        """The number of the mapped segment."""
+        os.makedirs(path, exist_ok=True)
+        self._sizes: dict[int, int] = {
+            int(name[:-4]): os.path.getsize(os.path.join(path, name))
+            for name in sorted(os.listdir(path)) if name.endswith(".seg") and name[:-4].isdigit()}
+        """The size of each segment, by number, oldest first."""
+        self._read: tuple[int, int] = self._load_offset()
+        """The segment and position of the oldest record which was not acknowledged."""
+        for segment in [segment for segment in self._sizes if segment < self._read[0]]:
+            # Replayed before a restart, but not deleted yet.
+            self._delete(segment)
+        if not self._sizes:
+            self._sizes[self._read[0]] = 0
+        elif self._read[0] not in self._sizes:
+            self._read = (next(iter(self._sizes)), 0)
+        self._active: int = max(self._sizes)
+        """The number of the segment records are appended to."""
+        self._sizes[self._active] = self._recover(self._active)
+        if self._read[0] == self._active:
+            self._read = (self._active, min(self._read[1], self._sizes[self._active]))
+        self._writer = open(self._file(self._active), "ab")
+        """The file object of the active segment."""
+        self._unflushed: bool = False
+        """Are appended records held in the write buffer of the file object."""
+        self._unsynced: bool = False
+        """Were records appended or acknowledged since the last sync."""
+
+    def _file(self, segment: int) -> str:
+        return os.path.join(self.path, "{0:016d}.seg".format(segment))
+
+    def _load_offset(self) -> tuple[int, int]:
+        try:
+            with open(os.path.join(self.path, "offset"), encoding="utf-8") as file:
+                segment, position = file.read().split()
+            return int(segment), int(position)
+        except (OSError, ValueError):
+            return min(self._sizes, default=0), 0
+
+    def _recover(self, segment: int) -> int:
+        """
+        Cuts a torn or corrupted record off the end of a segment.
+
+        :param segment: The number of the segment.
+        :returns: The size of the segment up to its last complete record.
+        """
+        position = 0
+        if not self._sizes[segment]:
+            return position
+        with open(self._file(segment), "r+b") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return 0
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                while position + _HEADER.size <= size:
+                    length, checksum = _HEADER.unpack_from(view, position)
+                    end = position + _HEADER.size + length
+                    if end > size or zlib.crc32(view[position + _HEADER.size:end]) != checksum:
+                        break
+                    position = end
+            if position < size:
+                if self.logger:
+                    self.logger.warning("Cut off {0} bytes of an incomplete record at the end of buffer file '{1}'."
+                                        .format(size - position, self._file(segment)))
+                file.truncate(position)
+        return position
+
+    def _delete(self, segment: int):
+        if self._map_segment == segment:
+            self._map.close()
+            self._map, self._map_segment = None, None
+        self._sizes.pop(segment, None)
+        try:
+            os.remove(self._file(segment))
+        except FileNotFoundError:
+            pass
+
+    def _roll(self):
+        """
+        Seals the active segment and starts a new one.
+        """
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._writer.close()
+        self._active += 1
+        self._sizes[self._active] = 0
+        self._writer = open(self._file(self._active), "ab")
+        self._unflushed = False
+
+    def _drop_oldest(self, reason: str):
+        segment = next(iter(self._sizes))
+        if self.logger:
+            self.logger.warning("Deleted {0} bytes of buffered data in '{1}', since {2}."
+                                .format(self._sizes[segment], self.path, reason))
+        self._delete(segment)
+        if self._read[0] <= segment:
+            self._read = (next(iter(self._sizes)), 0)
+            self._unsynced = True
+
+    def _view(self, segment: int) -> Optional[mmap.mmap]:
+        """
+        The memory map of a segment. The map of the active segment is renewed if the segment has grown.
+
+        :param segment: The number of the segment.
+        :returns: The memory map, or None if the segment is empty.
+        """
+        size = self._sizes[segment]
+        if self._map_segment == segment and len(self._map) >= size:
+            return self._map
+        if self._map is not None:
+            self._map.close()
+            self._map, self._map_segment = None, None
+        if size == 0:
+            return None
+        if segment == self._active and self._unflushed:
+            self._writer.flush()
+            self._unflushed = False
+        with open(self._file(segment), "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map_segment = segment
+        return self._map
+
+    def append(self, payload: bytes):
+        """
+        Appends a record.
+
+        :param payload: The record.
+        """
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._sizes[self._active] >= self.segment_size:
+                self._roll()
+                if self.max_size:
+                    while sum(self._sizes.values()) > self.max_size and len(self._sizes) > 1:
+                        self._drop_oldest("the buffer exceeded its maximum size")
+            self._writer.write(record)
+            self._sizes[self._active] += len(record)
+            self._unflushed = self._unsynced = True
+
+    def read(self, count: int) -> tuple[list[bytes], tuple[int, int]]:
+        """
+        Reads the oldest records which were not acknowledged, without removing them.
+
+        :param count: The maximum number of records.
+        :returns: The records, oldest first, and the offset after the last of them (see ack).
+        """
+        records = []
+        with self._lock:
+            segment, position = self._read
+            while len(records) < count:
+                view = self._view(segment)
+                size = self._sizes[segment]
+                if position + _HEADER.size <= size:
+                    length, checksum = _HEADER.unpack_from(view, position)
+                    end = position + _HEADER.size + length
+                    payload = view[position + _HEADER.size:end] if end <= size else b""
+                    if end <= size and zlib.crc32(payload) == checksum:
+                        records.append(payload)
+                        position = end
+                        continue
+                    if self.logger:
+                        self.logger.error("Skipped {0} bytes of corrupted buffered data in '{1}'."
+                                          .format(size - position, self._file(segment)))
+                    position = size
+                if segment == self._active:
+                    break
+                # Continue with the next segment.
+                segment, position = next(number for number in self._sizes if number > segment), 0
+        return records, (segment, position)
+
+    def ack(self, offset: tuple[int, int]):
+        """
+        Removes all records before the given offset. Segments which were read completely are deleted.
+
+        :param offset: The offset returned by read.
+        """
+        with self._lock:
+            if offset <= self._read:
+                return
+            self._read = offset
+            self._unsynced = True
+            for segment in [segment for segment in self._sizes if segment < offset[0]]:
+                self._delete(segment)
+
+    def sync(self, max_age: float = 0):
+        """
+        Writes appended records and the read offset to the disk.
+        Starts a new segment if the active one was read completely, and deletes segments older than max_age.
+
+        :param max_age: The maximum age in seconds of the last record of a segment. 0 for no limit.
+        """
+        with self._lock:
+            if max_age:
+                cutoff = time.time() - max_age
+                if self._sizes[self._active] and os.path.getmtime(self._file(self._active)) < cutoff:
+                    self._roll()
+                while len(self._sizes) > 1 and os.path.getmtime(self._file(next(iter(self._sizes)))) < cutoff:
+                    self._drop_oldest("it is older than the maximum age")
+            if self._read == (self._active, self._sizes[self._active]) and self._read[1]:
+                # Everything was replayed: start over with an empty segment.
+                self._roll()
+                self._delete(self._read[0])
+                self._read = (self._active, 0)
+                self._unsynced = True
+            if not self._unsynced:
+                return
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            self._unflushed = self._unsynced = False
+            temporary = os.path.join(self.path, "offset.tmp")
+            with open(temporary, "w", encoding="utf-8") as file:
+                file.write("{0} {1}".format(*self._read))
+            os.replace(temporary, os.path.join(self.path, "offset"))
+
+    def close(self):
+        """
+        Syncs and closes the log.
+        """
+        self.sync()
+        with self._lock:
+            self._writer.close()
+            if self._map is not None:
+                self._map.close()
+                self._map, self._map_segment = None, None
+
+
+class OutputModule(AbstractOutputModule):
+    """
+    Buffers data in an append-only log on the local disk.
+
+    :param configuration: The configuration object of the module.
+    """
+    version: int = __version__
+    """The version of the module."""
+    public: bool = True
+    """Is this module public?"""
+    description: str = "Buffers data in an append-only log on the local disk."
+    """A short description."""
+    can_be_buffer: bool = True
+    """If True, the child has to implement 'store_buffer_data' and 'get_buffer_data'."""
+    maintenance_interval: float = 1.0
+    """The seconds between two deletions of old and replayed segments, if every data object is synced on its own."""
+
+    @dataclass
+    class Configuration(models.OutputModule):
+        """
+        The configuration model of the output module.
+        """
+        path: str = field(
+            metadata=dict(description="The folder of the buffer files.",
+                          required=False),
+            default=os.path.join("..", "data", "buffer"))
+        segment_size_mb: int = field(
+            metadata=dict(description="The size in MB of a single buffer file.",
+                          required=False,
+                          validate=models.validations.Range(min=1, exclusive=False)),
+            default=64)
+        fsync_interval_ms: int = field(
+            metadata=dict(description="The interval in milliseconds the buffered data is synced to the disk. "
+                                      "0 syncs every data object on its own.",
+                          required=False,
+                          validate=models.validations.Range(min=0, exclusive=False)),
+            default=1000)
+        max_size_mb: int = field(
+            metadata=dict(description="The maximum size in MB of the buffered data per output module. "
+                                      "The oldest data is deleted if it is exceeded. 0 for no limit.",
+                          required=False,
+                          validate=models.validations.Range(min=0, exclusive=False)),
+            default=0)
+        max_age_hours: int = field(
+            metadata=dict(description="The maximum age in hours of buffered data. "
+                                      "Older data is deleted. 0 for no limit.",
+                          required=False,
+                          validate=models.validations.Range(min=0, exclusive=False)),
+            default=0)
+
+    def __init__(self, configuration: Configuration):
+        super().__init__(configuration=configuration)
+        self._logs: dict[str, SegmentLog] = {}
+        """The log of each module id."""
+        self._logs_lock = threading.Lock()
+        """Guards _logs."""
+        self._stopped = threading.Event()
+        """Stops the sync thread."""
+
+    def start(self):
+        """
+        Method for starting the module. Syncs the logs and deletes old and replayed segments in the background.
+        """
+        threading.Thread(target=self._sync_loop, daemon=True,
+                         name="Buffer_Sync_{0}".format(self.configuration.id)).start()
+
+    def stop(self):
+        """
+        Method for stopping the module. Syncs and closes the logs.
+        """
+        self._stopped.set()
+        with self._logs_lock:
+            for log in self._logs.values():
+                try:
+                    log.close()
+                except Exception as e:
+                    self.logger.error("Could not close buffer '{0}': {1}".format(log.path, str(e)),
+                                      exc_info=config.EXC_INFO)
+            self._logs.clear()
+
+    def _sync_loop(self):
+        """
+        Syncs the logs every fsync_interval_ms, which also deletes old and replayed segments.
+        If every data object is synced on its own (fsync_interval_ms is 0), only the deletion is left to do here,
+        every maintenance_interval.
+        """
+        interval = self.configuration.fsync_interval_ms / 1000.0 or self.maintenance_interval
+        while not self._stopped.wait(interval):
+            with self._logs_lock:
+                logs = list(self._logs.values())
+            for log in logs:
+                try:
+                    log.sync(max_age=self.configuration.max_age_hours * 3600)
+                except Exception as e:
+                    self.logger.error("Could not sync buffer '{0}': {1}".format(log.path, str(e)),
+                                      exc_info=config.EXC_INFO)
+
+    def _log(self, module_id: str) -> SegmentLog:
+        """
+        The log of a module id, opened on first use.
+
+        :param module_id: The module id.
+        :returns: The log.
+        """
+        log = self._logs.get(module_id)
+        if log is None:
+            if self._stopped.is_set():
+                raise RuntimeError("The buffer module was stopped.")
+            with self._logs_lock:
+                log = self._logs.get(module_id)
+                if log is None:
+                    segment_size = self.configuration.segment_size_mb * 1024 * 1024
+                    max_size = self.configuration.max_size_mb * 1024 * 1024
+                    if max_size:
+                        # The size is limited by deleting whole segments.
+                        segment_size = min(segment_size, max(max_size // 4, 1))
+                    log = SegmentLog(path=os.path.join(self.configuration.path, urllib.parse.quote(module_id, safe="")),
+                                     segment_size=segment_size, max_size=max_size, logger=self.logger)
+                    self._logs[module_id] = log
+        return log
+
+    def _run(self, data: models.Data):
+        """
+        Stores data linked to this module under its own id.
+
+        :param data: The data object to be processed.
+        """
+        self.store_buffer_data(self.configuration.id, data)
+
+    def store_buffer_data(self, module_id: str, data: models.Data) -> bool:
+        """
+        Appends data to the log of the given module id.
+
+        :param module_id: The id of the output module for which the data is being buffered.
+        :param data: The data object to buffer.
+        :returns: True if the data was successfully stored, False otherwise.
+        """
+        success = False
+        try:
+            log = self._log(module_id)
+            log.append(encode(data))
+            if not self.configuration.fsync_interval_ms:
+                log.sync()
+            success = True
+        except Exception as e:
+            self.logger.error("Could not store data in buffer: {0}".format(str(e)),
+                              exc_info=config.EXC_INFO)
+        return success
+
+    def get_buffer_data(self, module_id: str) -> Optional[models.Data]:
+        """
+        Retrieves and removes the oldest buffered data entry for the given module id.
+
+        :param module_id: The id of the output module whose buffered data is requested.
+        :returns: The oldest buffered data object for the given module id, or None if the buffer is empty.
+        """
+        data = None
+        try:
+            batch, offset = self.get_buffer_data_batch(module_id, 1)
+            self.ack_buffer_data(module_id, offset)
+            if batch:
+                data = batch[0]
+        except Exception as e:
+            self.logger.error("Could not get buffered data: {0}".format(str(e)),
+                              exc_info=config.EXC_INFO)
+        return data
+
+    def get_buffer_data_batch(self, module_id: str, count: int) -> tuple[list[models.Data], Any]:
+        """
+        Retrieves up to count of the oldest buffered data entries for the given module id, without removing them.
+        Entries which can not be decoded are skipped.
+
+        :param module_id: The id of the output module whose buffered data is requested.
+        :param count: The maximum number of entries.
+        :returns: The entries, oldest first, and the offset after the last of them.
+        """
+        log = self._log(module_id)
+        while True:
+            records, offset = log.read(count)
+            batch = []
+            for record in records:
+                try:
+                    batch.append(decode(record))
+                except Exception as e:
+                    self.logger.error("Skipped buffered data which could not be decoded: {0}".format(str(e)),
+                                      exc_info=config.EXC_INFO)
+            if batch or not records:
+                return batch, offset
+            # None of the entries could be decoded: an empty batch would look like an empty buffer.
+            log.ack(offset)
+
+    def ack_buffer_data(self, module_id: str, offset: Any):
+        """
+        Removes the buffered data entries retrieved by get_buffer_data_batch for the given module id.
+
+        :param module_id: The id of the output module whose buffered data was stored.
+        :param offset: The offset returned by get_buffer_data_batch.
+        """
+        log = self._log(module_id)
+        log.ack(offset)
+        if not self.configuration.fsync_interval_ms:
+            log.sync()
@@ -0,0 +1,63 @@
+import unittest
+import os
+
+# Internal imports.
+import models
+import models.configuration
+
+
+class TestEnvironmentVariables(unittest.TestCase):
+    """
+    Resolving environment variables (${env.<name>}) in the attributes of module configurations.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        os.environ["TEST_MODELS_NAME"] = "first"
+        os.environ["TEST_MODELS_COUNT"] = "3"
+        models.configuration.invalidate_env_cache()
+        self.configuration = models.ProcessorModule(module_name="processors.test",
+                                                    name="name_${env.TEST_MODELS_NAME}",
+                                                    worker_count_per_link="${env.TEST_MODELS_COUNT}")
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        os.environ.pop("TEST_MODELS_NAME", None)
+        os.environ.pop("TEST_MODELS_COUNT", None)
+        models.configuration.invalidate_env_cache()
+
+    def test_variables_are_resolved_and_converted(self):
+        for _ in range(3):
+            self.assertEqual(self.configuration.name, "name_first")
+            self.assertEqual(self.configuration.worker_count_per_link, 3)
+        self.assertEqual(self.configuration.__dict__["name"], "name_${env.TEST_MODELS_NAME}")
+
+    def test_changed_environment_is_used_after_invalidation(self):
+        self.assertEqual(self.configuration.name, "name_first")
+        os.environ["TEST_MODELS_NAME"] = "second"
+        models.configuration.invalidate_env_cache()
+        self.assertEqual(self.configuration.name, "name_second")
+
+    def test_reassigned_attributes_are_resolved_again(self):
+        self.assertEqual(self.configuration.name, "name_first")
+        self.configuration.name = "other_${env.TEST_MODELS_COUNT}"
+        self.assertEqual(self.configuration.name, "other_3")
+
+    def test_configurations_do_not_share_resolved_values(self):
+        other = models.ProcessorModule(module_name="processors.test", name="plain")
+        self.assertEqual(self.configuration.name, "name_first")
+        self.assertEqual(other.name, "plain")
+
+    def test_raw_lists_are_returned_as_they_are(self):
+        self.configuration.links = ["a"]
+        links = self.configuration.links
+        links.append("b")
+        self.assertEqual(self.configuration.links, ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import copy
+import pickle
+
+# Internal imports.
+import models
+from models.interfaces import CopyOnWriteDict
+
+
+class TestDataSnapshot(unittest.TestCase):
+    """
+    Copy-on-write copies of a data object, as used for forwarding one data object to several links.
+
+    Every copy has to behave exactly like a deep copy of its own: nothing done to one of them
+    may show up in another one, in the snapshot or in the original data object.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.data = models.Data(measurement="test",
+                                fields={"value": 1.5, "array": [1, 2, 3], "nested": {"a": [1]}},
+                                tags={"sensor": "s1", "limits": (1, 2)})
+
+    def test_copies_are_equal_to_the_original(self):
+        snapshot = models.DataSnapshot(self.data)
+        data_copy = snapshot.copy()
+        self.assertEqual(self.data, data_copy)
+        self.assertEqual(self.data.fields, data_copy.fields)
+        self.assertEqual(self.data.tags, data_copy.tags)
+
+    def test_immutable_values_are_shared(self):
+        snapshot = models.DataSnapshot(self.data)
+        first, second = snapshot.copy(), snapshot.copy()
+        self.assertIs(first.fields["value"], second.fields["value"])
+        self.assertIs(first.tags["limits"], second.tags["limits"])
+
+    def test_changing_a_copy_does_not_affect_others(self):
+        snapshot = models.DataSnapshot(self.data)
+        first, second = snapshot.copy(), snapshot.copy()
+
+        first.fields["value"] = 2
+        first.fields["array"].append(4)
+        first.fields["nested"]["a"].append(2)
+        del first.tags["sensor"]
+
+        self.assertEqual(second.fields, {"value": 1.5, "array": [1, 2, 3], "nested": {"a": [1]}})
+        self.assertEqual(second.tags, {"sensor": "s1", "limits": (1, 2)})
+        self.assertEqual(snapshot.copy().fields["array"], [1, 2, 3])
+
+    def test_changing_the_original_does_not_affect_copies(self):
+        snapshot = models.DataSnapshot(self.data)
+        data_copy = snapshot.copy()
+        self.data.fields["array"].append(4)
+        self.data.fields["value"] = 0
+        self.assertEqual(data_copy.fields["array"], [1, 2, 3])
+        self.assertEqual(data_copy.fields["value"], 1.5)
+
+    def test_values_handed_out_in_bulk_are_private(self):
+        snapshot = models.DataSnapshot(self.data)
+        first, second = snapshot.copy(), snapshot.copy()
+        for value in first.fields.values():
+            if isinstance(value, list):
+                value.append(4)
+        for _, value in first.fields.items():
+            if isinstance(value, dict):
+                value["b"] = 1
+        first.fields.pop("value")
+        self.assertEqual(second.fields, {"value": 1.5, "array": [1, 2, 3], "nested": {"a": [1]}})
+
+    def test_snapshot_of_a_copy(self):
+        """
+        A processor forwarding a copy it received takes a snapshot of a copy-on-write copy.
+        """
+        data_copy = models.DataSnapshot(self.data).copy()
+        data_copy.fields["array"].append(4)
+        second_hop = models.DataSnapshot(data_copy).copy()
+        self.assertEqual(second_hop.fields["array"], [1, 2, 3, 4])
+        second_hop.fields["nested"]["a"].append(2)
+        self.assertEqual(data_copy.fields["nested"], {"a": [1]})
+
+    def test_copy_deepcopy_and_pickle_result_in_plain_dicts(self):
+        data_copy = models.DataSnapshot(self.data).copy()
+        for result in [copy.copy(data_copy.fields), copy.deepcopy(data_copy.fields),
+                       pickle.loads(pickle.dumps(data_copy.fields)), data_copy.fields.copy()]:
+            with self.subTest(result=result):
+                self.assertIs(type(result), dict)
+                self.assertEqual(result, self.data.fields)
+        self.assertIsInstance(data_copy.fields, CopyOnWriteDict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+import logging
+import os
+import tempfile
+import time
+import marshal
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+from decimal import Decimal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Internal imports.
+import config
+import models
+import data_layer
+import utils.plugin_interface
+from modules.core.outputs.buffers import segment_log
+from modules.core.outputs.buffers.segment_log import OutputModule, SegmentLog, encode, decode
+
+
+class TestSegmentLog(unittest.TestCase):
+    """
+    The append-only log of the segment log buffer.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "module_buffer")
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.directory.cleanup()
+
+    def _segments(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.path) if name.endswith(".seg"))
+
+    def test_encoding(self):
+        data = models.Data(measurement="m", fields={"a": 1, "b": [1.5, "x", None], "c": {"d": b"\x00"}, "e": (1, 2)},
+                           tags={"tag": "value"}, time=datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc))
+        decoded = decode(encode(data))
+        self.assertEqual(data.measurement, decoded.measurement)
+        self.assertEqual(data.time, decoded.time)
+        self.assertEqual(data.tags, decoded.tags)
+        self.assertEqual(data.fields, decoded.fields)
+
+    def test_values_keep_their_types(self):
+        fields = {"datetime": datetime(2024, 1, 1), "aware": datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=2))),
+                  "date": date(2024, 1, 1), "time": dt_time(12, 30), "timedelta": timedelta(days=1, microseconds=5),
+                  "decimal": Decimal("1.5"), "tuple": (1, (Decimal("2"), "x")), "nested": {"list": [date(2024, 1, 2)]},
+                  "set": {(1, 2)}}
+        decoded = decode(encode(models.Data(measurement="m", fields=fields, tags={"d": Decimal("3")})))
+        self.assertEqual(fields, decoded.fields)
+        self.assertEqual({key: type(value) for key, value in fields.items()},
+                         {key: type(value) for key, value in decoded.fields.items()})
+        self.assertEqual(timedelta(hours=2), decoded.fields["aware"].utcoffset())
+        self.assertIs(Decimal, type(decoded.tags["d"]))
+
+    def test_timestamps_keep_their_timezone(self):
+        for timestamp in [datetime(2024, 1, 2, 3, 4, 5, 6), datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+                          datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5)))]:
+            with self.subTest(timestamp=timestamp):
+                decoded = decode(encode(models.Data(measurement="m", time=timestamp))).time
+                self.assertEqual(timestamp.replace(tzinfo=None), decoded.replace(tzinfo=None))
+                self.assertEqual(timestamp.utcoffset(), decoded.utcoffset())
+
+    def test_unknown_types_are_stored_as_strings(self):
+        class _Unknown:
+            def __str__(self):
+                return "unknown"
+
+        with self.assertLogs("{0}.{1}".format(config.APP_NAME.lower(), segment_log.__name__), level="WARNING"):
+            decoded = decode(encode(models.Data(measurement="m", fields={"value": _Unknown()})))
+        self.assertEqual({"value": "unknown"}, decoded.fields)
+
+    def test_records_of_the_previous_encoding(self):
+        payload = marshal.dumps(("m", {"a": "2024-01-01 00:00:00"}, {}, 0))
+        decoded = decode(payload)
+        self.assertEqual({"a": "2024-01-01 00:00:00"}, decoded.fields)
+        self.assertEqual(datetime(1970, 1, 1, tzinfo=timezone.utc), decoded.time)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed.")
+    def test_numpy_values_keep_their_types(self):
+        fields = {"scalar": numpy.float32(1.5), "array": numpy.arange(6, dtype=numpy.int16).reshape(2, 3)}
+        decoded = decode(encode(models.Data(measurement="m", fields=fields))).fields
+        self.assertEqual(numpy.float32, type(decoded["scalar"]))
+        self.assertEqual(fields["scalar"], decoded["scalar"])
+        self.assertEqual(fields["array"].dtype, decoded["array"].dtype)
+        self.assertTrue(numpy.array_equal(fields["array"], decoded["array"]))
+
+    def test_records_are_read_in_order_across_segments(self):
+        log = SegmentLog(self.path, segment_size=100)
+        for i in range(50):
+            log.append(encode(models.Data(measurement="m", fields={"i": i})))
+        self.assertGreater(len(self._segments()), 5)
+
+        received = []
+        while True:
+            records, offset = log.read(7)
+            if not records:
+                break
+            received.extend(decode(record).fields["i"] for record in records)
+            log.ack(offset)
+        self.assertEqual(list(range(50)), received)
+        self.assertEqual(1, len(self._segments()), "Replayed segments were not deleted.")
+        log.sync()
+        self.assertEqual(0, os.path.getsize(os.path.join(self.path, self._segments()[0])))
+        log.close()
+
+    def test_reopening_continues_at_the_acknowledged_offset(self):
+        log = SegmentLog(self.path, segment_size=1000)
+        for i in range(10):
+            log.append(encode(models.Data(measurement="m", fields={"i": i})))
+        records, offset = log.read(3)
+        log.ack(offset)
+        log.close()
+        # A record torn by a power loss.
+        with open(os.path.join(self.path, self._segments()[-1]), "ab") as file:
+            file.write(b"\x10\x00\x00\x00\x00")
+
+        with self.assertLogs("test", level="WARNING"):
+            log = SegmentLog(self.path, segment_size=1000, logger=logging.getLogger("test"))
+        log.append(encode(models.Data(measurement="m", fields={"i": 10})))
+        records, offset = log.read(100)
+        self.assertEqual(list(range(3, 11)), [decode(record).fields["i"] for record in records])
+        log.close()
+
+    def test_the_oldest_segments_are_deleted_above_the_maximum_size(self):
+        log = SegmentLog(self.path, segment_size=200, max_size=1000)
+        with self.assertLogs("test", level="WARNING"):
+            log.logger = logging.getLogger("test")
+            for i in range(200):
+                log.append(encode(models.Data(measurement="m", fields={"i": i})))
+        self.assertLessEqual(sum(os.path.getsize(os.path.join(self.path, name)) for name in self._segments()),
+                             1000 + 200)
+        records, _ = log.read(1000)
+        indices = [decode(record).fields["i"] for record in records]
+        self.assertEqual(list(range(indices[0], 200)), indices)
+        log.close()
+
+
+class TestSegmentLogBuffer(unittest.TestCase):
+    """
+    Buffering the data of output modules with the segment log buffer module.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.buffer = OutputModule(configuration=OutputModule.Configuration(
+            id="buffer", module_name="outputs.buffers.segment_log", is_buffer=True, path=self.directory.name))
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.buffer.stop()
+        self.directory.cleanup()
+
+    def test_the_core_module_is_registered_by_its_module_name(self):
+        utils.plugin_interface.load_modules()
+        self.assertIs(OutputModule, data_layer.registered_modules["outputs.buffers.segment_log"])
+
+    def test_data_is_kept_per_module(self):
+        for i in range(3):
+            self.assertTrue(self.buffer.store_buffer_data("a/1_buffer", models.Data(measurement="a", fields={"i": i})))
+            self.assertTrue(self.buffer.store_buffer_data("b_buffer", models.Data(measurement="b", fields={"i": i})))
+        self.assertEqual([0, 1, 2], [self.buffer.get_buffer_data("a/1_buffer").fields["i"] for _ in range(3)])
+        self.assertIsNone(self.buffer.get_buffer_data("a/1_buffer"))
+        self.assertEqual("b", self.buffer.get_buffer_data("b_buffer").measurement)
+
+    def test_batches_are_removed_once_acknowledged(self):
+        for i in range(5):
+            self.buffer.store_buffer_data("a_buffer", models.Data(measurement="m", fields={"i": i}))
+        batch, _ = self.buffer.get_buffer_data_batch("a_buffer", 3)
+        batch, offset = self.buffer.get_buffer_data_batch("a_buffer", 3)
+        self.assertEqual([0, 1, 2], [data.fields["i"] for data in batch])
+        self.buffer.ack_buffer_data("a_buffer", offset)
+        batch, _ = self.buffer.get_buffer_data_batch("a_buffer", 3)
+        self.assertEqual([3, 4], [data.fields["i"] for data in batch])
+
+    def test_buffered_data_survives_a_restart(self):
+        self.buffer.store_buffer_data("a_buffer", models.Data(measurement="m", fields={"i": 0}))
+        self.buffer.store_buffer_data("a_buffer", models.Data(measurement="m", fields={"i": 1}))
+        self.assertEqual(0, self.buffer.get_buffer_data("a_buffer").fields["i"])
+        self.buffer.stop()
+
+        self.buffer = OutputModule(configuration=self.buffer.configuration)
+        self.assertEqual(1, self.buffer.get_buffer_data("a_buffer").fields["i"])
+        self.assertIsNone(self.buffer.get_buffer_data("a_buffer"))
+
+    def test_old_data_is_deleted_without_a_sync_interval(self):
+        self.buffer.stop()
+        self.buffer = OutputModule(configuration=OutputModule.Configuration(
+            id="buffer", module_name="outputs.buffers.segment_log", is_buffer=True, path=self.directory.name,
+            fsync_interval_ms=0, max_age_hours=1))
+        self.buffer.maintenance_interval = 0.01
+        self.buffer.store_buffer_data("a_buffer", models.Data(measurement="m", fields={"i": 0}))
+        folder = os.path.join(self.directory.name, "a_buffer")
+        hours_ago = time.time() - 2 * 3600
+        for name in os.listdir(folder):
+            os.utime(os.path.join(folder, name), (hours_ago, hours_ago))
+        self.buffer.start()
+        deadline = time.monotonic() + 5
+        while self.buffer.get_buffer_data_batch("a_buffer", 1)[0] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([], self.buffer.get_buffer_data_batch("a_buffer", 1)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,996 @@
+import unittest
+import asyncio
+import gc
+import logging
+import os
+import threading
+import time
+from unittest import mock
+
+# Internal imports.
+import config
+import data_layer
+import models
+from modules.base.base import ModuleWorker, AbstractModule, SpawnPool, DynamicVariableException
+from modules.base.processors.base import AbstractProcessorModule
+from modules.base.outputs.base import AbstractOutputModule
+from configuration import Configuration
+from metrics import metrics_registry, data_context_map, _DataContext, tracer
+from utils.memory_governor import memory_governor
+from utils.async_runtime import AsyncRuntime
+
+
+class _LinkedModule:
+    """
+    Stands in for a linked module, recording what a worker hands to it.
+    """
+
+    def __init__(self, with_run_batch: bool = True):
+        self.active = True
+        self.received: list[models.Data] = []
+        self.batches: list[int] = []
+        self.lock = threading.Lock()
+        if not with_run_batch:
+            self.run_batch = None
+
+    def run(self, data: models.Data):
+        with self.lock:
+            self.received.append(data)
+
+    def run_batch(self, batch: list[models.Data]):
+        with self.lock:
+            self.batches.append(len(batch))
+            self.received.extend(batch)
+
+
+class TestModuleWorker(unittest.TestCase):
+    """
+    The persistent link workers forwarding data objects to a linked module.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.logger = logging.getLogger("test")
+        self.module_data = data_layer.module_data
+        data_layer.module_data = {}
+        self.workers: list[ModuleWorker] = []
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        for worker in self.workers:
+            worker.stop(timeout=1)
+        data_layer.module_data = self.module_data
+
+    def _link(self, module_id: str, instance) -> None:
+        data_layer.module_data[module_id] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                              instance=instance)
+
+    def _worker(self, module_id: str, **kwargs) -> ModuleWorker:
+        worker = ModuleWorker(configuration_id="source", module_id=module_id, logger=self.logger, **kwargs)
+        self.workers.append(worker)
+        return worker
+
+    @staticmethod
+    def _wait_for(condition, timeout: float = 2.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return condition()
+
+    def test_batches_keep_the_order(self):
+        linked = _LinkedModule()
+        self._link("target", linked)
+        worker = self._worker("target", batch_size=10, batch_latency=0.05)
+        sent = [models.Data(measurement="m", fields={"i": i}) for i in range(35)]
+        for data in sent:
+            worker.submit(data)
+
+        self.assertTrue(self._wait_for(lambda: len(linked.received) == 35))
+        self.assertEqual([data.fields["i"] for data in linked.received], list(range(35)))
+        self.assertTrue(all(size <= 10 for size in linked.batches))
+        self.assertLess(len(linked.batches), 35, "The data objects were not batched.")
+
+    def test_a_partial_batch_is_forwarded_after_the_latency(self):
+        linked = _LinkedModule()
+        self._link("target", linked)
+        worker = self._worker("target", batch_size=100, batch_latency=0.05)
+        worker.submit(models.Data(measurement="m"))
+
+        self.assertTrue(self._wait_for(lambda: linked.batches == [1]))
+
+    def test_modules_without_run_batch_receive_single_data_objects(self):
+        linked = _LinkedModule(with_run_batch=False)
+        self._link("target", linked)
+        worker = self._worker("target", batch_size=5)
+        for i in range(7):
+            worker.submit(models.Data(measurement="m", fields={"i": i}))
+
+        self.assertTrue(self._wait_for(lambda: len(linked.received) == 7))
+        self.assertEqual(linked.batches, [])
+
+    def test_drops_and_depth_are_counted_per_worker(self):
+        release = threading.Event()
+        linked = _LinkedModule(with_run_batch=False)
+        linked.run = lambda data: release.wait(5) and linked.received.append(data)
+        self._link("target", linked)
+        with mock.patch.object(config, "STOP_LIMIT", 3), mock.patch.object(config, "BACKPRESSURE_TIMEOUT", 0):
+            worker = self._worker("target")
+            worker.submit(models.Data(measurement="m"))
+            self.assertTrue(self._wait_for(lambda: worker.processing_since is not None))
+            for _ in range(5):
+                worker.submit(models.Data(measurement="m"))
+        time.sleep(0.05)
+        release.set()
+        self.assertTrue(self._wait_for(lambda: len(linked.received) == 4))
+
+        link = metrics_registry.register_link(source_id="source", target_id="target", dispatch="round_robin",
+                                              workers=[worker])
+        try:
+            snapshot = link.snapshot()
+        finally:
+            metrics_registry.unregister_link(link)
+        self.assertEqual((0, 3, 2, 0), (snapshot["current_depth"], snapshot["high_water_mark"],
+                                        snapshot["drop_total"], snapshot["coalesced_total"]))
+        self.assertGreaterEqual(snapshot["partitions"][0]["busy_ms_total"], 50)
+        self.assertTrue(0 < snapshot["partitions"][0]["busy_ratio"] <= 1)
+
+    def test_data_is_dropped_once_the_memory_budget_of_the_linked_module_is_exceeded(self):
+        release = threading.Event()
+        linked = _LinkedModule(with_run_batch=False)
+        linked.run = lambda data: release.wait(5) and linked.received.append(data)
+        self._link("budget_target", linked)
+        memory_governor.budget("budget_target", limit_mb=0.25)
+        with mock.patch.object(config, "BACKPRESSURE_TIMEOUT", 0):
+            worker = self._worker("budget_target")
+            for _ in range(6):
+                worker.submit(models.Data(measurement="m", fields={"image": bytes(100_000)}))
+                self.assertTrue(self._wait_for(lambda: worker.processing_since is not None))
+            self.assertGreater(worker.stats()["current_bytes"], 250_000)
+        release.set()
+        self.assertTrue(self._wait_for(lambda: len(linked.received) == 4))
+        self.assertEqual(2, worker.stats()["drop_total"])
+        self.assertEqual(0, worker.stats()["current_bytes"])
+
+    def test_overwritten_data_objects_are_counted_in_latest_only_mode(self):
+        release = threading.Event()
+        linked = _LinkedModule(with_run_batch=False)
+        linked.run = lambda data: release.wait(5) and linked.received.append(data)
+        self._link("target", linked)
+        worker = self._worker("target", forward_latest_data_only=True)
+        worker.submit(models.Data(measurement="m"))
+        self.assertTrue(self._wait_for(lambda: worker.processing_since is not None))
+        for _ in range(3):
+            worker.submit(models.Data(measurement="m"))
+        release.set()
+
+        self.assertTrue(self._wait_for(lambda: len(linked.received) == 2))
+        self.assertEqual(2, worker.stats()["coalesced_total"])
+
+    def test_a_stopped_worker_forwards_what_it_collected(self):
+        linked = _LinkedModule()
+        self._link("target", linked)
+        worker = self._worker("target", batch_size=100, batch_latency=10)
+        for i in range(3):
+            worker.submit(models.Data(measurement="m", fields={"i": i}))
+
+        self.assertTrue(worker.stop(timeout=1))
+        self.assertEqual(len(linked.received), 3)
+
+
+class TestBackpressure(unittest.TestCase):
+    """
+    Slowing down the source of a flow instead of dropping its data at a full queue.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        data_layer.module_data = {}
+        self.limits = config.STOP_LIMIT, config.BACKPRESSURE_TIMEOUT
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        config.STOP_LIMIT, config.BACKPRESSURE_TIMEOUT = self.limits
+        data_layer.module_data = self.module_data
+
+    @staticmethod
+    def _module(module_id: str) -> AbstractModule:
+        return AbstractModule(configuration=models.InputModule(id=module_id, module_name="inputs.test"))
+
+    def test_a_full_link_queue_blocks_instead_of_dropping(self):
+        config.STOP_LIMIT, config.BACKPRESSURE_TIMEOUT = 2, 5
+        source = self._module("source")
+        release = threading.Event()
+        linked = _LinkedModule(with_run_batch=False)
+        linked.run = lambda data: (release.wait(), linked.received.append(data))
+        data_layer.module_data["source"] = models.ModuleData(module_name="inputs.test", configuration=None,
+                                                             instance=source)
+        data_layer.module_data["target"] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                             instance=linked)
+        worker = ModuleWorker(configuration_id="source", module_id="target", logger=logging.getLogger("test"))
+        try:
+            sent = []
+            for i in range(4):
+                data = models.Data(measurement="m", fields={"i": i})
+                data_context_map.set(data, _DataContext(pipeline_ts=0, source_id="source", link_ts=0))
+                sent.append(data)
+            # The worker holds the first data object, the queue the next two.
+            for data in sent[:3]:
+                worker.submit(data)
+            threading.Timer(0.2, release.set).start()
+            worker.submit(sent[3])
+
+            self.assertGreater(source._permit_delay, 0, "The source was not asked to slow down.")
+            self.assertTrue(TestModuleWorker._wait_for(lambda: len(linked.received) == 4))
+        finally:
+            release.set()
+            worker.stop(timeout=1)
+
+    def test_permits_are_delayed_while_backpressure_is_signaled(self):
+        module = self._module("source")
+        t0 = time.monotonic()
+        self.assertTrue(module.acquire_permit())
+        self.assertLess(time.monotonic() - t0, module.permit_delay_min)
+
+        for _ in range(3):
+            module.signal_backpressure()
+        self.assertAlmostEqual(module._permit_delay, 4 * module.permit_delay_min)
+        t0 = time.monotonic()
+        module.acquire_permit()
+        self.assertGreaterEqual(time.monotonic() - t0, 4 * module.permit_delay_min * 0.9)
+
+        # Without further signals, the delay recovers.
+        module._last_backpressure -= 10
+        module.acquire_permit()
+        self.assertAlmostEqual(module._permit_delay, 2 * module.permit_delay_min)
+
+
+class _Output(AbstractOutputModule):
+    """
+    Stores data objects in a list.
+    """
+
+    def __init__(self, configuration):
+        super().__init__(configuration=configuration)
+        self.stored: list[models.Data] = []
+        self.batches: list[int] = []
+        self.started.set()
+
+    def _run(self, data: models.Data):
+        self.stored.append(data)
+
+
+class _BatchOutput(_Output):
+    """
+    Stores data objects in a list, a batch at once.
+    """
+
+    def __init__(self, configuration, fail: bool = False):
+        super().__init__(configuration=configuration)
+        self.fail = fail
+
+    def _run_batch(self, batch: list[models.Data]):
+        if self.fail:
+            raise ConnectionError("failed")
+        self.batches.append(len(batch))
+        self.stored.extend(batch)
+
+
+class TestOutputBatches(unittest.TestCase):
+    """
+    Storing the queued data objects of output modules in batches.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        data_layer.module_data = {}
+        self.outputs: list[_Output] = []
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        for output in self.outputs:
+            output.active = False
+        data_layer.module_data = self.module_data
+
+    def _output(self, module_id: str, output_class: type = _BatchOutput, **kwargs) -> _Output:
+        output = output_class(configuration=AbstractOutputModule.Configuration(
+            id=module_id, module_name="outputs.test", max_batch_size=10, max_batch_latency_ms=50), **kwargs)
+        data_layer.module_data[module_id] = models.ModuleData(module_name="outputs.test", configuration=None,
+                                                              instance=output)
+        self.outputs.append(output)
+        return output
+
+    def test_batches_keep_the_order(self):
+        output = self._output("batches")
+        for i in range(35):
+            output.run(models.Data(measurement="m", fields={"i": i}))
+
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(output.stored) == 35))
+        self.assertEqual([data.fields["i"] for data in output.stored], list(range(35)))
+        self.assertTrue(all(size <= 10 for size in output.batches))
+        self.assertLess(len(output.batches), 35, "The data objects were not batched.")
+        snapshot = output._metrics.snapshot()
+        self.assertEqual(35, snapshot["throughput"]["processed_total"])
+        self.assertEqual(len(output.batches), snapshot["batches"]["size"]["sample_count"])
+
+    def test_modules_without_run_batch_store_single_data_objects(self):
+        output = self._output("single", output_class=_Output)
+        for i in range(7):
+            output.run(models.Data(measurement="m", fields={"i": i}))
+
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(output.stored) == 7))
+        self.assertEqual(output.batches, [])
+        self.assertEqual(0, output._metrics.snapshot()["batches"]["size"]["sample_count"])
+
+    def test_a_failed_batch_is_stored_one_by_one(self):
+        output = self._output("failed_batches", fail=True)
+        with self.assertLogs(output.logger, level="ERROR"):
+            for i in range(5):
+                output.run(models.Data(measurement="m", fields={"i": i}))
+            self.assertTrue(TestModuleWorker._wait_for(lambda: len(output.stored) == 5))
+        self.assertEqual([data.fields["i"] for data in output.stored], list(range(5)))
+
+
+class _MemoryBuffer:
+    """
+    Stands in for a buffer module and counts how often it was polled.
+    """
+
+    def __init__(self):
+        self.data: dict[str, list[models.Data]] = {}
+        self.polls = 0
+
+    def store_buffer_data(self, module_id: str, data: models.Data) -> bool:
+        self.data.setdefault(module_id, []).append(data)
+        return True
+
+    def get_buffer_data_batch(self, module_id: str, count: int) -> tuple[list[models.Data], int]:
+        self.polls += 1
+        entries = self.data.get(module_id, [])[:count]
+        return entries, len(entries)
+
+    def ack_buffer_data(self, module_id: str, offset: int):
+        del self.data[module_id][:offset]
+
+
+class _LegacyBuffer(_Output):
+    """
+    A buffer module which only implements the single data object methods.
+    """
+    can_be_buffer = True
+
+    def store_buffer_data(self, module_id: str, data: models.Data) -> bool:
+        self.stored.append(data)
+        return True
+
+    def get_buffer_data(self, module_id: str):
+        return self.stored.pop(0) if self.stored else None
+
+
+class TestOutputBuffer(unittest.TestCase):
+    """
+    Replaying the data objects an output module stored in the buffer module.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        self.buffer_instance = data_layer.buffer_instance
+        data_layer.module_data = {}
+        data_layer.buffer_instance = self.buffer = _MemoryBuffer()
+        self.output = _Output(configuration=AbstractOutputModule.Configuration(id="buffered",
+                                                                               module_name="outputs.test"))
+        data_layer.module_data["buffered"] = models.ModuleData(module_name="outputs.test", configuration=None,
+                                                               instance=self.output)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.output.active = False
+        data_layer.module_data = self.module_data
+        data_layer.buffer_instance = self.buffer_instance
+
+    @staticmethod
+    def _worker_stopped() -> bool:
+        return not any(thread.name == "Queue_Worker_buffered" for thread in threading.enumerate())
+
+    def test_an_empty_buffer_is_polled_once(self):
+        for i in range(20):
+            self.output.run(models.Data(measurement="m", fields={"i": i}))
+
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.output.stored) == 20))
+        self.assertEqual(1, self.buffer.polls)
+
+    def test_buffered_data_is_replayed_first(self):
+        self.buffer.store_buffer_data("buffered_buffer", models.Data(measurement="m", fields={"i": -2}))
+        self.output.started.clear()
+        self.output.run(models.Data(measurement="m", fields={"i": 0}))
+        self.output._buffer(models.Data(measurement="m", fields={"i": -1}))
+        self.output.started.set()
+
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.output.stored) == 3))
+        self.assertEqual([-2, -1, 0], [data.fields["i"] for data in self.output.stored])
+        self.assertEqual([], self.buffer.data["buffered_buffer"])
+
+    def test_replayed_data_is_removed_once_it_was_stored(self):
+        for i in range(3):
+            self.buffer.store_buffer_data("buffered_buffer", models.Data(measurement="m", fields={"i": i}))
+        remaining = []
+        with mock.patch.object(self.output, "_run",
+                               lambda data: remaining.append(len(self.buffer.data["buffered_buffer"]))):
+            self.output.run(models.Data(measurement="m"))
+            self.assertTrue(TestModuleWorker._wait_for(lambda: len(remaining) == 4))
+        self.assertEqual([3, 3, 3, 0], remaining)
+
+    def test_replayed_data_stored_concurrently_is_removed_once_it_was_stored(self):
+        gate = threading.Event()
+
+        class _AsyncOutput(_Output):
+            async def _run(self, data: models.Data):
+                while not gate.is_set():
+                    await asyncio.sleep(0.005)
+                self.stored.append(data)
+
+        runtime = AsyncRuntime(loop_count=1)
+        self.output.active = False
+        self.output = _AsyncOutput(configuration=AbstractOutputModule.Configuration(
+            id="buffered", module_name="outputs.test", max_in_flight=3))
+        data_layer.module_data["buffered"].instance = self.output
+        for i in range(3):
+            self.buffer.store_buffer_data("buffered_buffer", models.Data(measurement="m", fields={"i": i}))
+        try:
+            with mock.patch("modules.base.outputs.base.async_runtime", runtime):
+                self.output.run(models.Data(measurement="m", fields={"i": 3}))
+                time.sleep(0.2)
+                self.assertEqual(3, len(self.buffer.data["buffered_buffer"]),
+                                 "The replayed data was removed while it was still being stored.")
+                gate.set()
+                self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.output.stored) == 4))
+                self.assertTrue(TestModuleWorker._wait_for(lambda: not self.buffer.data["buffered_buffer"]))
+        finally:
+            gate.set()
+            self.output.active = False
+            runtime.shutdown(timeout=5)
+
+    def test_a_stopped_module_leaves_a_partly_stored_chunk_in_the_buffer(self):
+        for i in range(3):
+            self.buffer.store_buffer_data("buffered_buffer", models.Data(measurement="m", fields={"i": i}))
+
+        def stop(data):
+            self.output.stored.append(data)
+            self.output.active = False
+
+        with mock.patch.object(self.output, "_run", stop):
+            self.output.run(models.Data(measurement="m", fields={"i": 3}))
+            self.assertTrue(TestModuleWorker._wait_for(self._worker_stopped, timeout=5))
+        self.assertEqual([0], [data.fields["i"] for data in self.output.stored])
+        # Replayed again as a whole and in order, not appended behind newer data.
+        self.assertEqual([0, 1, 2], [data.fields["i"] for data in self.buffer.data["buffered_buffer"]])
+
+    def test_buffer_modules_without_batch_retrieval_are_replayed_one_by_one(self):
+        legacy = _LegacyBuffer(configuration=AbstractOutputModule.Configuration(id="legacy",
+                                                                                module_name="outputs.test"))
+        legacy.stored = [models.Data(measurement="m", fields={"i": i}) for i in range(3)]
+        data_layer.buffer_instance = legacy
+        remaining = []
+        with mock.patch.object(self.output, "_run", lambda data: remaining.append(len(legacy.stored))):
+            self.output.run(models.Data(measurement="m"))
+            self.assertTrue(TestModuleWorker._wait_for(lambda: len(remaining) == 4))
+        self.assertEqual([2, 1, 0, 0], remaining)
+
+    def test_unstored_data_of_buffer_modules_without_batch_retrieval_is_buffered_again(self):
+        gate, done = threading.Event(), []
+
+        class _AsyncOutput(_Output):
+            async def _run(self, data: models.Data):
+                while not gate.is_set():
+                    await asyncio.sleep(0.005)
+                done.append(data)
+
+        runtime = AsyncRuntime(loop_count=1)
+        legacy = _LegacyBuffer(configuration=AbstractOutputModule.Configuration(id="legacy",
+                                                                                module_name="outputs.test"))
+        legacy.stored = [models.Data(measurement="m", fields={"i": i}) for i in range(2)]
+        data_layer.buffer_instance = legacy
+        self.output.active = False
+        self.output = _AsyncOutput(configuration=AbstractOutputModule.Configuration(
+            id="buffered", module_name="outputs.test", max_in_flight=3))
+        try:
+            with mock.patch("modules.base.outputs.base.async_runtime", runtime):
+                self.output.run(models.Data(measurement="m", fields={"i": 2}))
+                self.assertTrue(TestModuleWorker._wait_for(lambda: len(legacy.stored) == 1))
+                self.output.active = False
+                self.assertTrue(TestModuleWorker._wait_for(self._worker_stopped, timeout=5))
+        finally:
+            gate.set()
+            TestModuleWorker._wait_for(lambda: done)
+            runtime.shutdown(timeout=5)
+        self.assertEqual([1, 0], [data.fields["i"] for data in legacy.stored])
+
+    def test_buffer_modules_without_batch_retrieval(self):
+        legacy = _LegacyBuffer(configuration=AbstractOutputModule.Configuration(id="legacy",
+                                                                                module_name="outputs.test"))
+        legacy.stored = [models.Data(measurement="m", fields={"i": i}) for i in range(3)]
+        batch, offset = legacy.get_buffer_data_batch("buffered_buffer", 2)
+        legacy.ack_buffer_data("buffered_buffer", offset)
+        self.assertEqual([0, 1], [data.fields["i"] for data in batch])
+        self.assertEqual(1, len(legacy.get_buffer_data_batch("buffered_buffer", 2)[0]))
+
+
+class TestSpawnPool(unittest.TestCase):
+    """
+    The bounded thread pool executing the links in spawn mode.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.release = threading.Event()
+        self.timeout = config.BACKPRESSURE_TIMEOUT
+        config.BACKPRESSURE_TIMEOUT = 0
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.release.set()
+        config.BACKPRESSURE_TIMEOUT = self.timeout
+
+    def test_concurrency_is_bounded(self):
+        pool = SpawnPool(max_workers=3, max_queue=100, name="test_bounded")
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def task(data):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        for i in range(30):
+            self.assertTrue(pool.submit(name="Link_a_to_b", function=task, data=models.Data(measurement="m")))
+        pool.queue.join()
+        self.assertLessEqual(peak[0], 3)
+        self.assertLessEqual(len(pool.threads), 3)
+        self.assertEqual(pool.metrics.snapshot()["submitted_total"], 30)
+
+    def test_tasks_are_rejected_when_the_queue_is_full(self):
+        pool = SpawnPool(max_workers=1, max_queue=2, name="test_rejected")
+        task = lambda data: self.release.wait()
+        accepted = [pool.submit(name="Link_a_to_b", function=task, data=models.Data(measurement="m"))
+                    for _ in range(5)]
+        # One task may already be executed, while two wait in the queue.
+        self.assertEqual(accepted[:2], [True, True])
+        self.assertFalse(accepted[-1])
+        self.assertEqual(metrics_registry.snapshot()["executors"]["test_rejected"]["rejected_total"],
+                         accepted.count(False))
+
+    def test_queued_tasks_are_charged_to_the_budget_of_the_pool(self):
+        pool = SpawnPool(max_workers=1, max_queue=100, name="test_budget")
+        budget = memory_governor.budget("test_budget", limit_mb=2.5)
+        task = lambda data: self.release.wait()
+        waveform = models.Data(measurement="m", fields={"waveform": b"x" * 1024 * 1024})
+        accepted = [pool.submit(name="Link_a_to_b", function=task, data=waveform) for _ in range(6)]
+        # One task may already be executed, while the queued ones exceed the budget of 2.5 MB after three.
+        self.assertEqual([True, True, True], accepted[:3])
+        self.assertFalse(accepted[-1])
+        self.assertGreater(budget.bytes, 2 * 1024 * 1024)
+
+        self.release.set()
+        pool.queue.join()
+        self.assertEqual(0, budget.bytes)
+        budget.limit = memory_governor.module_limit
+
+    def test_a_saturated_pool_is_reported_once(self):
+        module_data, running = data_layer.module_data, data_layer.running
+        data_layer.module_data, data_layer.running = {}, True
+        linked = _LinkedModule(with_run_batch=False)
+        linked.run = lambda data: self.release.wait()
+        source = AbstractModule(configuration=models.ProcessorModule(
+            id="spawn_source", module_name="processors.test", links=["spawn_target"], worker_count_per_link=0))
+        source.active = True
+        for module_id, instance in (("spawn_source", source), ("spawn_target", linked)):
+            data_layer.module_data[module_id] = models.ModuleData(module_name="processors.test",
+                                                                  configuration=None, instance=instance)
+        try:
+            with mock.patch("modules.base.base.spawn_pool", SpawnPool(max_workers=1, max_queue=1,
+                                                                      name="test_saturated")), \
+                    self.assertLogs(source.logger, level="INFO") as logs:
+                for _ in range(6):
+                    source._call_links(models.Data(measurement="m"))
+                self.release.set()
+                self.assertTrue(TestModuleWorker._wait_for(lambda: not source._call_links(
+                    models.Data(measurement="m")) and not source._spawn_error_issued))
+        finally:
+            data_layer.module_data, data_layer.running = module_data, running
+        self.assertEqual(1, sum("saturated" in message for message in logs.output))
+        self.assertEqual(1, sum("accepts data again" in message for message in logs.output))
+
+    def test_threads_are_named_after_the_link(self):
+        pool = SpawnPool(max_workers=1, max_queue=10, name="test_named")
+        names = []
+        pool.submit(name="Link_a_to_b", function=lambda data: names.append(threading.current_thread().name),
+                    data=models.Data(measurement="m"))
+        pool.queue.join()
+        self.assertEqual(names, ["Link_a_to_b"])
+
+
+class TestRoutingTable(unittest.TestCase):
+    """
+    The routing table a module forwards its data objects by.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        self.running = data_layer.running
+        data_layer.module_data = {}
+        data_layer.running = True
+        self.module = AbstractModule(configuration=models.ProcessorModule(id="source", module_name="processors.test",
+                                                                          links=["a", "b"]))
+        data_layer.module_data["source"] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                             instance=self.module)
+        self.linked = {module_id: _LinkedModule(with_run_batch=False) for module_id in ["a", "b", "c"]}
+        for module_id, linked in self.linked.items():
+            data_layer.module_data[module_id] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                                  instance=linked)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.module._stop_workers(timeout=1)
+        data_layer.module_data = self.module_data
+        data_layer.running = self.running
+
+    def test_links_are_changed_by_refreshing_the_routes(self):
+        routes = self.module._routes
+        self.assertEqual([route.module_id for route in routes.routes], ["a", "b"])
+        old_worker = routes.routes[0].workers[0]
+
+        self.module.configuration.links = ["b", "c"]
+        new_routes = self.module.refresh_routes()
+        self.assertGreater(new_routes.version, routes.version)
+        self.assertEqual(new_routes.links, frozenset(["b", "c"]))
+        self.assertFalse(old_worker.thread.is_alive(), "The worker of the removed link is still running.")
+        self.assertIs(new_routes.routes[0].workers[0], routes.routes[1].workers[0])
+
+        self.module._call_links(models.Data(measurement="m"))
+        self.assertTrue(TestModuleWorker._wait_for(
+            lambda: len(self.linked["b"].received) == 1 and len(self.linked["c"].received) == 1))
+        self.assertEqual(self.linked["a"].received, [])
+
+    def test_a_module_restarted_in_place_gets_new_workers(self):
+        old_worker = self.module._routes.routes[0].workers[0]
+        self.module._stop_workers(timeout=1)
+        self.assertIsNone(self.module._routes)
+
+        self.module._call_links(models.Data(measurement="m"))
+        self.assertIsNot(self.module._routes.routes[0].workers[0], old_worker)
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.linked["a"].received) == 1))
+
+    def test_a_late_call_into_a_stopped_module_starts_no_workers(self):
+        self.module._stop_workers(timeout=1)
+
+        def stop(data):
+            # The module is stopped while the call is under way, after it checked whether it is active.
+            self.module.active = False
+
+        with mock.patch("modules.base.base.data_context_map.get", side_effect=stop):
+            self.module._call_links(models.Data(measurement="m"))
+        self.assertIsNone(self.module._routes)
+        self.assertEqual({}, self.module._workers)
+
+
+class _CountingProcessor(AbstractProcessorModule):
+    """
+    Counts the processors a data object passed and where it was processed.
+    """
+
+    def __init__(self, configuration, thread_safe: bool = False):
+        super().__init__(configuration=configuration, thread_safe=thread_safe)
+        self.threads: list[str] = []
+        self.started.set()
+
+    def _run(self, data: models.Data) -> models.Data:
+        self.threads.append(threading.current_thread().name)
+        data.fields["hops"] = data.fields.get("hops", 0) + 1
+        return data
+
+
+class _RequiringProcessor(_CountingProcessor):
+    """
+    A processor with field requirements, recording which fields were still shared when _run was called.
+    """
+    field_requirements = ["(key * with float or list)", "(length array > 1)", "((key array) or (keys > 5))"]
+
+    def __init__(self, configuration, thread_safe: bool = False):
+        super().__init__(configuration=configuration, thread_safe=thread_safe)
+        self.shared: list[frozenset] = []
+
+    def _run(self, data: models.Data) -> models.Data:
+        self.shared.append(data.fields.shared_keys())
+        return data
+
+
+class _SlowProcessor(AbstractProcessorModule):
+    """
+    Takes longer for smaller numbers and reports the process it ran in.
+    """
+
+    def _run(self, data: models.Data) -> models.Data:
+        time.sleep(0.05 * (5 - data.fields["i"] % 5))
+        data.fields["pid"] = os.getpid()
+        return data
+
+
+class TestProcessExecution(unittest.TestCase):
+    """
+    Executing processors in a pool of worker processes.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        self.running = data_layer.running
+        data_layer.module_data = {}
+        data_layer.running = True
+        self.sink = _LinkedModule(with_run_batch=False)
+        data_layer.module_data["sink"] = models.ModuleData(module_name="outputs.test", configuration=None,
+                                                           instance=self.sink)
+        self.processor = _SlowProcessor(configuration=AbstractProcessorModule.Configuration(
+            id="processes", module_name="processors.test", links=["sink"], execution="process", process_count=2))
+        self.processor.started.set()
+        data_layer.module_data["processes"] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                                instance=self.processor)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.processor.active = False
+        self.processor._stop_workers(timeout=1)
+        data_layer.module_data = self.module_data
+        data_layer.running = self.running
+
+    def test_results_are_forwarded_in_order(self):
+        for i in range(10):
+            self.processor.run(models.Data(measurement="m", fields={"i": i}))
+
+        busy = []
+
+        def done() -> bool:
+            busy.append(metrics_registry.snapshot()["executors"]["processes_processes"]["busy"])
+            return len(self.sink.received) == 10
+
+        self.assertTrue(TestModuleWorker._wait_for(done, timeout=30))
+        self.assertLessEqual(max(busy), 2, "More workers were reported busy than there are processes.")
+        self.assertEqual([data.fields["i"] for data in self.sink.received], list(range(10)))
+        pids = {data.fields["pid"] for data in self.sink.received}
+        self.assertNotIn(os.getpid(), pids)
+
+        executor = metrics_registry.snapshot()["executors"]["processes_processes"]
+        self.assertEqual(set(executor["per_worker"]), {str(pid) for pid in pids})
+        self.assertEqual(sum(worker["tasks_total"] for worker in executor["per_worker"].values()), 10)
+
+
+class TestFusion(unittest.TestCase):
+    """
+    Executing chains of processors on one thread instead of handing data objects over between workers.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module_data = data_layer.module_data
+        self.running = data_layer.running
+        data_layer.module_data = {}
+        data_layer.running = True
+        self.sink = _LinkedModule(with_run_batch=False)
+        data_layer.module_data["sink"] = models.ModuleData(module_name="outputs.test", configuration=None,
+                                                           instance=self.sink)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        for module_data in data_layer.module_data.values():
+            if isinstance(module_data.instance, AbstractModule):
+                module_data.instance.active = False
+                module_data.instance._stop_workers(timeout=1)
+        data_layer.module_data = self.module_data
+        data_layer.running = self.running
+
+    def _processor(self, module_id: str, links: list[str], fuse_links: bool = True,
+                   thread_safe: bool = False) -> _CountingProcessor:
+        processor = _CountingProcessor(configuration=AbstractProcessorModule.Configuration(
+            id=module_id, module_name="processors.test", links=links, fuse_links=fuse_links),
+            thread_safe=thread_safe)
+        data_layer.module_data[module_id] = models.ModuleData(module_name="processors.test", configuration=None,
+                                                              instance=processor)
+        return processor
+
+    def test_a_linear_chain_runs_on_one_thread(self):
+        a = self._processor("a", links=["b"])
+        b = self._processor("b", links=["c"])
+        c = self._processor("c", links=["sink"])
+        self.assertEqual(Configuration._plan_fusion(), {"a": "b", "b": "c"})
+        Configuration._refresh_routes()
+        self.assertEqual(a._routes.routes[0].workers, ())
+
+        a.run(models.Data(measurement="m"))
+        self.assertEqual(b.threads + c.threads, [threading.current_thread().name] * 2)
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.sink.received) == 1))
+        self.assertEqual(self.sink.received[0].fields["hops"], 3)
+        self.assertEqual(next(module for module in metrics_registry.snapshot()["modules"]
+                              if module["module_id"] == "b")["throughput"]["processed_total"], 1)
+
+    def test_validated_copy_on_write_copies_keep_their_values_shared(self):
+        a = self._processor("a", links=["b", "c"], fuse_links=False)
+        a.configuration.copy_on_write = True
+        for module_id in ("b", "c"):
+            processor = _RequiringProcessor(configuration=AbstractProcessorModule.Configuration(
+                id=module_id, module_name="processors.test", links=["sink"]))
+            data_layer.module_data[module_id] = models.ModuleData(module_name="processors.test",
+                                                                  configuration=None, instance=processor)
+        Configuration._refresh_routes()
+        for _ in range(2):
+            a.run(models.Data(measurement="m", fields={"value": 1.5, "array": [1, 2, 3]}))
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.sink.received) == 4))
+        for module_id in ("b", "c"):
+            self.assertEqual(data_layer.module_data[module_id].instance.shared, [frozenset({"array"})] * 2)
+
+    def test_sampled_flows_are_traced_per_hop(self):
+        self._processor("a", links=["b"])
+        self._processor("b", links=["c"])
+        self._processor("c", links=["sink"])
+        Configuration._refresh_routes()
+        tracer._traces.clear()
+        with mock.patch.object(tracer, "sample_rate", 1):
+            data_layer.module_data["a"].instance.run(models.Data(measurement="m"))
+        # Workers keep a reference to the last data object they handled until the next one arrives.
+        data_layer.module_data["a"].instance.run(models.Data(measurement="m"))
+        self.assertTrue(TestModuleWorker._wait_for(lambda: len(self.sink.received) == 2))
+
+        # The trace is finished once no data object of the flow is referenced anymore.
+        self.sink.received.clear()
+        for module_data in data_layer.module_data.values():
+            module_data.latest_data = None
+            module_data.instance.current_input_data = None
+        self.assertTrue(TestModuleWorker._wait_for(lambda: gc.collect() is not None and tracer.traces(source_id="a")))
+        trace = tracer.traces(source_id="a")[-1]
+        self.assertEqual([(span["module_id"], span["name"]) for span in trace["spans"]],
+                         [("b", "link_wait"), ("b", "run"), ("c", "link_wait"), ("c", "run")])
+        self.assertGreaterEqual(trace["duration_ms"], max(span["start_ms"] + span["duration_ms"]
+                                                          for span in trace["spans"]) - 0.001)
+
+    def test_links_which_can_not_be_fused(self):
+        self._processor("disabled", links=["x"], fuse_links=False)
+        self._processor("x", links=["sink"])
+        self._processor("shared_1", links=["y"])
+        self._processor("shared_2", links=["y"])
+        self._processor("y", links=["sink"])
+        self._processor("to_thread_safe", links=["z"])
+        self._processor("z", links=["sink"], thread_safe=True)
+        self._processor("loop_1", links=["loop_2"])
+        self._processor("loop_2", links=["loop_1"])
+        fused = Configuration._plan_fusion()
+        for module_id in ["disabled", "shared_1", "shared_2", "to_thread_safe"]:
+            self.assertNotIn(module_id, fused)
+        self.assertEqual(len({"loop_1", "loop_2"} & set(fused)), 1)
+
+
+class TestDynamicVariables(unittest.TestCase):
+    """
+    Replacing dynamic variables with templates parsed once per input and data types.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.module = AbstractModule(configuration=models.InputModule(id="dyn", module_name="inputs.test"))
+        self.module.current_input_data = models.Data(measurement="m", fields={"value": 1.5, "name": "abc"},
+                                                     tags={"sensor": "s1"})
+
+    def test_results_of_repeated_calls(self):
+        for input_data, data_type, expected in [("10", "int", 10), ("${local.value}", None, 1.5),
+                                                ("${local.value}", "str", "1.5"), ("[1, 2]", None, [1, 2]),
+                                                ("x ${local.name} ${local.sensor}", None, "x abc s1"),
+                                                ("${local.measurement}", ["int", "str"], "m")]:
+            with self.subTest(input_data=input_data, data_type=data_type):
+                for _ in range(3):
+                    self.assertEqual(self.module._dyn(input_data, data_type), expected)
+
+    def test_cached_results_can_not_be_changed_by_callers(self):
+        first = self.module._dyn("{'a': [1]}", "dict")
+        first["a"].append(2)
+        self.assertEqual(self.module._dyn("{'a': [1]}", "dict"), {"a": [1]})
+
+    def test_values_are_looked_up_on_every_call(self):
+        self.assertEqual(self.module._dyn("${local.value}"), 1.5)
+        self.module.current_input_data = models.Data(measurement="m", fields={"value": 2})
+        self.assertEqual(self.module._dyn("${local.value}"), 2)
+
+    def test_errors_are_raised_on_every_call(self):
+        for input_data, data_type, message in [
+                ("1", "complex", "Unknown data type complex. Allowed types are: str, bool, float, int, list, dict."),
+                ("a ${local.value", None, "Found an incomplete marker in 'a ${local.value'."),
+                ("abc", "int", "Could not convert dynamic variable 'abc' to one of the given data types: int."),
+                ("${local.missing}", None, "Could not replace dynamic variable '${local.missing}'. "
+                                           "Could not find key 'missing' in fields or tags.")]:
+            with self.subTest(input_data=input_data):
+                for _ in range(2):
+                    with self.assertRaises(DynamicVariableException) as context:
+                        self.module._dyn(input_data, data_type)
+                    self.assertEqual(str(context.exception), message)
+
+
+class TestPartitionedDispatch(unittest.TestCase):
+    """
+    Selecting the worker of a link by the hash of a partition key.
+    """
+
+    def test_the_same_key_selects_the_same_worker(self):
+        for partition_key, make in [("measurement", lambda i: models.Data(measurement=f"m{i}")),
+                                    ("tags.sensor", lambda i: models.Data(measurement="m", tags={"sensor": i})),
+                                    ("fields.id", lambda i: models.Data(measurement="m", fields={"id": i}))]:
+            with self.subTest(partition_key=partition_key):
+                selected = [AbstractModule._partition(make(i % 5), partition_key, 4) for i in range(50)]
+                self.assertEqual(selected[:5] * 10, selected)
+                self.assertTrue(all(0 <= index < 4 for index in selected))
+                self.assertGreater(len(set(selected)), 1, "All keys ended up in the same partition.")
+
+    def test_data_without_the_key_selects_the_first_worker(self):
+        data = models.Data(measurement="m", fields={"other": 1})
+        self.assertEqual(AbstractModule._partition(data, "fields.id", 8), 0)
+        self.assertEqual(AbstractModule._partition(data, "tags.id", 8), 0)
+
+    def test_partition_depths_are_reported_per_worker(self):
+        class _Worker:
+            def __init__(self, depth):
+                self.depth = depth
+
+            def qsize(self):
+                return self.depth
+
+        link = metrics_registry.register_link(source_id="test_source", target_id="test_target",
+                                              dispatch="partitioned", workers=[_Worker(3), _Worker(0)])
+        try:
+            snapshot = next(entry for entry in metrics_registry.snapshot()["links"]
+                            if entry["source_id"] == "test_source")
+            self.assertEqual(snapshot["dispatch"], "partitioned")
+            self.assertEqual(snapshot["partitions"], [{"worker": 0, "current_depth": 3},
+                                                      {"worker": 1, "current_depth": 0}])
+        finally:
+            metrics_registry.unregister_link(link)
+        self.assertFalse(any(entry["source_id"] == "test_source" for entry in metrics_registry.snapshot()["links"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
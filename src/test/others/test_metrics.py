@@ -0,0 +1,283 @@
+import unittest
+import gc
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Internal imports.
+import models
+from metrics import _DataContextMap, _DataContext, ModuleMetrics, MetricsRegistry, _QuantileSketch, _LatencyStats, \
+    _SlidingWindow, Tracer
+
+
+class TestDataContextMap(unittest.TestCase):
+    """
+    Tracking the flow context of data objects without storing it on the data objects themselves.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.map = _DataContextMap()
+        self.ctx = _DataContext(pipeline_ts=1.0, source_id="source", link_ts=2.0, visited=frozenset({"source"}))
+
+    def _entries(self) -> int:
+        return sum(len(shard) for shard in self.map._shards)
+
+    def test_contexts_are_removed_with_their_data_objects(self):
+        data = models.Data(measurement="m")
+        self.map.set(data, self.ctx)
+        self.assertIs(self.map.get(data), self.ctx)
+        self.assertEqual(self._entries(), 1)
+
+        del data
+        gc.collect()
+        self.assertEqual(self._entries(), 0)
+
+    def test_replacing_a_context_keeps_the_entry_until_collection(self):
+        data = models.Data(measurement="m")
+        self.map.set(data, self.ctx)
+        newer = _DataContext(pipeline_ts=1.0, source_id="source", link_ts=3.0)
+        self.map.set(data, newer)
+        gc.collect()
+        self.assertIs(self.map.get(data), newer)
+        del data
+        gc.collect()
+        self.assertEqual(self._entries(), 0)
+
+    def test_callbacks_run_within_other_writes(self):
+        """
+        The garbage collector may run the callback of a weak reference at almost any point, e.g. while an entry of
+        the same shard is replaced.
+        """
+        test = self
+
+        class _Releasing:
+            def __del__(self):
+                test.others.clear()
+
+        self.map.shard_count = 1
+        self.map.__init__()
+        data, self.others = models.Data(measurement="m"), [models.Data(measurement="m")]
+        self.map.set(self.others[0], self.ctx)
+        self.map.set(data, _Releasing())
+        # Replacing the entry releases the old context, which collects the other data object.
+        thread = threading.Thread(target=self.map.set, args=(data, self.ctx), daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "Replacing the entry deadlocked.")
+        self.assertEqual(self._entries(), 1)
+
+    def test_propagate_only_fills_missing_contexts(self):
+        old, new, same = models.Data(measurement="m"), models.Data(measurement="m"), models.Data(measurement="m")
+        self.map.set(old, self.ctx)
+        self.map.propagate(old, new)
+        self.assertIs(self.map.get(new), self.ctx)
+
+        own = _DataContext(pipeline_ts=5.0, source_id="other", link_ts=5.0)
+        self.map.set(same, own)
+        self.map.propagate(old, same)
+        self.assertIs(self.map.get(same), own)
+
+    def test_concurrent_use(self):
+        errors = []
+
+        def work():
+            for _ in range(2_000):
+                data = models.Data(measurement="m")
+                ctx = _DataContext(pipeline_ts=0.0, source_id="source", link_ts=0.0)
+                self.map.set(data, ctx)
+                if self.map.get(data) is not ctx:
+                    errors.append(data)
+
+        threads = [threading.Thread(target=work) for _ in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+        self.assertEqual(errors, [])
+        self.assertEqual(self._entries(), 0)
+
+
+class TestModuleMetrics(unittest.TestCase):
+    """
+    The runtime metrics of a single module.
+    """
+
+    def test_validation_cache_lookups(self):
+        module_metrics = ModuleMetrics(module_id="module", module_name="processors.test")
+        for hit in [False, True, True]:
+            module_metrics.record_validation_lookup(hit)
+        self.assertEqual({"hit_total": 2, "miss_total": 1}, module_metrics.snapshot()["validation_cache"])
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """
+    The mergeable histograms used for all latency metrics.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        rng = random.Random(1)
+        self.samples = [rng.lognormvariate(-7, 2) for _ in range(20_000)] + [0.0] * 100
+
+    def _assert_close_to_nearest_rank(self, sketch: _QuantileSketch, samples: list):
+        ordered = sorted(samples)
+        percentiles = (0, 1, 50, 90, 95, 99, 100)
+        for p, value in zip(percentiles, sketch.quantiles(percentiles)):
+            expected = ordered[max(0, min(int(len(ordered) * p / 100.0), len(ordered) - 1))]
+            with self.subTest(p=p):
+                self.assertLessEqual(abs(value - expected), expected * _QuantileSketch.relative_accuracy + 1e-9)
+
+    def test_quantiles_are_within_the_relative_accuracy(self):
+        sketch = _QuantileSketch()
+        for sample in self.samples:
+            sketch.add(sample)
+        self._assert_close_to_nearest_rank(sketch, self.samples)
+        self.assertEqual(len(self.samples), sketch.count)
+        self.assertAlmostEqual(sum(self.samples) / len(self.samples), sketch.mean)
+
+    def test_merged_sketches_equal_a_single_one(self):
+        first, second, single = _QuantileSketch(), _QuantileSketch(), _QuantileSketch()
+        for index, sample in enumerate(self.samples):
+            (first if index % 3 else second).add(sample)
+            single.add(sample)
+        first.merge(second)
+        self.assertEqual(single.buckets, first.buckets)
+        self.assertEqual(single.quantiles((50, 99)), first.quantiles((50, 99)))
+
+    def test_empty_sketch(self):
+        self.assertEqual([None, None], _QuantileSketch().quantiles((50, 99)))
+        self.assertIsNone(_QuantileSketch().mean)
+
+    def test_sliding_window_and_lifetime(self):
+        stats = _LatencyStats(window=0.2, slots=2)
+        for sample in self.samples[:1000]:
+            stats.record(sample)
+        self.assertEqual(1000, stats.summary()["sample_count"])
+        time.sleep(0.25)
+        stats.record(0.5)
+        summary = stats.summary()
+        self.assertEqual(1, summary["sample_count"])
+        self.assertEqual(1001, summary["lifetime"]["sample_count"])
+        self.assertAlmostEqual(500.0, summary["p50"], delta=5.0)
+
+    def test_end_to_end_latency_of_several_flows(self):
+        registry = MetricsRegistry()
+        registry.reset()
+        try:
+            for sample in self.samples[:500]:
+                registry.record_end_to_end("input", "output_1", sample)
+            for sample in self.samples[500:800]:
+                registry.record_end_to_end("input", "output_2", sample)
+            registry.record_end_to_end("other", "output_1", 1.0)
+            self.assertEqual(800, registry.end_to_end_latency(source_id="input")["sample_count"])
+            self.assertEqual(501, registry.end_to_end_latency(output_id="output_1")["lifetime"]["sample_count"])
+            self.assertEqual(801, registry.end_to_end_latency()["sample_count"])
+            self.assertEqual({"p50", "p95", "p99", "mean", "sample_count", "lifetime"},
+                             set(registry.snapshot()["flows"]["input->output_1"]["end_to_end_latency_ms"]))
+        finally:
+            registry.reset()
+
+
+class TestSlidingWindow(unittest.TestCase):
+    """
+    The bucketed event counters used for the throughput metrics.
+    """
+
+    def test_rates_of_evenly_spread_events(self):
+        clock = [1000.0]
+        counter = _SlidingWindow()
+        with mock.patch("metrics.time.monotonic", lambda: clock[0]):
+            # 100 events per second for 30.5 seconds.
+            for _ in range(3050):
+                clock[0] += 0.01
+                counter.record()
+            rate_1, rate_10, rate_60 = counter.rates((1, 10, 60))
+            self.assertAlmostEqual(100.0, rate_1, delta=1.0)
+            self.assertAlmostEqual(100.0, rate_10, delta=1.0)
+            self.assertAlmostEqual(3050 / 60, rate_60, delta=1.0)
+            self.assertEqual(counter.rate(60), rate_60)
+            self.assertEqual(0.0, counter.rate(0))
+
+            clock[0] += 100
+            self.assertEqual([0.0, 0.0], counter.rates((1, 60)))
+        self.assertEqual(3050, counter.total)
+        self.assertTrue(all(len(shard.counts) == 61 for shard in counter._shards))
+
+    def test_concurrent_recording(self):
+        counter = _SlidingWindow()
+
+        def work():
+            for _ in range(5_000):
+                counter.record()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(40_000, counter.total)
+        self.assertAlmostEqual(40_000 / 60, counter.rate(60), delta=1.0)
+
+
+class TestTracer(unittest.TestCase):
+    """
+    Sampled tracing of data flows.
+    """
+
+    def test_every_nth_flow_is_sampled(self):
+        tracer = Tracer(sample_rate=3)
+        self.assertEqual([trace is not None for trace in [tracer.sample("source", 0.0) for _ in range(6)]],
+                         [True, False, False, True, False, False])
+        self.assertIsNone(Tracer().sample("source", 0.0))
+
+    def test_traces_are_finished_when_collected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracer = Tracer(sample_rate=1, buffer_size=2, path=path)
+            for index in range(3):
+                trace = tracer.sample("source_{0}".format(index), 10.0)
+                trace.add("output", "run", 10.5, 10.75)
+                trace.add("output", "link_wait", 10.0, 10.5)
+                self.assertEqual([], tracer.traces(source_id="source_{0}".format(index)))
+                del trace
+                gc.collect()
+
+            traces = tracer.traces()
+            self.assertEqual(["source_1", "source_2"], [trace["source_id"] for trace in traces])
+            self.assertEqual(750.0, traces[0]["duration_ms"])
+            self.assertEqual([{"module_id": "output", "name": "link_wait", "start_ms": 0.0, "duration_ms": 500.0},
+                              {"module_id": "output", "name": "run", "start_ms": 500.0, "duration_ms": 250.0}],
+                             traces[0]["spans"])
+            self.assertTrue(tracer.flush(timeout=5))
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(["source_0", "source_1", "source_2"],
+                                 [json.loads(line)["source_id"] for line in file])
+
+    def test_traces_are_written_off_the_finishing_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tracer = Tracer(sample_rate=1, path=os.path.join(directory, "traces.jsonl"))
+            threads = []
+            with mock.patch("metrics.open", create=True,
+                            side_effect=lambda *args, **kwargs: threads.append(threading.current_thread()) or
+                            open(*args, **kwargs)):
+                trace = tracer.sample("source", 10.0)
+                trace.add("output", "run", 10.0, 10.5)
+                del trace
+                gc.collect()
+                self.assertTrue(tracer.flush(timeout=5))
+            self.assertEqual(1, len(threads))
+            self.assertIsNot(threading.current_thread(), threads[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+# Internal imports.
+from utils.analyzers import SamplingProfiler, module_of_thread
+
+
+def _busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """
+    The statistical profiler attributing CPU time to modules.
+    """
+
+    def test_threads_are_mapped_to_modules_by_name(self):
+        module_ids = {"source", "target", "a_to_b"}
+        for name, module_id in [("Link_source_to_target", "target"),
+                                ("Link_source_to_a_to_b", "a_to_b"),
+                                ("Link_a_to_b_to_target", "target"),
+                                ("Link_source_to_unknown", "unknown"),
+                                ("Queue_Worker_target", "target"),
+                                ("Start_source", "source"),
+                                ("MainThread", None)]:
+            with self.subTest(name=name):
+                self.assertEqual(module_id, module_of_thread(name, module_ids))
+
+    def test_cpu_time_is_attributed_to_the_busy_module(self):
+        stop = threading.Event()
+        threads = [threading.Thread(target=_busy_loop, args=(stop,), name="Queue_Worker_busy", daemon=True),
+                   threading.Thread(target=stop.wait, name="Queue_Worker_idle", daemon=True)]
+        for thread in threads:
+            thread.start()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.folded")
+            profiler = SamplingProfiler(interval=0.005, path=path)
+            profiler.cpu_interval = 0.1
+            profiler.start()
+            time.sleep(0.5)
+            stop.set()
+            profiler.stop()
+
+            modules = profiler.cpu_shares()["modules"]
+            self.assertIn("busy", modules)
+            self.assertGreater(modules["busy"]["share"], modules.get("idle", {"share": 0.0})["share"])
+            with open(path, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+            busy = [line for line in lines if line.startswith("busy;")]
+            self.assertTrue(any("_busy_loop" in line for line in busy))
+            self.assertTrue(all(int(line.rsplit(" ", 1)[1]) >= 0 for line in lines))
+
+    def test_cpu_time_of_a_renamed_thread_is_split_between_its_modules(self):
+        def work():
+            while not stop.is_set():
+                # Like a thread of the spawn pool, running a task of module b and then one of module a.
+                for name, seconds in [("Queue_Worker_b", 0.01), ("Queue_Worker_a", 0.04)]:
+                    threading.current_thread().name = name
+                    busy_until = time.monotonic() + seconds
+                    while time.monotonic() < busy_until:
+                        sum(range(1000))
+
+        stop = threading.Event()
+        thread = threading.Thread(target=work, name="Queue_Worker_a", daemon=True)
+        thread.start()
+        profiler = SamplingProfiler()
+        profiler.sample()
+        profiler.account()
+        end = time.monotonic() + 1.0
+        while time.monotonic() < end:
+            profiler.sample()
+            time.sleep(0.002)
+        # A single reading for all samples, taken while the thread runs module a.
+        while thread.name != "Queue_Worker_a":
+            time.sleep(0.001)
+        profiler.account()
+        stop.set()
+        thread.join()
+
+        modules = profiler.cpu_shares()["modules"]
+        self.assertAlmostEqual(0.8, modules["a"]["share"], delta=0.15)
+        self.assertAlmostEqual(0.2, modules["b"]["share"], delta=0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
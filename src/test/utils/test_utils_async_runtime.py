@@ -0,0 +1,97 @@
+import unittest
+import asyncio
+import threading
+import time
+
+# Internal imports.
+import models
+from utils.async_runtime import AsyncRuntime
+import modules.base.base
+from modules.base.base import AbstractModule
+
+
+class _AsyncModule:
+    """
+    Stands in for a module with async methods.
+    """
+
+    def __init__(self, module_id: str):
+        self.configuration = models.OutputModule(id=module_id, module_name="outputs.test")
+        self.running = 0
+        self.peak = 0
+
+    async def write(self, delay: float) -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        return threading.current_thread().name
+
+    async def fail(self):
+        raise ValueError("failed")
+
+
+class TestAsyncRuntime(unittest.TestCase):
+    """
+    The shared event loop threads executing the async methods of modules.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.runtime = AsyncRuntime(loop_count=2)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        threads = self.runtime.threads
+        self.runtime.shutdown(timeout=5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    def test_coroutines_of_a_module_run_concurrently_on_one_loop(self):
+        module = _AsyncModule("output")
+        t0 = time.monotonic()
+        futures = [self.runtime.submit(module.write, 0.2) for _ in range(50)]
+        threads = {future.result(timeout=5) for future in futures}
+        self.assertLess(time.monotonic() - t0, 2, "The coroutines were not executed concurrently.")
+        self.assertEqual(module.peak, 50)
+        self.assertEqual(len(threads), 1)
+
+    def test_the_same_module_always_uses_the_same_loop(self):
+        for module_id in ["a", "b", "c", "d"]:
+            module = _AsyncModule(module_id)
+            with self.subTest(module_id=module_id):
+                self.assertEqual(self.runtime.run(module.write, 0), self.runtime.run(module.write, 0))
+
+    def test_exceptions_are_raised_to_the_caller(self):
+        with self.assertRaises(ValueError):
+            self.runtime.run(_AsyncModule("output").fail)
+
+    def test_a_shut_down_runtime_starts_again_on_use(self):
+        module = _AsyncModule("output")
+        first = self.runtime.run(module.write, 0)
+        threads = self.runtime.threads
+        self.runtime.shutdown(timeout=5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(first, self.runtime.run(module.write, 0))
+
+    def test_invoking_from_a_loop_thread_does_not_deadlock(self):
+        """
+        An async method calling back into synchronous code, which invokes an async method again.
+        """
+        module = _AsyncModule("output")
+        original = modules.base.base.async_runtime
+        modules.base.base.async_runtime = self.runtime
+        try:
+            async def nested():
+                return AbstractModule._invoke_async(module.write, 0)
+
+            self.assertTrue(self.runtime.run(nested))
+        finally:
+            modules.base.base.async_runtime = original
+
+
+if __name__ == '__main__':
+    unittest.main()
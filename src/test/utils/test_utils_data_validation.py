@@ -4,6 +4,7 @@ from pathlib import Path
 
 # Internal imports.
 import utils.data_validation
+from models.interfaces import CopyOnWriteDict
 
 
 class TestUtilsDataValidation(unittest.TestCase):
@@ -116,6 +117,94 @@ class TestUtilsDataValidation(unittest.TestCase):
                                                            f"should be '{data.get('assertion')}' but was "
                                                            f"'{valid}'. Messages: {str(messages)}")
 
+    def test_compiled_requirements(self):
+        """
+        Test that compiled requirements return the same as the interpreted ones.
+        """
+        requirements = [requirement for data in self.test_data['test_data'] for requirement in data.get("requirement")]
+        requirements += ["((key a) or not (keys > 1))", "(length a < b)", "(value a == init)", "(key !a with str)"]
+        data_objects = [data.get("data") for data in self.test_data['test_data']]
+        data_objects += [{"a": "init", "b": [1]}, {"a": [1, 2], "b": [1, 2, 3]}, {"b": 1}]
+        for requirement in requirements:
+            compiled = utils.data_validation._compile_requirement(requirement)
+            for data in data_objects:
+                with self.subTest(requirement=requirement, data=data):
+                    self.assertEqual(self._result_of(utils.data_validation._evaluate_requirement, requirement, data),
+                                     self._result_of(lambda: compiled.evaluate(data)[:2]))
+
+    def test_compiled_requirements_raise_the_same_exceptions(self):
+        """
+        Test that malformed requirements still raise when evaluated.
+        """
+        for requirement in ["(invalid)", "key *", "((key *) and x)", "(key !a)", "(value a =~ 1)"]:
+            with self.subTest(requirement=requirement):
+                with self.assertRaises(ChildProcessError) as context:
+                    utils.data_validation.validate({"a": 1}, [requirement])
+                self.assertIn(requirement, str(context.exception))
+
+    def test_validation_cache(self):
+        """
+        Test that data objects of a known shape return the same results, without evaluating shape-only expressions.
+        """
+        lookups = []
+        cache = utils.data_validation.ValidationCache(on_lookup=lookups.append)
+        requirements = ["((key a with float) and (value a > 0))", "((length * equal) and (keys == 2))"]
+        data_objects = [{"a": 1.5, "b": [1]}, {"a": -1.5, "b": [2]}, {"a": 2.5, "b": [3, 4]}, {"a": 1, "b": [1]},
+                        {"a": 0.5, "b": [1]}, {"b": [1]}, {"a": 0.5, "b": [1]}]
+        for data in data_objects:
+            with self.subTest(data=data):
+                self.assertEqual(utils.data_validation.validate(data, requirements),
+                                 utils.data_validation.validate(data, requirements, cache=cache))
+        self.assertEqual([False, True, False, False, True, False, True], lookups)
+
+        calls = []
+        data_type = utils.data_validation._compile_data_type("float")
+        original = utils.data_validation._compile_data_type
+        utils.data_validation._compile_data_type = lambda _: (data_type[0], lambda value: calls.append(value) or True)
+        try:
+            utils.data_validation._compile_requirement.cache_clear()
+            cache = utils.data_validation.ValidationCache()
+            for value in [1.0, 2.0, 3.0]:
+                utils.data_validation.validate({"a": value}, ["(key a with float)"], cache=cache)
+        finally:
+            utils.data_validation._compile_data_type = original
+            utils.data_validation._compile_requirement.cache_clear()
+        self.assertEqual([1.0], calls)
+
+    def test_validation_cache_keeps_copy_on_write_values_shared(self):
+        """
+        Test that looking up the shape of a copy-on-write dict does not copy its shared values.
+        """
+        shared = [1, 2]
+        data = CopyOnWriteDict({"a": 1.5, "b": shared}, shared=frozenset({"b"}))
+        cache = utils.data_validation.ValidationCache()
+        requirements = ["(length * equal)"]
+        shape, known = cache.lookup(data, requirements)
+        self.assertIsNone(known)
+        cache.store(shape, [])
+        self.assertEqual([], cache.lookup(data, requirements)[1])
+        self.assertIs(shared, dict.__getitem__(data, "b"))
+
+    def test_validation_cache_with_other_requirements(self):
+        """
+        Test that the cache is discarded if the requirements change.
+        """
+        cache = utils.data_validation.ValidationCache()
+        self.assertTrue(utils.data_validation.validate({"a": 1}, ["(key a with int)"], cache=cache)[0])
+        self.assertFalse(utils.data_validation.validate({"a": 1}, ["(key a with str)"], cache=cache)[0])
+        self.assertEqual(utils.data_validation.validate({"a": 1}, ["(value a > 1)"]),
+                         utils.data_validation.validate({"a": 1}, ["(value a > 1)"], cache=cache))
+
+    @staticmethod
+    def _result_of(function, *args):
+        """
+        Call a function and return its result, or the message of the exception it raised.
+        """
+        try:
+            return function(*args)
+        except Exception as e:
+            return str(e)
+
 
 if __name__ == '__main__':
     unittest.main()
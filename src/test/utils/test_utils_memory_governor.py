@@ -0,0 +1,142 @@
+import unittest
+import gc
+import sys
+import threading
+from unittest import mock
+
+# Internal imports.
+import models
+from models.interfaces import CopyOnWriteDict
+from utils.memory_governor import estimate_size, MemoryGovernor, ByteQueue
+
+
+class TestEstimateSize(unittest.TestCase):
+    """
+    Estimating the memory held by queued data objects.
+    """
+
+    def test_large_data_objects_are_estimated_larger(self):
+        small = models.Data(measurement="m", fields={"value": 1})
+        large = models.Data(measurement="m", fields={"value": "x" * 100_000})
+        self.assertGreater(estimate_size(small), sys.getsizeof(small))
+        self.assertGreater(estimate_size(large), 100_000)
+        self.assertEqual(0, estimate_size(None))
+
+    def test_large_containers_are_sampled(self):
+        values = {"field_{0}".format(i): "x" * 100 for i in range(1_000)}
+        exact = sys.getsizeof(values) + sum(sys.getsizeof(key) + sys.getsizeof(value)
+                                            for key, value in values.items())
+        self.assertAlmostEqual(exact, estimate_size(values), delta=exact * 0.05)
+
+    def test_shared_values_of_copy_on_write_dicts_are_not_copied(self):
+        shared = [1, 2, 3]
+        fields = CopyOnWriteDict({"list": shared}, shared=frozenset({"list"}))
+        estimate_size(models.Data(measurement="m", fields=fields))
+        self.assertIs(shared, dict.__getitem__(fields, "list"))
+
+
+class TestByteQueue(unittest.TestCase):
+    """
+    Queues charging the estimated size of their items to the budget of a module.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.governor = MemoryGovernor(limit=0, module_limit=0)
+        self.patch = mock.patch.object(ByteQueue, "flush_bytes", 0)
+        self.patch.start()
+        self.data = [models.Data(measurement="m", fields={"value": "x" * 1_000}) for _ in range(10)]
+        self.size = estimate_size(self.data[0])
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.patch.stop()
+
+    def test_bytes_are_charged_until_the_items_are_taken(self):
+        budget = self.governor.budget("module")
+        first, second = ByteQueue(budget=budget), ByteQueue(budget=budget)
+        for data in self.data[:3]:
+            first.put(data)
+        second.put(self.data[3])
+        self.assertEqual(3 * self.size, first.bytes)
+        self.assertEqual(4 * self.size, budget.bytes)
+        self.assertEqual(4 * self.size, self.governor.bytes)
+
+        self.assertIs(self.data[0], first.get())
+        self.assertEqual(3 * self.size, self.governor.snapshot()["modules"]["module"]["queued_bytes"])
+        self.assertEqual(4 * self.size, self.governor.snapshot()["high_water_mark"])
+
+    def test_discarded_queues_release_their_bytes(self):
+        budget = self.governor.budget("module")
+        discarded = ByteQueue(budget=budget)
+        for data in self.data:
+            discarded.put(data)
+        del discarded
+        gc.collect()
+        self.assertEqual(0, self.governor.bytes)
+        self.assertEqual({}, self.governor.snapshot()["modules"])
+
+    def test_module_and_total_limits(self):
+        budget = self.governor.budget("module", limit_mb=2.5 * self.size / 1024 / 1024)
+        limited, other = ByteQueue(budget=budget), ByteQueue(budget=self.governor.budget("other"))
+        self.assertFalse(limited.over_budget())
+        for data in self.data[:3]:
+            limited.put(data)
+        self.assertTrue(limited.over_budget())
+        self.assertFalse(other.over_budget(), "An empty queue must always accept an item.")
+
+        other.put(self.data[3])
+        self.assertFalse(other.over_budget())
+        self.governor.limit = 4 * self.size
+        self.assertTrue(other.over_budget())
+
+        # A limit of 0 falls back to the default limit of the governor.
+        self.assertEqual(0, self.governor.budget("module", limit_mb=0).limit)
+
+    def test_the_budget_is_charged_in_steps(self):
+        budget = self.governor.budget("module")
+        stepped = ByteQueue(budget=budget)
+        stepped.flush_bytes = 10 * self.size + 1
+        for data in self.data:
+            stepped.put(data)
+        self.assertEqual(10 * self.size, stepped.bytes)
+        self.assertEqual(0, budget.bytes)
+        stepped.put(self.data[0])
+        self.assertEqual(11 * self.size, budget.bytes)
+        stepped.get()
+        self.assertEqual(11 * self.size, budget.bytes)
+        while not stepped.empty():
+            stepped.get()
+        self.assertEqual(0, budget.bytes)
+
+    def test_large_values_among_small_ones_are_measured(self):
+        byte_queue = ByteQueue()
+        small = models.Data(measurement="m", fields={"value": 1.5})
+        waveforms = [models.Data(measurement="m", fields={"value": 1.5, "waveform": [0.5] * 262_144}),
+                     models.Data(measurement="m", fields={"value": 1.5, "waveform": b"x" * 2 * 1024 * 1024})]
+        for i in range(160):
+            byte_queue.put(waveforms[i // 16 % 2] if i % 16 == 8 else small)
+        self.assertGreater(byte_queue.bytes, 10 * 2 * 1024 * 1024)
+
+        array = mock.Mock(nbytes=2 * 1024 * 1024)
+        self.assertGreater(estimate_size(models.Data(measurement="m", fields={"waveform": array})),
+                           2 * 1024 * 1024)
+
+    def test_waiting_for_bytes_freed_by_another_queue(self):
+        budget = self.governor.budget("module", limit_mb=1.5 * self.size / 1024 / 1024)
+        link, internal = ByteQueue(budget=budget), ByteQueue(budget=budget)
+        link.put(self.data[0])
+        internal.put(self.data[1])
+        self.assertFalse(internal.put_within_budget(self.data[2], timeout=0.05))
+
+        threading.Timer(0.1, link.get).start()
+        self.assertTrue(internal.put_within_budget(self.data[2], timeout=2))
+        self.assertEqual(2, internal.qsize())
+
+
+if __name__ == '__main__':
+    unittest.main()
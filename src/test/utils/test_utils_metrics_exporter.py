@@ -0,0 +1,102 @@
+import unittest
+import http.server
+import queue
+import threading
+import urllib.request
+
+# Internal imports.
+from metrics import MetricsRegistry
+from utils.metrics_exporter import OpenMetricsExporter, CONTENT_TYPE, _Handler
+
+
+class TestOpenMetricsExporter(unittest.TestCase):
+    """
+    The OpenMetrics exposition of the metrics registry.
+    """
+
+    def setUp(self):
+        """
+        This method is called before each test.
+        """
+        self.registry = MetricsRegistry()
+        self.registry.reset()
+        self.exporter = OpenMetricsExporter(self.registry)
+
+    def tearDown(self):
+        """
+        This method is called after each test.
+        """
+        self.registry.reset()
+
+    def _samples(self) -> dict:
+        lines = self.exporter.render().splitlines()
+        self.assertEqual("# EOF", lines[-1])
+        return dict(line.rsplit(" ", 1) for line in lines[:-1] if not line.startswith("#"))
+
+    def test_counters_gauges_and_histograms(self):
+        module = self.registry.register("module_1", 'processors."test"', queue=queue.Queue())
+        module._queue.put(1)
+        for seconds in [0.0004, 0.002, 0.002, 3.0]:
+            module.record_received()
+            module.record_processing_time(seconds)
+        module.record_error()
+        self.registry.record_end_to_end("input", "output", 0.02)
+
+        samples = self._samples()
+        labels = 'module_id="module_1",module_name="processors.\\"test\\""'
+        self.assertEqual("4", samples["collectu_module_received_total{" + labels + "}"])
+        self.assertEqual("1", samples["collectu_module_errors_total{" + labels + "}"])
+        self.assertEqual("1", samples["collectu_module_queue_depth{" + labels + "}"])
+        histogram = "collectu_module_processing_seconds_bucket{" + labels + ",le=\"{0}\"}"
+        self.assertEqual("0", samples[histogram.replace("{0}", "0.0001")])
+        self.assertEqual("1", samples[histogram.replace("{0}", "0.0005")])
+        self.assertEqual("3", samples[histogram.replace("{0}", "0.0025")])
+        self.assertEqual("3", samples[histogram.replace("{0}", "2.5")])
+        self.assertEqual("4", samples[histogram.replace("{0}", "+Inf")])
+        self.assertEqual("4", samples["collectu_module_processing_seconds_count{" + labels + "}"])
+        self.assertAlmostEqual(3.0044, float(samples["collectu_module_processing_seconds_sum{" + labels + "}"]))
+        self.assertEqual("1", samples['collectu_flow_end_to_end_seconds_count'
+                                     '{flow="input->output",source_id="input",output_id="output"}'])
+        # Histograms without samples are left out.
+        self.assertFalse([key for key in samples if key.startswith("collectu_module_link_wait_seconds")])
+
+    def test_rendering_is_incremental(self):
+        module = self.registry.register("module_1", "processors.test")
+        module.record_processing_time(0.001)
+        first = self.exporter.render()
+        self.assertEqual(first, self.exporter.render())
+
+        module.record_processing_time(0.001)
+        module.record_processed()
+        samples = self._samples()
+        labels = 'module_id="module_1",module_name="processors.test"'
+        self.assertEqual("2", samples["collectu_module_processing_seconds_count{" + labels + "}"])
+        self.assertEqual("1", samples["collectu_module_processed_total{" + labels + "}"])
+
+        # A restarted configuration registers new metrics for the same module id.
+        self.registry.reset()
+        self.registry.register("module_1", "processors.test")
+        samples = self._samples()
+        self.assertEqual("0", samples["collectu_module_processed_total{" + labels + "}"])
+        self.assertNotIn("collectu_module_processing_seconds_count{" + labels + "}", samples)
+
+    def test_http_listener(self):
+        self.registry.register("module_1", "processors.test").record_received()
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            address = "http://127.0.0.1:{0}".format(server.server_address[1])
+            with urllib.request.urlopen(address + "/metrics", timeout=5) as response:
+                self.assertEqual(CONTENT_TYPE, response.headers["Content-Type"])
+                body = response.read().decode("utf-8")
+            self.assertIn('collectu_module_received_total{module_id="module_1"', body)
+            self.assertTrue(body.endswith("# EOF\n"))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(address + "/other", timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
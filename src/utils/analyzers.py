@@ -1,13 +1,18 @@
 """
 Some helpful functions for analyzing application behaviour.
 """
+import os
+import sys
 import time
 import logging
 import threading
 import functools
+from typing import Any, Dict, Optional
 
 # Internal imports.
 import config
+import data_layer
+import metrics
 
 logger = logging.getLogger(config.APP_NAME.lower() + '.' + __name__)
 """The logger instance."""
@@ -55,3 +60,272 @@ def timing(f):
         return ret
 
     return wrap
+
+
+def module_of_thread(name: str, module_ids) -> Optional[str]:
+    """
+    The module a thread works for, by the naming convention of the threads:
+    'Link_<id>_to_<id of the linked module>' (attributed to the linked module, which it executes),
+    'Queue_Worker_<id>', 'Start_<id>' and 'Stop_<id>'.
+
+    :param name: The name of the thread.
+    :param module_ids: The ids of the configured modules. Module ids may contain '_to_' themselves,
+        so the link target is looked up among them.
+    :returns: The module id, or None if the thread does not belong to a module.
+    """
+    if name.startswith("Link_"):
+        targets = []
+        position = name.find("_to_", 5)
+        while position != -1:
+            targets.append(name[position + 4:])
+            position = name.find("_to_", position + 1)
+        for target in targets:
+            if target in module_ids:
+                return target
+        return targets[-1] if targets else None
+    for prefix in ("Queue_Worker_", "Start_", "Stop_"):
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return None
+
+
+def _thread_cpu_times() -> Optional[Dict[int, float]]:
+    """
+    The CPU time of every thread of this process, read from /proc.
+
+    :returns: The user and system CPU seconds by native thread id, or None if not available (e.g. not on Linux).
+    """
+    try:
+        task_ids = os.listdir("/proc/self/task")
+        ticks = os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, AttributeError):
+        return None
+    times = {}
+    for task_id in task_ids:
+        try:
+            with open("/proc/self/task/{0}/stat".format(task_id), "rb") as file:
+                # The thread name in parentheses may contain spaces. utime and stime are the 14th and 15th field.
+                fields = file.read().rsplit(b")", 1)[1].split()
+            times[int(task_id)] = (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, IndexError, ValueError):
+            continue
+    return times
+
+
+class SamplingProfiler:
+    """
+    A statistical in-process profiler, attributing CPU time to modules.
+
+    Every interval, the stacks of all threads are sampled from sys._current_frames() and assigned to a module by the
+    name of the thread (see module_of_thread). Once per cpu_interval, the CPU time every thread consumed meanwhile
+    (read from /proc on Linux) is split evenly between its samples. So waiting threads contribute (almost) nothing,
+    and the per-module CPU times are exact, while the stacks show where within a module the time was spent.
+    Without /proc, every sample counts as one interval of CPU time instead.
+
+    The aggregated stacks are written in the collapsed format of flamegraph.pl and speedscope
+    ('<module>;<frame>;...;<frame> <cpu microseconds>'), the per-module CPU times are reported by cpu_shares
+    and in the metrics snapshot. Work of fused modules is attributed to the first module of the chain.
+
+    :param interval: The seconds between two samples.
+    :param path: The file the collapsed stacks are written to every write_interval seconds. Empty to disable.
+    """
+
+    cpu_interval: float = 1.0
+    """The seconds between two readings of the CPU times of the threads."""
+    write_interval: float = 10.0
+    """The seconds between two writes of the collapsed stacks file."""
+    max_stacks: int = 10_000
+    """The maximum number of distinct stacks kept. Further stacks are only counted for their module."""
+    max_depth: int = 128
+    """The maximum number of frames per stack, counted from the innermost one."""
+    other: str = "[other]"
+    """The name under which threads not belonging to a module are reported."""
+
+    def __init__(self, interval: float = 0.01, path: str = ""):
+        self.interval: float = max(0.001, interval)
+        """The seconds between two samples."""
+        self.path: str = path
+        """The file the collapsed stacks are written to."""
+        self.lock = threading.Lock()
+        """Guards the aggregated results."""
+        self.stacks: Dict[str, float] = {}
+        """The CPU seconds per collapsed stack, which starts with the module."""
+        self.cpu: Dict[str, float] = {}
+        """The CPU seconds per module id, or per 'other'."""
+        self._pending: Dict[int, tuple] = {}
+        """The thread name, its module and the (module, stack) samples since the last CPU reading, by native thread
+        id. The samples are kept across renames, as e.g. the spawn pool renames its threads for every task."""
+        self._cpu_times: Dict[int, float] = {}
+        """The CPU seconds per native thread id at the last reading."""
+        self._labels: Dict[Any, str] = {}
+        """The frame label per code object."""
+        self._last: Dict[int, tuple] = {}
+        """The innermost frame, its instruction and the collapsed stack of the last sample, by thread ident."""
+        self._thread: Optional[threading.Thread] = None
+        """The sampling thread."""
+        self._running: bool = False
+        """Set to false to stop the sampling thread."""
+
+    def start(self):
+        """
+        Start sampling in a daemon thread.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="Sampling_Profiler")
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sampling, account the last samples and write the file one last time.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.account()
+        if self.path:
+            self.write(self.path)
+
+    def _loop(self):
+        """
+        Samples until stopped, accounts the CPU times every cpu_interval and writes the file every write_interval.
+        """
+        next_reading = time.monotonic() + self.cpu_interval
+        next_write = time.monotonic() + self.write_interval
+        while self._running:
+            try:
+                self.sample()
+                now = time.monotonic()
+                if now >= next_reading:
+                    next_reading = now + self.cpu_interval
+                    self.account()
+                if self.path and now >= next_write:
+                    next_write = now + self.write_interval
+                    self.write(self.path)
+            except Exception as e:
+                logger.error("Profiler failed: {0}".format(str(e)), exc_info=config.EXC_INFO)
+            time.sleep(self.interval)
+
+    def _collapse(self, frame) -> str:
+        """
+        Collapse a stack into one line, outermost frame first.
+
+        :param frame: The innermost frame.
+        :returns: The frame labels separated by ';'.
+        """
+        labels = self._labels
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = "{0}:{1}".format(os.path.basename(code.co_filename),
+                                                        code.co_name).replace(";", ":")
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return ";".join(stack)
+
+    def sample(self):
+        """
+        Sample the stacks of all threads except the own one.
+        """
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        module_ids = data_layer.module_data
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            thread = threads.get(ident)
+            if ident == own or thread is None:
+                continue
+            entry = self._pending.get(thread.native_id)
+            if entry is None or entry[0] != thread.name:
+                module_id = module_of_thread(thread.name, module_ids) or self.other
+                entry = self._pending[thread.native_id] = (thread.name, module_id, [] if entry is None else entry[2])
+            # A waiting thread keeps the same innermost frame at the same instruction, and thus the same stack.
+            last = self._last.get(ident)
+            if last is not None and last[0] is frame and last[1] == frame.f_lasti:
+                stack = last[2]
+            else:
+                stack = self._collapse(frame)
+            self._last[ident] = (frame, frame.f_lasti, stack)
+            entry[2].append((entry[1], stack))
+        if len(self._last) > len(threads):
+            self._last = {ident: last for ident, last in self._last.items() if ident in threads}
+
+    def account(self):
+        """
+        Split the CPU time the threads consumed since the last reading between their samples.
+        """
+        cpu_times = _thread_cpu_times()
+        pending, self._pending = self._pending, {}
+        with self.lock:
+            for native_id, (_, _, samples) in pending.items():
+                if cpu_times is None:
+                    seconds = self.interval * len(samples)
+                else:
+                    # A thread which was not seen at the last reading is counted from now on.
+                    seconds = cpu_times.get(native_id, 0.0) - self._cpu_times.get(native_id,
+                                                                                 cpu_times.get(native_id, 0.0))
+                if seconds <= 0 or not samples:
+                    continue
+                share = seconds / len(samples)
+                for module_id, stack in samples:
+                    self.cpu[module_id] = self.cpu.get(module_id, 0.0) + share
+                    key = "{0};{1}".format(module_id, stack)
+                    if key in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[key] = self.stacks.get(key, 0.0) + share
+            if cpu_times is not None:
+                self._cpu_times = cpu_times
+
+    def write(self, path: str):
+        """
+        Write the collapsed stacks, replacing the file at once.
+
+        :param path: The file path.
+        """
+        with self.lock:
+            lines = ["{0} {1}\n".format(stack, round(seconds * 1_000_000))
+                     for stack, seconds in sorted(self.stacks.items())]
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+        os.replace(temporary, path)
+
+    def cpu_shares(self) -> dict:
+        """
+        JSON-serializable table of the CPU time per module.
+
+        :returns: A dict with the `cpu_ms_total` of all sampled threads and `modules`, mapping every module id
+            (and '[other]') to its `cpu_ms_total` and its `share` of all sampled threads.
+        """
+        with self.lock:
+            cpu = dict(self.cpu)
+        total = sum(cpu.values())
+        return {
+            "cpu_ms_total": round(total * 1_000.0, 3),
+            "modules": {module_id: {"cpu_ms_total": round(seconds * 1_000.0, 3),
+                                    "share": round(seconds / total, 4) if total else 0.0}
+                        for module_id, seconds in sorted(cpu.items(), key=lambda item: -item[1])},
+        }
+
+
+profiler: Optional[SamplingProfiler] = None
+"""The running profiler, if started via start_profiler."""
+
+
+def start_profiler(interval_ms: float = config.PROFILER_INTERVAL_MS,
+                   path: str = config.PROFILER_FILE) -> Optional[SamplingProfiler]:
+    """
+    Start the sampling profiler and add its CPU time per module to the metrics snapshot.
+
+    :param interval_ms: The milliseconds between two samples. 0 disables the profiler.
+    :param path: The file the collapsed stacks are written to. Empty to disable.
+    :returns: The profiler, or None if disabled.
+    """
+    global profiler
+    if not interval_ms:
+        return None
+    profiler = SamplingProfiler(interval=interval_ms / 1000.0, path=path)
+    profiler.start()
+    metrics.metrics_registry.register_profiler(profiler)
+    logger.info("Started sampling profiler with an interval of {0} ms.".format(interval_ms))
+    return profiler
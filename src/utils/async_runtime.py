@@ -0,0 +1,165 @@
+"""
+A shared asyncio runtime for the async methods (start, stop, _run) of modules.
+
+Without it, every thread calling an async method drives its own event loop, so the coroutines of a module
+never run concurrently and every call pays the overhead of switching into a loop. With
+config.ASYNC_LOOP_THREADS > 0, a fixed number of dedicated event loop threads is started on first use and
+all coroutines are scheduled onto them instead.
+
+All coroutines of one module are scheduled onto the same loop, chosen by the hash of the module id.
+Resources created in an async start method (e.g. client sessions) are usually bound to the loop they were
+created in, so they can be used by async _run and stop methods of the same module.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import zlib
+
+# Internal imports.
+import config
+
+logger = logging.getLogger(config.APP_NAME.lower() + '.' + __name__)
+"""The logger instance."""
+
+
+class AsyncRuntime:
+    """
+    A fixed number of event loop threads, started on first use and kept until shutdown() (usually for the
+    lifetime of the process).
+
+    :param loop_count: The number of event loop threads. 0 disables the runtime.
+    """
+
+    def __init__(self, loop_count: int):
+        self.loop_count: int = max(0, loop_count)
+        """The number of event loop threads. 0 disables the runtime."""
+        self.loops: list[asyncio.AbstractEventLoop] = []
+        """The event loops, one per thread."""
+        self.threads: list[threading.Thread] = []
+        """The threads running the event loops."""
+        self.lock = threading.Lock()
+        """Guards the lazy start of the event loop threads."""
+
+    @property
+    def enabled(self) -> bool:
+        """
+        :returns: True if coroutines are scheduled onto the runtime.
+        """
+        return self.loop_count > 0
+
+    def owns_current_thread(self) -> bool:
+        """
+        Blocking on a coroutine from one of the event loop threads would deadlock that loop.
+
+        :returns: True if the calling thread is one of the event loop threads.
+        """
+        return threading.current_thread() in self.threads
+
+    def _start(self):
+        """
+        Starts the event loop threads, if not done yet.
+        """
+        with self.lock:
+            if self.loops:
+                return
+            loops, threads = [], []
+            for index in range(self.loop_count):
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(target=self._loop, args=(loop, ready), name=f"Async_Loop_{index}",
+                                          daemon=True)
+                thread.start()
+                ready.wait()
+                loops.append(loop)
+                threads.append(thread)
+            self.threads = threads
+            self.loops = loops
+
+    @staticmethod
+    def _loop(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        """
+        Runs an event loop forever.
+
+        :param loop: The event loop.
+        :param ready: Set, as soon as the loop runs.
+        """
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        except Exception as e:
+            logger.error("The event loop of thread '{0}' stopped unexpectedly: {1}"
+                         .format(threading.current_thread().name, str(e)), exc_info=config.EXC_INFO)
+
+    def shutdown(self, timeout: float = None):
+        """
+        Stops the event loop threads and closes their loops. Coroutines still pending are abandoned.
+        The threads are started again on the next use of the runtime.
+
+        :param timeout: The maximum seconds to wait for every thread. Defaults to config.STOP_TIMEOUT.
+        """
+        timeout = config.STOP_TIMEOUT if timeout is None else timeout
+        with self.lock:
+            loops, threads = self.loops, self.threads
+            self.loops, self.threads = [], []
+        for loop in loops:
+            loop.call_soon_threadsafe(loop.stop)
+        for loop, thread in zip(loops, threads):
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.error("The event loop thread '{0}' did not stop within {1} s.".format(thread.name, timeout))
+            else:
+                loop.close()
+
+    def loop_for(self, key: str) -> asyncio.AbstractEventLoop:
+        """
+        Returns the event loop for a key. The same key always results in the same loop.
+
+        :param key: The key, usually the id of a module.
+        :returns: The event loop.
+        """
+        if not self.loops:
+            self._start()
+        if len(self.loops) == 1:
+            return self.loops[0]
+        return self.loops[zlib.crc32(key.encode("utf-8")) % len(self.loops)]
+
+    def submit(self, method, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedules an async method onto the runtime without waiting for it.
+
+        :param method: The async method. If it is bound to a module, the loop of the module is used.
+        :param args: Positional arguments forwarded to the method.
+        :param kwargs: Keyword arguments forwarded to the method.
+        :returns: A future resolving to the return value of the method.
+        """
+        return asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self.loop_for(self._key(method)))
+
+    def run(self, method, *args, **kwargs):
+        """
+        Executes an async method on the runtime and waits for its result.
+        Must not be called from one of the event loop threads (see owns_current_thread).
+
+        :param method: The async method. If it is bound to a module, the loop of the module is used.
+        :param args: Positional arguments forwarded to the method.
+        :param kwargs: Keyword arguments forwarded to the method.
+        :returns: The return value of the method.
+        :raises Exception: Re-raises any exception thrown inside the method.
+        """
+        # Deliberately without a timeout, for the same reasons as in the thread based fallback
+        # of AbstractModule._invoke_async.
+        return self.submit(method, *args, **kwargs).result()
+
+    @staticmethod
+    def _key(method) -> str:
+        """
+        :param method: A method, possibly bound to a module.
+        :returns: The id of the module the method is bound to, or an empty string.
+        """
+        configuration = getattr(getattr(method, "__self__", None), "configuration", None)
+        return str(getattr(configuration, "id", ""))
+
+
+async_runtime = AsyncRuntime(loop_count=config.ASYNC_LOOP_THREADS)
+"""The runtime shared by all modules."""
@@ -2,7 +2,9 @@
 Validation functions for checking that data input fulfills the module requirements.
 """
 import ast
+import functools
 import operator
+import re
 from typing import Callable, Tuple, Union, List, Dict, Any
 
 OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
@@ -295,6 +297,26 @@ def _evaluate_requirement(requirement: str, data: dict) -> Tuple[bool, List[str]
     """
     messages: List[str] = []
 
+    expressions = _extract_expressions(requirement)
+
+    # Evaluate the lowest expressions
+    results: List[bool] = []
+    for expression in expressions:
+        expression_valid, expression_messages = _evaluate_expression(expression=expression, data=data)
+        results.append(expression_valid)
+        messages = messages + expression_messages
+
+    return _combine_results(requirement, expressions, results), messages
+
+
+def _extract_expressions(requirement: str) -> List[str]:
+    """
+    Extract the lowest expressions of a requirement, which are the ones not containing further brackets.
+
+    :param requirement: The requirement.
+
+    :returns: The lowest expressions in the order of their closing brackets (may contain duplicates).
+    """
     if not requirement[0] == "(" or not requirement[-1] == ")":
         raise Exception(f"Could not evaluate requirement '{requirement}': "
                         f"A requirement has to start with '(' and end with ')'.")
@@ -311,14 +333,21 @@ def _evaluate_requirement(requirement: str, data: dict) -> Tuple[bool, List[str]
     # Get the lowest expressions.
     # Caution: this read `if ('(' or ')') not in expression`, which is `'(' or ')'` evaluated
     # first - always '(' - so a nested closing bracket alone never excluded an expression.
-    expressions: List[str] = [expression for expression in expressions
-                              if '(' not in expression and ')' not in expression]
+    return [expression for expression in expressions if '(' not in expression and ')' not in expression]
 
-    # Evaluate the lowest expressions
-    for expression in expressions:
-        expression_valid, expression_messages = _evaluate_expression(expression=expression, data=data)
+
+def _combine_results(requirement: str, expressions: List[str], results: List[bool]) -> bool:
+    """
+    Combine the results of the lowest expressions as described by the boolean operators of the requirement.
+
+    :param requirement: The requirement.
+    :param expressions: The lowest expressions of the requirement.
+    :param results: The result of each expression.
+
+    :returns: Is the requirement valid.
+    """
+    for expression, expression_valid in zip(expressions, results):
         requirement = requirement.replace("(" + expression + ")", str(expression_valid))
-        messages = messages + expression_messages
 
     try:
         # Evaluate the complete requirement, where the single expressions are replaced with the evaluated ones.
@@ -332,7 +361,551 @@ def _evaluate_requirement(requirement: str, data: dict) -> Tuple[bool, List[str]
     except Exception as e:
         raise Exception(f"Could not evaluate requirement '{requirement}': " + str(e))
 
-    return valid, messages
+    return valid
+
+
+def _compile_data_type(data_type: str) -> Union[Tuple[set, Callable[[Any], bool]], None]:
+    """
+    Build a check for the data type of a value (see _is_same_data_type).
+
+    :param data_type: The data type, e.g. 'str/ints'.
+
+    :returns: The type names accepted for any value without further checks and a function checking a value,
+    or None if the data type is unknown.
+    """
+    names: set = set()
+    item_names: List[set] = []
+    any_list: bool = False
+    for single_type in data_type.split("/"):
+        if single_type in ["strs", "bools", "ints", "floats"]:
+            item_names.append({single_type[:-1]})
+        elif single_type == "numbers":
+            item_names.append({"int", "float"})
+        elif single_type == "list":
+            any_list = True
+        elif single_type in ["str", "bool", "int", "float"]:
+            names.add(single_type)
+        elif single_type == "number":
+            names.update(("int", "float"))
+        else:
+            return None
+
+    def is_same_data_type(value: Any) -> bool:
+        if type(value).__name__ in names or (any_list and isinstance(value, list)):
+            return True
+        if isinstance(value, list):
+            for allowed in item_names:
+                if all(type(item).__name__ in allowed for item in value):
+                    return True
+        return False
+
+    return names, is_same_data_type
+
+
+def _compile_key_expression(variables: List[str]) -> Union[Callable[[dict], Tuple[bool, List[str]]], None]:
+    """
+    Build the check of a 'key' expression, e.g. (key test1 with int).
+
+    :param variables: The expression split into its words.
+
+    :returns: The check, or None if the expression has to be interpreted.
+    """
+    if len(variables) < 2 or not variables[1]:
+        return None
+    name = variables[1]
+
+    if len(variables) >= 4 and variables[2] == "with":
+        data_type = variables[3]
+        compiled_data_type = _compile_data_type(data_type)
+        if compiled_data_type is None:
+            return None
+        names, is_same_data_type = compiled_data_type
+
+        def type_messages(items) -> List[str]:
+            return [f"The value '{value}' of key '{key}' is not of type {data_type} but was {type(value).__name__}."
+                    for key, value in items if not is_same_data_type(value)]
+
+        if name[0] == '!':
+            excluded = name[1:]
+
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                messages = type_messages((key, value) for key, value in data.items() if key != excluded)
+                return not messages, messages
+        elif name == '*':
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                if data:
+                    # Usually all values are of a type accepted right away.
+                    for value in data.values():
+                        if type(value).__name__ not in names:
+                            break
+                    else:
+                        return True, []
+                messages = type_messages(data.items())
+                if not data:
+                    messages.append("There should be at least one key in the data object.")
+                return not messages, messages
+        else:
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                if name in data:
+                    value = data[name]
+                    if is_same_data_type(value):
+                        return True, []
+                    return False, type_messages(((name, value),))
+                return False, [f"The key '{name}' should be in the data object but wasn't."]
+        return check
+
+    if len(variables) == 2 and name[0] != '!':
+        if name == '*':
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                if data:
+                    return True, []
+                return False, ["There should be at least one key in the data object."]
+        else:
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                if name in data:
+                    return True, []
+                return False, [f"The key '{name}' should be in the data object but wasn't."]
+        return check
+
+    return None
+
+
+def _compile_keys_expression(variables: List[str]) -> Union[Callable[[dict], Tuple[bool, List[str]]], None]:
+    """
+    Build the check of a 'keys' expression, e.g. (keys == 2).
+
+    :param variables: The expression split into its words.
+
+    :returns: The check, or None if the expression has to be interpreted.
+    """
+    if len(variables) < 3 or variables[1] not in OPERATORS or not variables[2].isdigit():
+        return None
+    comparison_operator, number = variables[1], variables[2]
+    function, limit = OPERATORS[comparison_operator], int(number)
+
+    def check(data: dict) -> Tuple[bool, List[str]]:
+        if function(len(data), limit):
+            return True, []
+        return False, [f"The length of the data object should be '{comparison_operator} {number}' "
+                       f"but was '{len(data)}'."]
+
+    return check
+
+
+def _compile_length_expression(variables: List[str]) -> Union[Callable[[dict], Tuple[bool, List[str]]], None]:
+    """
+    Build the check of a 'length' expression, e.g. (length * equal) or (length test1 == test2).
+
+    :param variables: The expression split into its words.
+
+    :returns: The check, or None if the expression has to be interpreted.
+    """
+    if len(variables) < 3 or not variables[1]:
+        return None
+    name, comparison_operator = variables[1], variables[2]
+
+    if name == '*' or name[0] == '!':
+        excluded = name[1:] if name[0] == '!' else None
+        if comparison_operator in OPERATORS:
+            if len(variables) < 4 or not variables[3].isdigit():
+                return None
+            number = variables[3]
+            function, limit = OPERATORS[comparison_operator], int(number)
+
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                for key, value in data.items():
+                    if key == excluded:
+                        continue
+                    if not isinstance(value, list) or not function(len(value), limit):
+                        return False, [f"All values should be lists of length '{comparison_operator} {number}'."]
+                return True, []
+        elif comparison_operator == 'equal':
+            def check(data: dict) -> Tuple[bool, List[str]]:
+                lengths = set()
+                for key, value in data.items():
+                    if key == excluded:
+                        continue
+                    if type(value) != list:
+                        return False, ["All values should be lists of the same length."]
+                    lengths.add(len(value))
+                if len(lengths) > 1:
+                    return False, ["All values should be lists of the same length."]
+                return True, []
+        else:
+            return None
+        return check
+
+    if len(variables) < 4 or comparison_operator not in OPERATORS:
+        return None
+    other = variables[3]
+    function = OPERATORS[comparison_operator]
+    limit = int(other) if other.isdigit() else None
+
+    def check(data: dict) -> Tuple[bool, List[str]]:
+        if name not in data:
+            return False, [f"The key '{name}' was not found in the data object."]
+        value = data[name]
+        if not isinstance(value, list):
+            return False, [f"The value of key '{name}' should be a list."]
+        if limit is not None:
+            if function(len(value), limit):
+                return True, []
+            return False, [f"The length of the list from key '{name}' should be '{comparison_operator} {other}' "
+                           f"but was '{len(value)}'."]
+        if other not in data:
+            return False, [f"The key '{other}' was not found in the data object."]
+        other_value = data[other]
+        if not isinstance(other_value, list):
+            return False, [f"The value of key '{other}' should be a list."]
+        if function(len(value), len(other_value)):
+            return True, []
+        return False, [f"The length of the list from key '{name}' should be "
+                       f"'{comparison_operator} {len(other_value)}' but was '{len(value)}'."]
+
+    return check
+
+
+def _compile_value_expression(variables: List[str]) -> Union[Callable[[dict], Tuple[bool, List[str]]], None]:
+    """
+    Build the check of a 'value' expression, e.g. (value test1 == 1).
+
+    :param variables: The expression split into its words.
+
+    :returns: The check, or None if the expression has to be interpreted.
+    """
+    if len(variables) < 4 or variables[2] not in OPERATORS:
+        return None
+    name, comparison_operator, literal_text = variables[1], variables[2], variables[3]
+    function, literal = OPERATORS[comparison_operator], _as_literal(literal_text)
+
+    def check(data: dict) -> Tuple[bool, List[str]]:
+        if name not in data:
+            return False, [f"The key '{name}' was not found in the data object."]
+        value = data[name]
+        valid = function(value, literal)
+        if not valid:
+            return valid, [f"The value of the key '{name}' should be '{comparison_operator} {literal_text}' "
+                           f"but was '{value}'."]
+        return valid, []
+
+    return check
+
+
+_EXPRESSION_COMPILERS: Dict[str, Callable[[List[str]], Union[Callable[[dict], Tuple[bool, List[str]]], None]]] = {
+    "key": _compile_key_expression,
+    "keys": _compile_keys_expression,
+    "length": _compile_length_expression,
+    "value": _compile_value_expression,
+}
+"""The compilers of the expression types, by the first word of an expression."""
+
+
+def _depends_on_shape_only(variables: List[str]) -> bool:
+    """
+    Check if the result of an expression only depends on the shape of a data object,
+    which are its keys, the types of its values and the lengths of its list values.
+
+    :param variables: The expression split into its words.
+
+    :returns: True if the expression does not depend on values (or the items of lists).
+    """
+    if variables[0] == "key" and len(variables) >= 4 and variables[2] == "with":
+        return not set(variables[3].split("/")) & {"strs", "bools", "ints", "floats", "numbers"}
+    return variables[0] in ("key", "keys", "length")
+
+
+def _compile_expression(expression: str) -> Tuple[Callable[[dict], Tuple[bool, List[str]]], bool]:
+    """
+    Compile a single expression into a check doing the same as _evaluate_expression, without parsing it again.
+
+    Expressions which are malformed (or only fail for some data objects) are left to _evaluate_expression,
+    so they keep raising the same exceptions at the same time.
+
+    :param expression: The single expression.
+
+    :returns: A function evaluating the expression for a data object, returning the same as _evaluate_expression,
+    and if its result only depends on the shape of the data object (see _depends_on_shape_only).
+    """
+    variables = expression.split(" ")
+    compiler = _EXPRESSION_COMPILERS.get(variables[0])
+    check = compiler(variables) if compiler else None
+    if check is None:
+        return functools.partial(_evaluate_expression, expression), False
+
+    def evaluate(data: dict) -> Tuple[bool, List[str]]:
+        try:
+            valid, messages = check(data)
+            # Make sure that valid is a boolean.
+            if type(valid) is not bool:
+                raise Exception(f"Evaluation of expression '{expression}' did not return a boolean.")
+        except Exception as e:
+            raise Exception(f"Could not evaluate expression '{expression}': " + str(e))
+        return valid, messages
+
+    return evaluate, _depends_on_shape_only(variables)
+
+
+def _compile_operators(node: ast.AST, placeholders: Dict[str, int]) -> Callable[[List[bool]], bool]:
+    """
+    Turn the boolean operators of a requirement into nested functions.
+
+    :param node: The parsed requirement, where every lowest expression was replaced with a placeholder.
+    :param placeholders: The index of the expression result for every placeholder.
+
+    :returns: A function combining the results of the expressions.
+    :raises ValueError: If the requirement contains anything else than 'and', 'or', 'not' and expressions.
+    """
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, (ast.And, ast.Or)):
+        operands = [_compile_operators(value, placeholders) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def conjunction(results: List[bool]) -> bool:
+                for operand in operands:
+                    if not operand(results):
+                        return False
+                return True
+            return conjunction
+
+        def disjunction(results: List[bool]) -> bool:
+            for operand in operands:
+                if operand(results):
+                    return True
+            return False
+        return disjunction
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_operators(node.operand, placeholders)
+        return lambda results: not operand(results)
+    if isinstance(node, ast.Name) and node.id in placeholders:
+        return operator.itemgetter(placeholders[node.id])
+    raise ValueError(f"Unsupported part of requirement: {ast.dump(node)}.")
+
+
+def _compile_combination(requirement: str, expressions: List[str]) -> Callable[[List[bool]], bool]:
+    """
+    Compile the boolean operators of a requirement, doing the same as _combine_results without eval().
+
+    Requirements with anything else than 'and', 'or', 'not' and brackets between their expressions are left to
+    _combine_results, so they keep raising the same exceptions.
+
+    :param requirement: The requirement.
+    :param expressions: The lowest expressions of the requirement.
+
+    :returns: A function combining the results of the expressions.
+    """
+    interpreted = functools.partial(_combine_results, requirement, expressions)
+    if "_expression_" in requirement:
+        return interpreted
+
+    # Replace the expressions like _combine_results, but with names instead of the results.
+    placeholders: Dict[str, int] = {}
+    skeleton = requirement
+    for index, expression in enumerate(expressions):
+        if "(" + expression + ")" in skeleton:
+            placeholder = f"_expression_{index}_"
+            skeleton = skeleton.replace("(" + expression + ")", placeholder)
+            placeholders[placeholder] = index
+
+    for word in re.split(r"[ ()]+", skeleton):
+        if word and word not in ("and", "or", "not") and word not in placeholders:
+            return interpreted
+    try:
+        return _compile_operators(ast.parse(skeleton, mode="eval").body, placeholders)
+    except (SyntaxError, ValueError):
+        return interpreted
+
+
+class _CompiledRequirement:
+    """
+    A requirement compiled into the checks of its expressions and a function combining their results.
+
+    :param checks: The checks of the lowest expressions.
+    :param shape_only: For every check, if its result only depends on the shape of the data object.
+    :param combine: Combines the results of the checks.
+    :param with_lengths: Does any check only depending on the shape use the lengths of list values.
+    """
+    __slots__ = ("checks", "shape_bits", "shape_mask", "combine", "with_lengths", "shape_result")
+
+    def __init__(self, checks: List[Callable[[dict], Tuple[bool, List[str]]]], shape_only: List[bool],
+                 combine: Callable[[List[bool]], bool], with_lengths: bool = False):
+        self.checks: List[Callable[[dict], Tuple[bool, List[str]]]] = checks
+        """The checks of the lowest expressions."""
+        self.shape_bits: List[int] = [1 << index if only else 0 for index, only in enumerate(shape_only)]
+        """For every check, its bit if its result only depends on the shape of the data object, otherwise 0."""
+        self.shape_mask: int = sum(self.shape_bits)
+        """The bits of all checks only depending on the shape of the data object."""
+        self.combine: Callable[[List[bool]], bool] = combine
+        """Combines the results of the checks."""
+        self.with_lengths: bool = with_lengths
+        """Does any check only depending on the shape use the lengths of list values."""
+        self.shape_result: Union[bool, None] = None
+        """The result, if all checks only depend on the shape and are known to be valid."""
+        if checks and all(shape_only):
+            try:
+                self.shape_result = combine([True] * len(checks))
+            except Exception:
+                pass
+
+    def evaluate(self, data: dict, known: int = 0) -> Tuple[bool, List[str], int]:
+        """
+        Evaluate the requirement, doing the same as _evaluate_requirement.
+
+        :param data: The data object.
+        :param known: The bits of the checks already known to be valid for the shape of the data object.
+            They are not evaluated again.
+
+        :returns: Is the requirement valid, a list of validation messages and the bits of the checks
+        only depending on the shape of the data object, which were valid.
+        """
+        if known and known == self.shape_mask and self.shape_result is not None:
+            return self.shape_result, [], known
+        messages: List[str] = []
+        results: List[bool] = []
+        valid_bits = known
+        for check, bit in zip(self.checks, self.shape_bits):
+            if bit & known:
+                # A valid check never has messages.
+                results.append(True)
+                continue
+            expression_valid, expression_messages = check(data)
+            results.append(expression_valid)
+            messages += expression_messages
+            if expression_valid:
+                valid_bits |= bit
+        return self.combine(results), messages, valid_bits
+
+
+class _InterpretedRequirement(_CompiledRequirement):
+    """
+    A requirement which could not be compiled, evaluated by _evaluate_requirement for every data object.
+
+    :param requirement: The requirement.
+    """
+    __slots__ = ("requirement",)
+
+    def __init__(self, requirement: str):
+        super().__init__(checks=[], shape_only=[], combine=all)
+        self.requirement: str = requirement
+        """The requirement."""
+
+    def evaluate(self, data: dict, known: int = 0) -> Tuple[bool, List[str], int]:
+        valid, messages = _evaluate_requirement(self.requirement, data)
+        return valid, messages, 0
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_requirement(requirement: str) -> _CompiledRequirement:
+    """
+    Compile a requirement, so it does not have to be parsed again for every data object.
+
+    Compiled requirements are cached, since they are usually the field and tag requirements of a module class,
+    which are validated for every data object.
+
+    :param requirement: The requirement.
+
+    :returns: The compiled requirement.
+    """
+    try:
+        expressions = _extract_expressions(requirement)
+    except Exception:
+        # Raises the same exception for every data object.
+        return _InterpretedRequirement(requirement)
+
+    checks, shape_only, with_lengths = [], [], False
+    for expression in expressions:
+        check, only = _compile_expression(expression)
+        checks.append(check)
+        shape_only.append(only)
+        with_lengths = with_lengths or (only and expression.startswith("length "))
+    if len(checks) == 1 and requirement == "(" + expressions[0] + ")":
+        # The result of a requirement consisting of a single expression is the one of the expression.
+        combine = operator.itemgetter(0)
+    else:
+        combine = _compile_combination(requirement, expressions)
+    return _CompiledRequirement(checks=checks, shape_only=shape_only, combine=combine, with_lengths=with_lengths)
+
+
+class ValidationCache:
+    """
+    Remembers, for the shapes of validated data objects, which expressions of the requirements were valid
+    and only depend on the shape (see _depends_on_shape_only).
+
+    The shape of a data object consists of its keys, the types of its values and, if any requirement checks
+    lengths, the lengths of its list values. Inputs usually send data objects of the same shape over and over,
+    with changing values. For these, only the remaining expressions (e.g. 'value ...') are evaluated again.
+    Use one cache per list of requirements, e.g. one for the field and one for the tag requirements of a module.
+
+    :param on_lookup: Called with True for every data object with a known shape and False for every other one,
+        e.g. to record metrics.
+    """
+
+    max_shapes: int = 1_000
+    """The cache is cleared once it holds more shapes."""
+
+    def __init__(self, on_lookup: Callable[[bool], None] = None):
+        self.on_lookup: Callable[[bool], None] = on_lookup
+        """Called with the result of every lookup."""
+        self._requirements: Tuple = ()
+        """The requirements the cached shapes are valid for."""
+        self._enabled: bool = False
+        """Is any expression of the requirements only depending on the shape of the data objects."""
+        self._with_lengths: bool = False
+        """Are the lengths of list values part of the shape."""
+        self._shapes: Dict[tuple, List[int]] = {}
+        """The bits of the valid shape-only checks of every requirement, by shape."""
+
+    def _reset(self, requirements: Tuple):
+        """
+        Discards all cached shapes and prepares the cache for other requirements.
+
+        :param requirements: The requirements.
+        """
+        self._shapes = {}
+        self._enabled = False
+        self._with_lengths = False
+        for requirement in requirements:
+            if isinstance(requirement, str):
+                compiled = _compile_requirement(requirement.strip())
+                self._enabled = self._enabled or bool(compiled.shape_mask)
+                self._with_lengths = self._with_lengths or compiled.with_lengths
+        self._requirements = requirements
+
+    def lookup(self, data: dict, requirements: List[str]) -> Tuple[Union[tuple, None], Union[List[int], None]]:
+        """
+        Look up the shape of a data object.
+
+        :param data: The data object.
+        :param requirements: The requirements the data object is validated against.
+
+        :returns: The shape of the data object (None if nothing is cached for the requirements)
+        and the bits of the valid shape-only checks of every requirement (None if the shape is unknown).
+        """
+        requirements = tuple(requirements)
+        if requirements != self._requirements:
+            self._reset(requirements)
+        if not self._enabled:
+            return None, None
+        # Read through dict, so the shared values of a copy-on-write dict (see models.interfaces.CopyOnWriteDict)
+        # are not copied just for looking up the shape.
+        keys, values = tuple(dict.__iter__(data)), tuple(dict.values(data))
+        if self._with_lengths:
+            shape = (keys, tuple(map(type, values)),
+                     tuple(len(value) if isinstance(value, list) else -1 for value in values))
+        else:
+            shape = (keys, tuple(map(type, values)))
+        known = self._shapes.get(shape)
+        if self.on_lookup is not None:
+            self.on_lookup(known is not None)
+        return shape, known
+
+    def store(self, shape: tuple, valid_bits: List[int]):
+        """
+        Remember the valid shape-only checks for a shape.
+
+        :param shape: The shape, as returned by lookup.
+        :param valid_bits: The bits of the valid shape-only checks of every requirement.
+        """
+        if len(self._shapes) >= self.max_shapes:
+            self._shapes = {}
+        self._shapes[shape] = valid_bits
 
 
 def format_message(messages: List[Dict[str, Union[List[str], str]]]) -> List[str]:
@@ -363,12 +936,14 @@ def format_message(messages: List[Dict[str, Union[List[str], str]]]) -> List[str
     return formatted_messages
 
 
-def validate(data: dict, requirements: List[str]) -> Tuple[bool, int, List[Dict[str, Union[List[str], str]]]]:
+def validate(data: dict, requirements: List[str],
+             cache: ValidationCache = None) -> Tuple[bool, int, List[Dict[str, Union[List[str], str]]]]:
     """
     Validates the given data in dependence of the requirements.
 
     :param data: The data to be validated as dictionary.
     :param requirements: List of requirements (see README.md for further information).
+    :param cache: An optional cache for the results of expressions only depending on the shape of the data.
 
     :returns: Is the data valid, the index of the first valid requirement (-1 if no requirement is valid),
     and a dict with the requirement (key: requirement) and the according validation messages (key: messages).
@@ -379,17 +954,29 @@ def validate(data: dict, requirements: List[str]) -> Tuple[bool, int, List[Dict[
         # If there are no requirements (empty list), we directly return.
         return True, -1, messages
 
+    if type(data) is not dict and isinstance(data, dict):
+        # Validation only reads, so a dict subclass is read as a plain dict. For a copy-on-write dict (see
+        # models.interfaces.CopyOnWriteDict), this keeps the values shared instead of making private copies.
+        data = dict(data)
+
+    shape, known = cache.lookup(data, requirements) if cache is not None else (None, None)
+    valid_bits: List[int] = []
+
     requirement_results = []
-    for requirement in requirements:
+    for index, requirement in enumerate(requirements):
         try:
-            requirement_valid, requirement_messages = _evaluate_requirement(requirement=requirement.strip(),
-                                                                            data=data)
+            requirement_valid, requirement_messages, requirement_bits = _compile_requirement(
+                requirement.strip()).evaluate(data, known[index] if known else 0)
         except Exception as e:
             # Something unexpected went wrong.
             raise ChildProcessError(f"Could not evaluate requirement '{requirement}': " + str(e))
 
         messages.append({"requirement": requirement, "messages": requirement_messages})
         requirement_results.append(requirement_valid)
+        valid_bits.append(requirement_bits)
+
+    if shape is not None and known is None:
+        cache.store(shape, valid_bits)
 
     try:
         requirement_index = requirement_results.index(True)
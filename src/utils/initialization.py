@@ -16,6 +16,7 @@ import base64
 # Internal imports.
 import config
 import data_layer
+import models.configuration
 import utils.plugin_interface
 
 # Third party imports.
@@ -252,6 +253,8 @@ def update_env_variables():
         for key, value in data_layer.settings.items():
             os.environ[key] = value
             parser.set('env', key.lower(), value)
+        # Configurations referencing the changed variables have to resolve them again.
+        models.configuration.invalidate_env_cache()
 
         with open(settings_path, 'w') as settings_file:  # Caution: everything is automatically lowered...
             parser.write(settings_file)
@@ -0,0 +1,402 @@
+"""
+Byte budgets for the queued data objects of all modules.
+
+config.STOP_LIMIT bounds every queue by the number of data objects it holds, which says little about memory:
+ten thousand data objects with a single field take a few MB, ten thousand images a few GB. The queues of links
+and the internal queues of processor and output modules are therefore `ByteQueue`s, which keep track of the
+estimated size of the data objects they hold (see `estimate_size`). So is the queue of the spawn pool, which
+charges the budget named after the pool.
+
+Every module has a `MemoryBudget`, charged by its internal queue and the queues of all links to it. A budget
+can be limited per module (`max_queue_mb`, with config.QUEUE_LIMIT_MB as default), and the process-wide
+`memory_governor` limits the total of all budgets (config.MEMORY_LIMIT_MB). A queue whose budget or the total
+is exceeded is treated like a full queue: with config.BACKPRESSURE_TIMEOUT the sender waits for it to drain
+and the source is asked to slow down, then output modules spill the data object to their buffer module and
+links and processors drop it. An empty queue always accepts a data object, so a single large data object can
+not block a module forever.
+
+A data object forwarded to several links is charged once per link, so the figures are an upper bound if
+the links share the same data object (e.g. with copy_on_write).
+"""
+import collections
+import datetime
+import decimal
+import itertools
+import queue
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+# Internal imports.
+import config
+import models
+from metrics import metrics_registry
+
+_MB: int = 1024 * 1024
+"""Bytes per MB."""
+
+_SAMPLE_SIZE: int = 8
+"""The number of items measured per container. The size of the other items is extrapolated."""
+
+_SAMPLE_DEPTH: int = 3
+"""The number of nested container levels measured. Deeper containers only count their own size."""
+
+_SCALAR_TYPES: frozenset = frozenset({str, bytes, bytearray, int, float, bool, complex, datetime.datetime,
+                                      datetime.date, datetime.timedelta, decimal.Decimal})
+"""Types whose size is measured by sys.getsizeof alone."""
+
+_getsizeof = sys.getsizeof
+
+_FIXED_SIZES: Dict[type, int] = {cls: _getsizeof(value) for cls, value in [
+    (float, 0.0), (bool, False), (complex, 0j), (type(None), None), (datetime.datetime, datetime.datetime.now()),
+    (datetime.date, datetime.date.today()), (datetime.timedelta, datetime.timedelta())]}
+"""The size of the types whose instances all have the same size. Looked up, as sys.getsizeof is comparably slow."""
+
+
+def estimate_size(value: Any, depth: int = _SAMPLE_DEPTH) -> int:
+    """
+    Estimates the memory held by a value, e.g. a data object.
+
+    Every field and tag of a data object is measured, as a single large value (e.g. a waveform) among small
+    ones must not be missed. Flat values are measured at a constant cost: strings and bytes by sys.getsizeof,
+    lists and tuples by their length, objects with an `nbytes` attribute (e.g. numpy arrays) by it. Nested
+    containers are measured by sampling: only the first few items of every container are measured, down to a
+    few levels of nesting, and the size of the others is extrapolated. Values shared with other objects (e.g.
+    interned strings or small integers) are counted as if they were not.
+
+    :param value: The value to measure.
+    :param depth: The number of nested container levels to measure.
+    :returns: The estimated size in bytes.
+    """
+    cls = type(value)
+    if cls in _SCALAR_TYPES:
+        return _getsizeof(value)
+    if value is None:
+        return 0
+    if cls is models.Data:
+        timestamp = value.time
+        return (_getsizeof(value) + _getsizeof(value.measurement)
+                + (_FIXED_SIZES.get(type(timestamp)) or _getsizeof(timestamp))
+                + _values_size(value.fields, depth) + _values_size(value.tags, depth))
+    return _sample_size(value, depth)
+
+
+def _values_size(values: Any, depth: int) -> int:
+    """
+    Estimates the memory held by the fields or tags of a data object, measuring every value, see `estimate_size`.
+
+    :param values: The dict of fields or tags.
+    :param depth: The number of nested container levels to measure, including the dict.
+    :returns: The estimated size in bytes.
+    """
+    if not isinstance(values, dict):
+        return estimate_size(values, depth)
+    size = _getsizeof(values)
+    depth -= 1
+    # dict.items instead of values.items, so the shared values of a copy-on-write dict are not copied.
+    for key, item in dict.items(values):
+        size += _getsizeof(key)
+        cls = type(item)
+        fixed_size = _FIXED_SIZES.get(cls)
+        if fixed_size is not None:
+            size += fixed_size
+        elif cls in _SCALAR_TYPES:
+            size += _getsizeof(item)
+        elif cls is list or cls is tuple:
+            if item and type(item[0]) in _SCALAR_TYPES:
+                # A flat list (e.g. a waveform) is measured by its length and its first item.
+                size += _getsizeof(item) + len(item) * _getsizeof(item[0])
+            else:
+                size += _sample_size(item, depth)
+        elif cls is dict:
+            size += _sample_size(item, depth)
+        else:
+            nbytes = getattr(item, "nbytes", None)
+            if isinstance(nbytes, int):
+                size += max(_getsizeof(item), nbytes)
+            else:
+                size += estimate_size(item, depth)
+    return size
+
+
+def _sample_size(value: Any, depth: int) -> int:
+    """
+    Estimates the memory held by a container, see `estimate_size`.
+
+    :param value: The value to measure.
+    :param depth: The number of nested container levels to measure, including this one.
+    :returns: The estimated size in bytes.
+    """
+    size = _getsizeof(value)
+    if depth <= 0:
+        return size
+    depth -= 1
+    if isinstance(value, dict):
+        # dict.items instead of value.items, so the shared values of a copy-on-write dict are not copied.
+        count = dict.__len__(value)
+        items = dict.items(value)
+        if count > _SAMPLE_SIZE:
+            items = itertools.islice(items, _SAMPLE_SIZE)
+        sampled = 0
+        for key, item in items:
+            sampled += _getsizeof(key)
+            sampled += _getsizeof(item) if type(item) in _SCALAR_TYPES else estimate_size(item, depth)
+    elif isinstance(value, (list, tuple, set, frozenset, collections.deque)):
+        count = len(value)
+        items = itertools.islice(value, _SAMPLE_SIZE) if count > _SAMPLE_SIZE else value
+        sampled = 0
+        for item in items:
+            sampled += _getsizeof(item) if type(item) in _SCALAR_TYPES else estimate_size(item, depth)
+    else:
+        return size
+    if count > _SAMPLE_SIZE:
+        sampled = sampled * count // _SAMPLE_SIZE
+    return size + sampled
+
+
+class MemoryBudget:
+    """
+    The queued bytes of one module: its internal queue and the queues of all links to it.
+    Obtain via `memory_governor.budget()`.
+    """
+
+    def __init__(self, governor: "MemoryGovernor", module_id: str, limit: int) -> None:
+        """
+        :param governor: The governor tracking the total of all budgets.
+        :param module_id: The id of the module.
+        :param limit: The maximum number of queued bytes. 0 disables the limit.
+        """
+        self.module_id: str = module_id
+        """The id of the module."""
+        self.limit: int = limit
+        """The maximum number of queued bytes. 0 disables the limit."""
+        self.bytes: int = 0
+        """The estimated number of bytes currently queued."""
+        self.high_water_mark: int = 0
+        """The highest number of bytes queued so far."""
+        self.queues: int = 0
+        """The number of live queues charging this budget."""
+        self._governor: MemoryGovernor = governor
+        """The governor tracking the total of all budgets. Its lock guards the counters of the budget."""
+
+    def charge(self, size: int) -> None:
+        """
+        Adds bytes to (or, if negative, removes them from) the budget and the total of the governor.
+
+        :param size: The number of bytes.
+        :returns: None.
+        """
+        governor = self._governor
+        with governor._lock:
+            self.bytes += size
+            governor.bytes += size
+            if size > 0:
+                if self.bytes > self.high_water_mark:
+                    self.high_water_mark = self.bytes
+                if governor.bytes > governor.high_water_mark:
+                    governor.high_water_mark = governor.bytes
+
+    def exceeded(self) -> bool:
+        """
+        Checks if the limit of the budget or the limit of the governor is reached. Does not lock.
+
+        :returns: True if no more data should be queued.
+        """
+        return 0 < self.limit <= self.bytes or self._governor.exceeded()
+
+    def _release(self, charged: list) -> None:
+        """
+        Removes a discarded queue and the bytes it still held. Called once the queue is garbage collected.
+
+        :param charged: The bytes the queue charged this budget with, as a single item list.
+        :returns: None.
+        """
+        self.charge(-charged[0])
+        with self._governor._lock:
+            self.queues -= 1
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable snapshot of the budget.
+
+        :returns: A dict with `limit_bytes` (None if unlimited), `queued_bytes` and `high_water_mark` keys.
+        """
+        return {
+            "limit_bytes": self.limit or None,
+            "queued_bytes": self.bytes,
+            "high_water_mark": self.high_water_mark,
+        }
+
+
+class MemoryGovernor:
+    """
+    Tracks the budgets of all modules and limits their total. Thread-safe.
+
+    :param limit: The maximum number of bytes queued by all modules together. 0 disables the limit.
+    :param module_limit: The default limit of a budget in bytes. 0 disables the limit.
+    """
+
+    def __init__(self, limit: int, module_limit: int) -> None:
+        self.limit: int = limit
+        """The maximum number of bytes queued by all modules together. 0 disables the limit."""
+        self.module_limit: int = module_limit
+        """The default limit of a budget in bytes. 0 disables the limit."""
+        self.bytes: int = 0
+        """The estimated number of bytes currently queued by all modules."""
+        self.high_water_mark: int = 0
+        """The highest number of bytes queued so far."""
+        self._budgets: Dict[str, MemoryBudget] = {}
+        """Maps the module id to its budget."""
+        self._lock = threading.Lock()
+        """Guards `_budgets` and the counters of the governor and all budgets."""
+
+    def budget(self, module_id: str, limit_mb: Optional[float] = None) -> MemoryBudget:
+        """
+        The budget of a module, created on first use. Budgets outlive restarted modules, so the bytes
+        still held by the queues of a replaced module are not lost.
+
+        :param module_id: The id of the module.
+        :param limit_mb: The limit of the budget in MB. 0 uses the default limit, None keeps the current one.
+        :returns: The budget.
+        """
+        with self._lock:
+            budget = self._budgets.get(module_id)
+            if budget is None:
+                budget = self._budgets[module_id] = MemoryBudget(self, module_id, self.module_limit)
+        if limit_mb is not None:
+            budget.limit = int(limit_mb * _MB) or self.module_limit
+        return budget
+
+    def exceeded(self) -> bool:
+        """
+        Checks if the limit of the governor is reached. Does not lock.
+
+        :returns: True if no more data should be queued by any module.
+        """
+        return 0 < self.limit <= self.bytes
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable snapshot of the queued bytes.
+
+        :returns: A dict with `limit_bytes` (None if unlimited), `queued_bytes`, `high_water_mark` and `modules`
+            keys. `modules` maps the id of every module with queues or queued bytes to `MemoryBudget.snapshot()`.
+        """
+        with self._lock:
+            return {
+                "limit_bytes": self.limit or None,
+                "queued_bytes": self.bytes,
+                "high_water_mark": self.high_water_mark,
+                "modules": {module_id: budget.snapshot() for module_id, budget in self._budgets.items()
+                            if budget.queues or budget.bytes},
+            }
+
+
+class ByteQueue(queue.Queue):
+    """
+    A FIFO queue keeping track of the estimated size of its items, which it charges to a budget.
+
+    Every item is measured when it is put (see `estimate_size`) and discharged by what it was charged with, so
+    the figures never drift. The budget is charged in steps of `flush_bytes`, so the lock of the governor is
+    rarely taken.
+
+    :param maxsize: The maximum number of items. 0 or less for an unbounded queue.
+    :param budget: The budget to charge. None to only keep track of the size.
+    """
+
+    poll_interval: float = 0.01
+    """
+    Seconds between checks of the budget while waiting for space. Taking an item from this queue wakes up
+    waiting senders at once, but bytes freed by other queues of the budget (or, for the limit of the governor,
+    of any module) do not.
+    """
+
+    flush_bytes: int = 64 * 1024
+    """
+    The bytes added or removed before the budget is charged. The budget may therefore be off by up to this many
+    bytes per queue, but is always charged once the queue runs empty. 0 charges the budget with every item.
+    """
+
+    def __init__(self, maxsize: int = 0, budget: Optional[MemoryBudget] = None) -> None:
+        super().__init__(maxsize=maxsize)
+        self.budget: Optional[MemoryBudget] = budget
+        """The budget charged with the size of the queued items."""
+        self.bytes: int = 0
+        """The estimated number of bytes queued."""
+        self._flushed: list = [0]
+        """The bytes the budget is charged with, as a single item list shared with the finalizer."""
+        if budget is not None:
+            with budget._governor._lock:
+                budget.queues += 1
+            # Discharges the bytes of a queue which is discarded without being drained, e.g. on stop.
+            weakref.finalize(self, budget._release, self._flushed)
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        self._sizes: collections.deque = collections.deque()
+        """The estimated size of every queued item, in the same order."""
+
+    def _put(self, item: Any) -> None:
+        size = estimate_size(item)
+        self.queue.append(item)
+        self._sizes.append(size)
+        self.bytes += size
+        if self.budget is not None and self.bytes - self._flushed[0] >= self.flush_bytes:
+            self._flush()
+
+    def _get(self) -> Any:
+        self.bytes -= self._sizes.popleft()
+        item = self.queue.popleft()
+        if self.budget is not None and (self._flushed[0] - self.bytes >= self.flush_bytes or not self.queue):
+            self._flush()
+        return item
+
+    def _flush(self) -> None:
+        """
+        Charges the budget with the bytes added or removed since the last call.
+        Called with the mutex of the queue held.
+
+        :returns: None.
+        """
+        size = self.bytes - self._flushed[0]
+        if size:
+            self._flushed[0] = self.bytes
+            self.budget.charge(size)
+
+    def over_budget(self) -> bool:
+        """
+        Checks if the queue should not take more items because its budget is exceeded.
+        An empty queue is never over budget, so every queue can hold at least one item.
+
+        :returns: True if the queue is not empty and its budget is exceeded.
+        """
+        return self.budget is not None and len(self.queue) > 0 and self.budget.exceeded()
+
+    def put_within_budget(self, item: Any, timeout: float) -> bool:
+        """
+        Puts an item into the queue, once it is neither full nor over budget.
+
+        :param item: The item to put.
+        :param timeout: The maximum seconds to wait.
+        :returns: True if the item was put, False if the timeout elapsed.
+        """
+        deadline = time.monotonic() + timeout
+        with self.not_full:
+            while 0 < self.maxsize <= self._qsize() or self.over_budget():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.not_full.wait(timeout=min(remaining, self.poll_interval))
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        return True
+
+
+memory_governor = MemoryGovernor(limit=int(config.MEMORY_LIMIT_MB * _MB),
+                                 module_limit=int(config.QUEUE_LIMIT_MB * _MB))
+"""The process-wide memory governor."""
+
+metrics_registry.register_memory_governor(memory_governor)
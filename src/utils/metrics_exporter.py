@@ -0,0 +1,382 @@
+"""
+OpenMetrics (Prometheus) exposition of the `metrics.metrics_registry`.
+
+The exporter renders the lifetime counters, the live queue depths and sizes and the latency histograms of all
+registered modules, links, executors and flows, and the bytes queued in total (see `utils.memory_governor`), in the
+OpenMetrics text format. It is served by a lightweight HTTP listener (see `start()` and config.METRICS_PORT), which
+works without the optional api.
+
+Rendering is incremental: the label strings and line prefixes of every module and flow are built once, and the
+lines of a module or flow are only rebuilt if its counters changed or new samples were recorded since the
+previous scrape. Idle modules therefore cost little more than reading their counters and queue depth.
+"""
+import http.server
+import logging
+import math
+import threading
+from typing import Dict, Optional
+
+# Internal imports.
+import config
+from metrics import metrics_registry, MetricsRegistry, ModuleMetrics, _LatencyStats, _QuantileSketch
+
+logger = logging.getLogger(config.APP_NAME.lower() + '.' + __name__)
+"""The logger instance."""
+
+CONTENT_TYPE: str = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+"""The content type of the rendered exposition."""
+
+BUCKET_BOUNDS: tuple = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                        2.5, 5.0, 10.0)
+"""The upper bounds (`le`) of the histogram buckets in seconds, without +Inf."""
+
+_BUCKET_INDICES: list[int] = [math.ceil(math.log(bound) * _QuantileSketch._inverse_log_gamma)
+                              for bound in BUCKET_BOUNDS]
+"""
+The index of the sketch bucket containing each bound. A histogram bucket counts all sketch buckets up to this
+index, so a bucket count may include samples exceeding its bound by up to the relative accuracy of the sketch.
+"""
+
+_MODULE_COUNTERS: tuple = (
+    ("collectu_module_received", "Data objects entering run()."),
+    ("collectu_module_processed", "Data objects which successfully completed _run()."),
+    ("collectu_module_errors", "Processing errors."),
+    ("collectu_module_drops", "Data objects dropped due to a full queue."),
+    ("collectu_module_backpressure", "Backpressure signals received from downstream modules."),
+    ("collectu_module_validation_cache_hits", "Data objects whose shape was found in the validation cache."),
+    ("collectu_module_validation_cache_misses", "Data objects whose shape was not found in the validation cache."),
+)
+"""The name and help text of every per-module counter, in the order of `ModuleMetrics.counter_values()`."""
+
+_MODULE_HISTOGRAMS: tuple = (
+    ("collectu_module_processing_seconds", "Wall-clock time spent inside _run().",
+     lambda m: m._proc_time),
+    ("collectu_module_link_wait_seconds", "Time data objects waited in the queue of a link before run().",
+     lambda m: m._link_wait),
+    ("collectu_module_internal_wait_seconds", "Time data objects waited in the internal queue of the module.",
+     lambda m: m._int_wait),
+)
+"""The name, help text and getter of the `_LatencyStats` of every per-module histogram."""
+
+_LINK_METRICS: tuple = (
+    ("collectu_link_queue_depth", "gauge", "Live depth of the queue of a link worker.", "current_depth", None),
+    ("collectu_link_queue_bytes", "gauge", "Estimated size of the data objects queued by a link worker.",
+     "current_bytes", None),
+    ("collectu_link_high_water_mark", "gauge", "Highest depth of the queue of a link worker so far.",
+     "high_water_mark", None),
+    ("collectu_link_drops", "counter", "Data objects dropped by a link worker.", "drop_total", None),
+    ("collectu_link_coalesced", "counter", "Pending data objects overwritten by newer ones (latest-only links).",
+     "coalesced_total", None),
+    ("collectu_link_busy_seconds", "counter", "Time a link worker spent inside the linked module.",
+     "busy_ms_total", 0.001),
+)
+"""The name, type, help text, key in the partitions of `LinkMetrics.snapshot()` and scale of every link metric."""
+
+_FLOW_HISTOGRAM: tuple = ("collectu_flow_end_to_end_seconds", "End-to-end latency of a data flow.")
+"""The name and help text of the per-flow histogram."""
+
+
+def _escape(value: str) -> str:
+    """
+    Escape a label value.
+
+    :param value: The raw label value.
+    :returns: The value with backslashes, double quotes and line feeds escaped.
+    """
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _family(name: str, metric_type: str, help_text: str) -> str:
+    """
+    The metadata lines of a metric family.
+
+    :param name: The name of the metric family.
+    :param metric_type: The OpenMetrics type, e.g. `counter`.
+    :param help_text: The help text.
+    :returns: The `TYPE`, `UNIT` (for names ending with `_seconds`) and `HELP` lines.
+    """
+    unit = "# UNIT {0} seconds\n".format(name) if name.endswith("_seconds") else ""
+    return "# TYPE {0} {1}\n{2}# HELP {0} {3}\n".format(name, metric_type, unit, help_text)
+
+
+class _Histogram:
+    """
+    The preallocated line prefixes of one histogram series and its last rendered lines.
+    """
+
+    __slots__ = ("buckets", "count", "sum", "recorded", "lines")
+
+    def __init__(self, name: str, labels: str) -> None:
+        """
+        :param name: The name of the metric family.
+        :param labels: The rendered labels of the series, without braces.
+        """
+        self.buckets: list[str] = ["{0}_bucket{{{1},le=\"{2}\"}} ".format(name, labels, bound)
+                                   for bound in BUCKET_BOUNDS + ("+Inf",)]
+        """The prefix of every bucket line, the last one for +Inf."""
+        self.count: str = "{0}_count{{{1}}} ".format(name, labels)
+        """The prefix of the count line."""
+        self.sum: str = "{0}_sum{{{1}}} ".format(name, labels)
+        """The prefix of the sum line."""
+        self.recorded: int = -1
+        """The number of samples when the lines were rendered."""
+        self.lines: str = ""
+        """The last rendered lines."""
+
+    def render(self, stats: _LatencyStats) -> str:
+        """
+        Render the cumulative buckets of all samples recorded so far, if there are new ones.
+
+        :param stats: The latency statistics of the series.
+        :returns: The lines of the series.
+        """
+        recorded = stats.recorded
+        if recorded == self.recorded:
+            return self.lines
+        if not recorded:
+            # Series without samples (e.g. the internal wait of modules without a queue) are left out.
+            self.recorded = recorded
+            return self.lines
+        sketch = stats.lifetime()
+        ordered = sorted(sketch.buckets.items())
+        lines = []
+        cumulative = sketch.zero_count
+        position = 0
+        for prefix, limit in zip(self.buckets, _BUCKET_INDICES):
+            while position < len(ordered) and ordered[position][0] <= limit:
+                cumulative += ordered[position][1]
+                position += 1
+            lines.append("{0}{1}\n".format(prefix, cumulative))
+        count = sketch.count
+        lines.append("{0}{1}\n{2}{1}\n{3}{4!r}\n".format(self.buckets[-1], count, self.count, self.sum, sketch.total))
+        self.lines = "".join(lines)
+        # A sample recorded while copying the sketch is picked up by the next scrape.
+        self.recorded = recorded
+        return self.lines
+
+
+class _ModuleSeries:
+    """
+    The preallocated line prefixes of one module and its histograms.
+    """
+
+    __slots__ = ("metrics", "counters", "values", "lines", "depth", "bytes", "histograms")
+
+    def __init__(self, module: ModuleMetrics) -> None:
+        """
+        :param module: The metrics of the module.
+        """
+        labels = "module_id=\"{0}\",module_name=\"{1}\"".format(_escape(module.module_id),
+                                                              _escape(module.module_name))
+        self.metrics: ModuleMetrics = module
+        """The metrics of the module, to detect a module replaced by a restarted configuration."""
+        self.counters: list[str] = ["{0}_total{{{1}}} ".format(name, labels) for name, _ in _MODULE_COUNTERS]
+        """The prefix of every counter line."""
+        self.values: Optional[tuple] = None
+        """The counter values when the counter lines were rendered."""
+        self.lines: list[str] = []
+        """The last rendered line of every counter."""
+        self.depth: str = "collectu_module_queue_depth{{{0}}} ".format(labels)
+        """The prefix of the queue depth line."""
+        self.bytes: str = "collectu_module_queue_bytes{{{0}}} ".format(labels)
+        """The prefix of the queue size line."""
+        self.histograms: list[_Histogram] = [_Histogram(name, labels) for name, _, _ in _MODULE_HISTOGRAMS]
+        """Every histogram of the module."""
+
+
+class OpenMetricsExporter:
+    """
+    Renders a metrics registry in the OpenMetrics text format. Thread-safe.
+
+    :param registry: The registry to render.
+    """
+
+    def __init__(self, registry: MetricsRegistry = metrics_registry):
+        self.registry: MetricsRegistry = registry
+        """The registry to render."""
+        self._lock = threading.Lock()
+        """Guards the series, since scrapes may be served concurrently."""
+        self._modules: Dict[str, _ModuleSeries] = {}
+        """Maps the module id to its series."""
+        self._flows: Dict[str, tuple[_LatencyStats, _Histogram]] = {}
+        """Maps the flow key to its latency statistics and histogram."""
+        self._families: dict[str, str] = {}
+        """Maps the metric name to its metadata lines."""
+        for name, help_text in _MODULE_COUNTERS:
+            self._families[name] = _family(name, "counter", help_text)
+        for name, help_text, _ in _MODULE_HISTOGRAMS:
+            self._families[name] = _family(name, "histogram", help_text)
+        self._families[_FLOW_HISTOGRAM[0]] = _family(_FLOW_HISTOGRAM[0], "histogram", _FLOW_HISTOGRAM[1])
+
+    def _module_series(self, modules: list[ModuleMetrics]) -> list[_ModuleSeries]:
+        """
+        The series of the given modules, created for new or replaced modules. Forgets all other modules.
+
+        :param modules: The currently registered modules.
+        :returns: The series of every module.
+        """
+        known = self._modules
+        series = []
+        for module in modules:
+            entry = known.get(module.module_id)
+            if entry is None or entry.metrics is not module:
+                entry = known[module.module_id] = _ModuleSeries(module)
+            series.append(entry)
+        if len(known) != len(series):
+            self._modules = {entry.metrics.module_id: entry for entry in series}
+        return series
+
+    def _flow_series(self, flows: dict) -> list[tuple[_LatencyStats, _Histogram]]:
+        """
+        The series of the given flows, created for new or replaced flows. Forgets all other flows.
+
+        :param flows: Maps the flow key (`<source_id>-><output_id>`) to its latency statistics.
+        :returns: The statistics and histogram of every flow.
+        """
+        known = self._flows
+        series = {}
+        for key, stats in flows.items():
+            entry = known.get(key)
+            if entry is None or entry[0] is not stats:
+                source_id, _, output_id = key.partition("->")
+                labels = "flow=\"{0}\",source_id=\"{1}\",output_id=\"{2}\"".format(
+                    _escape(key), _escape(source_id), _escape(output_id))
+                entry = (stats, _Histogram(_FLOW_HISTOGRAM[0], labels))
+            series[key] = entry
+        self._flows = series
+        return list(series.values())
+
+    def render(self) -> str:
+        """
+        Render all metrics of the registry.
+
+        :returns: The exposition, terminated by `# EOF`.
+        """
+        registry = self.registry
+        with registry._module_lock:
+            modules = list(registry._modules.values())
+        with registry._link_lock:
+            links = list(registry._links.values())
+        with registry._executor_lock:
+            executors = list(registry._executors.values())
+        with registry._flow_lock:
+            flows = dict(registry._flows)
+        governor = registry._memory_governor
+
+        with self._lock:
+            module_series = self._module_series(modules)
+            flow_series = self._flow_series(flows)
+            out = []
+            for entry in module_series:
+                values = entry.metrics.counter_values()
+                if values != entry.values:
+                    entry.lines = [f"{prefix}{value}\n" for prefix, value in zip(entry.counters, values)]
+                    entry.values = values
+            for index, (name, _) in enumerate(_MODULE_COUNTERS):
+                out.append(self._families[name])
+                out.extend([entry.lines[index] for entry in module_series])
+            out.append(_family("collectu_module_queue_depth", "gauge", "Live depth of the internal queue."))
+            out.extend(["{0}{1}\n".format(entry.depth, entry.metrics._queue.qsize())
+                        for entry in module_series if entry.metrics._queue is not None])
+            out.append(_family("collectu_module_queue_bytes", "gauge",
+                               "Estimated size of the data objects in the internal queue."))
+            out.extend(["{0}{1}\n".format(entry.bytes, entry.metrics._queue.bytes)
+                        for entry in module_series if hasattr(entry.metrics._queue, "bytes")])
+            for index, (name, _, getter) in enumerate(_MODULE_HISTOGRAMS):
+                out.append(self._families[name])
+                out.extend([entry.histograms[index].render(getter(entry.metrics)) for entry in module_series])
+            out.append(self._families[_FLOW_HISTOGRAM[0]])
+            out.extend([histogram.render(stats) for stats, histogram in flow_series])
+
+        partitions = []
+        for link in links:
+            labels = "source_id=\"{0}\",target_id=\"{1}\"".format(_escape(link.source_id), _escape(link.target_id))
+            partitions.extend(("{0},worker=\"{1}\"".format(labels, partition["worker"]), partition)
+                              for partition in link.snapshot()["partitions"])
+        for name, metric_type, help_text, key, scale in _LINK_METRICS:
+            out.append(_family(name, metric_type, help_text))
+            suffix = "_total" if metric_type == "counter" else ""
+            for labels, partition in partitions:
+                value = partition.get(key)
+                if value is not None:
+                    out.append("{0}{1}{{{2}}} {3}\n".format(name, suffix, labels, value * scale if scale else value))
+
+        for name, metric_type, help_text, getter in (
+                ("collectu_executor_busy", "gauge", "Worker threads executing a task.",
+                 lambda e: e.busy),
+                ("collectu_executor_queue_depth", "gauge", "Live depth of the task queue.",
+                 lambda e: e._queue.qsize() if e._queue is not None else None),
+                ("collectu_executor_submitted", "counter", "Accepted tasks.",
+                 lambda e: e._submitted.value),
+                ("collectu_executor_rejected", "counter", "Tasks rejected due to a full queue.",
+                 lambda e: e._rejected.value)):
+            out.append(_family(name, metric_type, help_text))
+            suffix = "_total" if metric_type == "counter" else ""
+            for executor in executors:
+                value = getter(executor)
+                if value is not None:
+                    out.append("{0}{1}{{executor=\"{2}\"}} {3}\n".format(name, suffix, _escape(executor.name), value))
+
+        if governor is not None:
+            out.append(_family("collectu_memory_queued_bytes", "gauge",
+                               "Estimated size of the data objects queued by all modules."))
+            out.append("collectu_memory_queued_bytes {0}\n".format(governor.bytes))
+            if governor.limit:
+                out.append(_family("collectu_memory_limit_bytes", "gauge",
+                                   "The maximum size of the data objects queued by all modules."))
+                out.append("collectu_memory_limit_bytes {0}\n".format(governor.limit))
+
+        out.append("# EOF\n")
+        return "".join(out)
+
+
+exporter = OpenMetricsExporter()
+"""The exporter of the application-wide metrics registry."""
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the exposition of `exporter` on `/metrics`.
+    """
+
+    def do_GET(self):
+        """
+        Respond with the current exposition.
+        """
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = exporter.render().encode("utf-8")
+        except Exception as e:
+            logger.error("Could not render metrics: {0}".format(str(e)), exc_info=config.EXC_INFO)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+        Log requests at debug level instead of writing them to stderr.
+        """
+        logger.debug("Metrics request from {0}: {1}".format(self.address_string(), format % args))
+
+
+def start(host: str = config.METRICS_HOST, port: int = config.METRICS_PORT) -> Optional[http.server.ThreadingHTTPServer]:
+    """
+    Serve the metrics on `http://<host>:<port>/metrics` from a daemon thread.
+
+    :param host: The address to listen on.
+    :param port: The port to listen on. 0 disables the listener.
+    :returns: The server, or None if disabled.
+    """
+    if not port:
+        return None
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="Metrics_Exporter").start()
+    logger.info("Serving metrics on http://{0}:{1}/metrics.".format(host, server.server_address[1]))
+    return server
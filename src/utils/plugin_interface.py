@@ -254,6 +254,9 @@ def load_modules():
             try:
                 module = importlib.import_module(modname)
                 modname = modname.replace("modules.", "").lower()
+                # The modules shipped with the core live in their own package, apart from the module folders which
+                # hold the modules of the hub (and are mounted as volumes), but are registered by the same names.
+                modname = modname.removeprefix("core.")
                 if not register_module(modname, module):
                     logger.debug("Unknown module: {0}.".format(modname))
             except Exception as e: